@@ -0,0 +1,20 @@
+/// Entry functions around the AptosTrust views. A view call reports no gas, a
+/// simulated transaction does, so offchain/bench_gas.py measures the views through
+/// these; noop is the cost of the entry call itself.
+module bench::Probe {
+    use kimroniny::AptosTrust;
+
+    public entry fun noop() {}
+
+    public entry fun checkParaHeaderValid(chainId: u64, height: u64) {
+        let _ = AptosTrust::checkParaHeaderValid(chainId, height);
+    }
+
+    public entry fun checkParaHeadersValid(chainIds: vector<u64>, heights: vector<u64>) {
+        let _ = AptosTrust::checkParaHeadersValid(chainIds, heights);
+    }
+
+    public entry fun getRelayHeaderVotes(relayHeight: u64) {
+        let (_, _) = AptosTrust::getRelayHeaderVotes(relayHeight);
+    }
+}
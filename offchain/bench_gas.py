@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+from aptos_sdk.account import Account
+from aptos_sdk import ed25519
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import ApiError
+from aptos_sdk.bcs import Serializer
+from aptos_sdk.transactions import EntryFunction, RawTransaction, TransactionArgument, TransactionPayload
+from sdk.sdk import AptosSDKPlus
+from sdk.headers import HeaderBatcher, ParaHeader, collect_header_entry_function, collect_headers_entry_function
+from sdk.payload import RegistParaChainTemplate
+from sdk.relayer import Relayer
+
+# gas and storage of the module's operations as its state grows
+# needs a node that simulates transactions, e.g. `aptos node run-localnet`, with AptosTrust
+# published by --key and the probe package in bench/ published by --probe-key:
+#   aptos move publish --package-dir bench --named-addresses bench=<probe address>
+# run from offchain/, once per parachain count on a fresh module:
+#   python bench_gas.py --node-url http://127.0.0.1:8080/v1 --module <addr>::AptosTrust \
+#       --probe <probe address>::Probe --parachains 6 --headers 100,1000,10000,100000,1000000 --out gas-6.json
+#   python bench_gas.py ... --baseline gas-6.json   # exit code 1 when an operation got more expensive
+# header counts are cumulative, the module is filled up to each one in turn and measured there.
+# A measured transaction can be replayed with `aptos move simulate --profile-gas` for a flamegraph.
+
+# gas limit of measured and populating transactions
+MAX_GAS = 1_000_000
+
+# metrics of every operation compared against a baseline, all lower is better
+COMPARED_METRICS = ("execution_gas", "io_gas", "storage_fee", "write_bytes")
+
+FEE_STATEMENT = "0x1::transaction_fee::FeeStatement"
+
+# module resources whose size is reported at each level
+RESOURCES = ("ParaChains", "AllHeaders", "HCRByHeight", "VotesByHeight", "Retention")
+
+def parseInts(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def loadKey(path: str) -> Account:
+    with open(path, "r") as f:
+        private_key = ed25519.PrivateKey.from_str(f.read(), strict=False)
+    return Account(AccountAddress.from_key(private_key.public_key()), private_key)
+
+def root(chainId: int, height: int) -> bytes:
+    # distinct per header, like a real block hash
+    return chainId.to_bytes(8, "little") + height.to_bytes(8, "little") + bytes(16)
+
+async def resourceSize(sdk: AptosSDKPlus, module: str, name: str) -> int:
+    # BCS size of the resource itself; table and big map entries live in slots of their own
+    address = module.split("::")[0]
+    response = await sdk.client.get(
+        f"{sdk.base_url}/accounts/{address}/resource/{module}::{name}",
+        headers={"Accept": "application/x-bcs"},
+    )
+    if response.status_code == 404:
+        return 0
+    if response.status_code >= 400:
+        raise ApiError(response.text, response.status_code)
+    return len(response.content)
+
+class Simulator:
+    """Simulates entry functions from one account and reads the fee statement of each"""
+
+    def __init__(self, sdk: AptosSDKPlus, account: Account):
+        self.sdk = sdk
+        self.account = account
+        self.sequence_number = 0
+        self.chain_id = 0
+        # resource name => BCS size, the write set shows resources as JSON only
+        self.resource_sizes: Dict[str, int] = {}
+
+    async def refresh(self, module: str):
+        self.sequence_number = await self.sdk.account_sequence_number(self.account.address())
+        self.chain_id = await self.sdk.chain_id()
+        self.resource_sizes = {name: await resourceSize(self.sdk, module, name) for name in RESOURCES}
+
+    async def run(self, entry_function: EntryFunction) -> Dict[str, Any]:
+        raw_transaction = RawTransaction(
+            self.account.address(),
+            self.sequence_number,
+            TransactionPayload(entry_function),
+            MAX_GAS,
+            100,
+            int(time.time()) + 600,
+            self.chain_id,
+        )
+        [result] = await self.sdk.simulate_transaction(raw_transaction, self.account)
+        if not result["success"]:
+            raise RuntimeError(f"simulated {entry_function.function} failed: {result['vm_status']}")
+        fee = next((event["data"] for event in result["events"] if event["type"] == FEE_STATEMENT), None)
+        writeBytes = 0
+        slots = 0
+        for change in result["changes"]:
+            if change["type"] == "write_table_item":
+                # key and value are BCS hex
+                writeBytes += (len(change["key"]) - 2) // 2 + (len(change["value"]) - 2) // 2
+                slots += 1
+            elif change["type"] == "write_resource":
+                writeBytes += self.resource_sizes.get(change["data"]["type"].split("::")[-1], 0)
+                slots += 1
+        return {
+            "gas": int(result["gas_used"]),
+            "execution_gas": int(fee["execution_gas_units"]) if fee else 0,
+            "io_gas": int(fee["io_gas_units"]) if fee else 0,
+            "storage_fee": int(fee["storage_fee_octas"]) if fee else 0,
+            "write_bytes": writeBytes,
+            "write_slots": slots,
+        }
+
+def summarize(samples: List[Dict[str, Any]], per: int = 1) -> Dict[str, float]:
+    # median of each metric over the samples, divided by the headers one call handles
+    return {metric: statistics.median(s[metric] for s in samples) / per for metric in samples[0]}
+
+class Population:
+    """Headers this run stored, to pick existing ones and fresh heights from"""
+
+    def __init__(self, chainIds: List[int], heightBase: int):
+        self.chainIds = chainIds
+        self.heightBase = heightBase
+        # headers stored per chain, heights are heightBase + 0..count-1
+        self.counts = {chainId: 0 for chainId in chainIds}
+        self.relayHeights: List[int] = []
+        self.stored = 0
+        self.gas = 0
+
+    def existing(self, rng: random.Random) -> Tuple[int, int]:
+        chainId = rng.choice([c for c in self.chainIds if self.counts[c] > 0])
+        return chainId, self.heightBase + rng.randrange(self.counts[chainId])
+
+    def fresh(self, chainId: int, offset: int = 0) -> int:
+        return self.heightBase + self.counts[chainId] + offset
+
+async def populate(sdk: AptosSDKPlus, account: Account, module: str, population: Population, target: int, inflight: int):
+    # fills the module up to `target` headers, one per chain in turn, each voting for the
+    # hub block it was sent at like a live parachain does
+    if population.stored >= target:
+        return
+    failures: List[str] = []
+
+    def settled(headers: List[ParaHeader], success: bool, vm_status: str, gas_used: int):
+        population.gas += gas_used
+        if not success:
+            failures.append(vm_status)
+
+    relayer = Relayer(
+        sdk,
+        account,
+        HeaderBatcher(module, max_gas_amount=MAX_GAS),
+        queue_size=1000,
+        max_inflight=inflight,
+        linger=0,
+        on_result=settled,
+    )
+    relayer.start()
+    relayHeight = int((await sdk.info())["block_height"])
+    started = time.perf_counter()
+    for i in range(target - population.stored):
+        chainId = population.chainIds[(population.stored + i) % len(population.chainIds)]
+        height = population.fresh(chainId)
+        population.counts[chainId] += 1
+        if i % 1000 == 0:
+            relayHeight = int((await sdk.info())["block_height"])
+            population.relayHeights.append(relayHeight)
+        await relayer.put(ParaHeader(chainId, height, root(chainId, height), root(chainId, height), [relayHeight]))
+    left = await relayer.stop()
+    if failures or left:
+        raise RuntimeError(f"populating failed for {relayer.failed + len(left)} headers: {failures[:1]}")
+    population.stored = target
+    print(f"{target} headers stored in {time.perf_counter() - started:.0f}s", file=sys.stderr)
+
+async def measure(
+        simulator: Simulator,
+        probe: Simulator,
+        module: str,
+        probeModule: str,
+        population: Population,
+        samples: int,
+        batchSize: int,
+        rng: random.Random
+    ) -> Dict[str, Dict[str, float]]:
+    await simulator.refresh(module)
+    await probe.refresh(module)
+    relayHeight = int((await simulator.sdk.info())["block_height"])
+    operations: Dict[str, Dict[str, float]] = {}
+
+    runs = []
+    for _ in range(samples):
+        chainId = rng.choice(population.chainIds)
+        height = population.fresh(chainId)
+        runs.append(await simulator.run(collect_header_entry_function(
+            module, ParaHeader(chainId, height, root(chainId, height), root(chainId, height), [relayHeight])
+        )))
+    operations["collectHeader"] = summarize(runs)
+
+    runs = []
+    for _ in range(samples):
+        batch = []
+        for i in range(batchSize):
+            chainId = population.chainIds[i % len(population.chainIds)]
+            height = population.fresh(chainId, i // len(population.chainIds))
+            batch.append(ParaHeader(chainId, height, root(chainId, height), root(chainId, height), [relayHeight]))
+        runs.append(await simulator.run(collect_headers_entry_function(module, batch)))
+    # per header, so it compares with collectHeader
+    operations[f"collectHeaders/{batchSize}"] = summarize(runs, batchSize)
+
+    operations["noop"] = summarize([await probe.run(EntryFunction.natural(probeModule, "noop", [], []))])
+
+    runs = []
+    for _ in range(samples):
+        chainId, height = population.existing(rng)
+        runs.append(await probe.run(EntryFunction.natural(probeModule, "checkParaHeaderValid", [], [
+            TransactionArgument(chainId, Serializer.u64),
+            TransactionArgument(height, Serializer.u64),
+        ])))
+    operations["checkParaHeaderValid"] = summarize(runs)
+
+    runs = []
+    for _ in range(samples):
+        relayHeight = rng.choice(population.relayHeights)
+        runs.append(await probe.run(EntryFunction.natural(probeModule, "getRelayHeaderVotes", [], [
+            TransactionArgument(relayHeight, Serializer.u64),
+        ])))
+    operations["getRelayHeaderVotes"] = summarize(runs)
+    return operations
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    previous = {(level["parachains"], level["headers"]): level for level in baseline["levels"]}
+    for level in result["levels"]:
+        base = previous.get((level["parachains"], level["headers"]))
+        if base is None:
+            continue
+        for operation, metrics in level["operations"].items():
+            for metric in COMPARED_METRICS:
+                new, old = metrics[metric], base["operations"].get(operation, {}).get(metric, 0)
+                if old == 0:
+                    continue
+                change = (new - old) / old
+                if change > tolerance:
+                    regressions.append(
+                        f"parachains={level['parachains']} headers={level['headers']}: "
+                        f"{operation} {metric} {old:.0f} -> {new:.0f} ({change:+.0%})"
+                    )
+    return regressions
+
+def printLevel(level: Dict[str, Any]):
+    print(f"parachains={level['parachains']} headers={level['headers']} resources={level['resource_bytes']}", file=sys.stderr)
+    for operation, m in level["operations"].items():
+        print(
+            f"  {operation:<24} exec {m['execution_gas']:>8.1f}  io {m['io_gas']:>8.1f}  "
+            f"storage {m['storage_fee']:>9.0f} octas  writes {m['write_slots']:>5.1f} slots {m['write_bytes']:>9.0f} bytes",
+            file=sys.stderr,
+        )
+
+async def main():
+    parser = argparse.ArgumentParser(description="gas and storage of AptosTrust operations as the module fills up")
+    parser.add_argument("--node-url", default=os.environ.get("APTOS_NODE_URL"))
+    parser.add_argument("--module", default=os.environ.get("APTOS_TRUST_MODULE"))
+    parser.add_argument("--key", default="./prepare_account/testkey/Alice", help="key file of the module owner")
+    parser.add_argument("--probe", required=True, help="<address>::Probe of the bench/ package")
+    parser.add_argument("--probe-key", help="key file the probe calls are simulated from, default --key")
+    parser.add_argument("--parachains", type=int, default=6)
+    parser.add_argument("--headers", type=parseInts, default=[100, 1000, 10000], help="stored headers to measure at")
+    parser.add_argument("--samples", type=int, default=10, help="simulations per operation and level")
+    parser.add_argument("--batch-size", type=int, default=100, help="headers per measured collectHeaders")
+    parser.add_argument("--inflight", type=int, default=32, help="unconfirmed transactions while populating")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="relative change that counts as a regression")
+    args = parser.parse_args()
+    if not args.node_url or not args.module:
+        parser.error("--node-url and --module (or APTOS_NODE_URL/APTOS_TRUST_MODULE) are required")
+
+    account = loadKey(args.key)
+    probeAccount = loadKey(args.probe_key) if args.probe_key else account
+    sdk = AptosSDKPlus(args.node_url)
+    rng = random.Random(args.seed)
+    chainIds = list(range(1001, 1001 + args.parachains))
+    # heights are unique per run, so a reused module never sees a duplicate header
+    population = Population(chainIds, int(time.time() * 1000))
+    levels = []
+    try:
+        template = RegistParaChainTemplate(args.module)
+        results = await sdk.transact_many([template.chain(chainId) for chainId in chainIds], account)
+        failed = [r for r in results if isinstance(r, Exception) or not r[0]]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(chainIds)} parachain registrations failed: {failed[0]}")
+        simulator = Simulator(sdk, account)
+        probe = Simulator(sdk, probeAccount)
+        for headers in sorted(args.headers):
+            await populate(sdk, account, args.module, population, headers, args.inflight)
+            operations = await measure(
+                simulator, probe, args.module, args.probe, population, args.samples, args.batch_size, rng
+            )
+            level = {
+                "parachains": args.parachains,
+                "headers": headers,
+                "relay_heights": len(set(population.relayHeights)),
+                "populate_gas_per_header": population.gas / population.stored,
+                "resource_bytes": dict(simulator.resource_sizes),
+                "operations": operations,
+            }
+            levels.append(level)
+            printLevel(level)
+    finally:
+        await sdk.close()
+
+    result = {
+        "node_url": args.node_url,
+        "created": int(time.time()),
+        "levels": levels,
+    }
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
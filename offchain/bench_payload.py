@@ -0,0 +1,80 @@
+import time
+from typing import List
+from aptos_sdk.account import Account
+from aptos_sdk.transactions import EntryFunction, TransactionPayload, TransactionArgument, RawTransaction, SignedTransaction
+from aptos_sdk.bcs import Serializer
+from sdk.payload import CollectHeaderTemplate, TransactionSigner
+
+# per-header encode+sign cost of collectHeader: EntryFunction.natural as main.py
+# builds it versus the cached payload template and transaction signer
+# run from offchain/: python bench_payload.py
+
+MODULE = "0x9351b6102cc8a05e5b05fedd1f3f3e44f2f760518aa4d1334914e014d165210a::AptosTrust"
+
+CHAIN_ID = 4
+MAX_GAS_AMOUNT = 2000
+GAS_UNIT_PRICE = 100
+HEADERS = 5000
+
+def signCurrent(account: Account, sequence_number: int, chainId: int, height: int, root: List[int], hcr: List[int], sequences: List[int], expiration: int) -> bytes:
+    entry_function = EntryFunction.natural(
+        MODULE,
+        "collectHeader",
+        [],
+        [
+            TransactionArgument(chainId, Serializer.u64),
+            TransactionArgument(height, Serializer.u64),
+            TransactionArgument(root, Serializer.sequence_serializer(Serializer.u8)),
+            TransactionArgument(hcr, Serializer.sequence_serializer(Serializer.u8)),
+            TransactionArgument(sequences, Serializer.sequence_serializer(Serializer.u64)),
+        ],
+    )
+    raw_transaction = RawTransaction(
+        sender=account.address(),
+        sequence_number=sequence_number,
+        payload=TransactionPayload(entry_function),
+        max_gas_amount=MAX_GAS_AMOUNT,
+        gas_unit_price=GAS_UNIT_PRICE,
+        expiration_timestamps_secs=expiration,
+        chain_id=CHAIN_ID,
+    )
+    authenticator = account.sign_transaction(raw_transaction)
+    return SignedTransaction(raw_transaction, authenticator).bytes()
+
+def main():
+    account = Account.generate()
+    root = [1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8]
+    hcr = [1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8]
+    sequences = [10, 11, 12]
+    expiration = int(time.time()) + 600
+
+    template = CollectHeaderTemplate(MODULE)
+    signer = TransactionSigner(account, CHAIN_ID, MAX_GAS_AMOUNT, GAS_UNIT_PRICE)
+    root_bytes, hcr_bytes = bytes(root), bytes(hcr)
+
+    # both paths must produce the same signed transaction
+    assert signCurrent(account, 7, 1001, 99, root, hcr, sequences, expiration) == \
+        signer.sign(7, template.header(1001, 99, root_bytes, hcr_bytes, sequences), expiration).bytes()
+
+    start = time.perf_counter()
+    for i in range(HEADERS):
+        signCurrent(account, i, 1001, i, root, hcr, sequences, expiration)
+    current = (time.perf_counter() - start) / HEADERS
+
+    start = time.perf_counter()
+    for i in range(HEADERS):
+        template.header(1001, i, root_bytes, hcr_bytes, sequences)
+    encode = (time.perf_counter() - start) / HEADERS
+
+    start = time.perf_counter()
+    for i in range(HEADERS):
+        signer.sign(i, template.header(1001, i, root_bytes, hcr_bytes, sequences), expiration)
+    fast = (time.perf_counter() - start) / HEADERS
+
+    print(f"headers: {HEADERS}")
+    print(f"--- EntryFunction.natural + RawTransaction: {current * 1e6:.1f} us/header")
+    print(f"--- template encode only:                  {encode * 1e6:.1f} us/header")
+    print(f"--- template + TransactionSigner:          {fast * 1e6:.1f} us/header ({current / fast:.1f}x)")
+
+if __name__ == "__main__":
+    main()
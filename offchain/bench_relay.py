@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from aptos_sdk.account import Account
+from aptos_sdk.async_client import ApiError
+from aptos_sdk import ed25519
+from aptos_sdk.account_address import AccountAddress
+from sdk.sdk import AptosSDKPlus
+from sdk.headers import ParaHeader, collect_headers_entry_function
+from sdk.payload import CollectHeaderTemplate, RegistParaChainTemplate
+from sdk.replay import ReplayTransport
+
+# non-interactive benchmark of the header relay path
+# run from offchain/:
+#   python bench_relay.py --local --parachains 6,100 --batch-sizes 1,10 --out result.json
+#   python bench_relay.py --node-url <url> --module <addr>::AptosTrust --key ./prepare_account/testkey/Alice
+#   python bench_relay.py --local --baseline result.json   # exit code 1 on regressions
+#   python bench_relay.py --local --record traffic.jsonl.gz   # the node traffic, for replays
+#   python bench_relay.py --replay traffic.jsonl.gz --out replayed.json   # the same run offline, to compare
+#                                                                           # client changes with --baseline replayed.json
+
+ROOT = bytes([1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8])
+HCR = ROOT
+
+# metric => True when higher is better
+COMPARED_METRICS = {
+    "headers_per_sec": True,
+    "latency_ms.p50": False,
+    "latency_ms.p99": False,
+    "view_latency_ms.p50": False,
+    "gas_per_header": False,
+    "cpu_us_per_header": False,
+}
+
+def parseInts(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    def rank(p: float) -> float:
+        # nearest rank
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))]
+    return {"p50": rank(0.50), "p90": rank(0.90), "p99": rank(0.99), "max": ordered[-1]}
+
+def loadKey(path: str) -> Account:
+    with open(path, "r") as f:
+        private_key = ed25519.PrivateKey.from_str(f.read(), strict=False)
+    return Account(AccountAddress.from_key(private_key.public_key()), private_key)
+
+async def registParachains(sdk: AptosSDKPlus, account: Account, module: str, chainIds: List[int]):
+    # registParaChain is idempotent, chains left from an earlier scenario are fine
+    template = RegistParaChainTemplate(module)
+    results = await sdk.transact_many([template.chain(chainId) for chainId in chainIds], account)
+    failed = [r for r in results if isinstance(r, Exception) or not r[0]]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(chainIds)} parachain registrations failed: {failed[0]}")
+
+async def currentBlockHeight(sdk: AptosSDKPlus) -> int:
+    return int((await sdk.info())["block_height"])
+
+async def runScenario(
+        sdk: AptosSDKPlus,
+        account: Account,
+        module: str,
+        parachains: int,
+        rate: int,
+        depth: int,
+        batchSize: int,
+        headers: int,
+        views: int,
+        heightBase: int
+    ) -> Dict[str, Any]:
+    chainIds = list(range(1001, 1001 + parachains))
+    await registParachains(sdk, account, module, chainIds)
+    relayHeight = await currentBlockHeight(sdk)
+
+    # every round each parachain produces one header voting for the relay height seen at start
+    rounds = (headers + parachains - 1) // parachains
+    queue = [
+        ParaHeader(chainId, heightBase + r, ROOT, HCR, [relayHeight])
+        for r in range(rounds) for chainId in chainIds
+    ][:headers]
+    batches = [queue[i:i + batchSize] for i in range(0, len(queue), batchSize)]
+    template = CollectHeaderTemplate(module)
+    maxGas = max(2000, 100 * batchSize)
+
+    inflight = asyncio.Semaphore(depth)
+    latencies: List[float] = []
+    gasUsed = 0
+    committed = 0
+    failed = 0
+    errors: Dict[str, int] = {}
+
+    async def relay(batch: List[ParaHeader]):
+        nonlocal gasUsed, committed, failed
+        if len(batch) == 1:
+            h = batch[0]
+            payload = template.header(h.chainId, h.height, h.root, h.hcr, h.sequences)
+        else:
+            payload = collect_headers_entry_function(module, batch)
+        start = time.perf_counter()
+        try:
+            confirmation = await sdk.submit(payload, account, max_gas_amount=maxGas, expiration_timestamps_secs=int(time.time()) + 600)
+            success, vm_status, gas = await confirmation
+        except (ApiError, Exception) as e:
+            failed += len(batch)
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        finally:
+            inflight.release()
+        latencies.append((time.perf_counter() - start) * 1000)
+        gasUsed += gas
+        if success:
+            committed += len(batch)
+        else:
+            failed += len(batch)
+            errors[vm_status] = errors.get(vm_status, 0) + 1
+
+    cpuStart = time.process_time()
+    wallStart = time.perf_counter()
+    tasks = []
+    for i, batch in enumerate(batches):
+        if rate > 0:
+            # paces headers, a batch goes out when its first header is due
+            due = wallStart + (i * batchSize) / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await inflight.acquire()
+        tasks.append(asyncio.ensure_future(relay(batch)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - wallStart
+    cpu = time.process_time() - cpuStart
+
+    # view latency of the batched validity check, uncached
+    viewLatencies: List[float] = []
+    sample = [(h.chainId, h.height) for h in queue[:100]]
+    for _ in range(views):
+        start = time.perf_counter()
+        await sdk.check_para_headers_valid(module, sample)
+        viewLatencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "parachains": parachains,
+        "rate": rate,
+        "depth": depth,
+        "batch": batchSize,
+        "headers": len(queue),
+        "transactions": len(batches),
+        "committed": committed,
+        "failed": failed,
+        "errors": errors,
+        "seconds": wall,
+        "headers_per_sec": committed / wall if wall > 0 else 0.0,
+        "latency_ms": percentiles(latencies),
+        "view_latency_ms": percentiles(viewLatencies),
+        "gas_per_header": gasUsed / len(queue) if queue else 0.0,
+        "cpu_us_per_header": cpu * 1e6 / len(queue) if queue else 0.0,
+    }
+
+def scenarioKey(scenario: Dict[str, Any]) -> Tuple[int, int, int, int]:
+    return scenario["parachains"], scenario["rate"], scenario["depth"], scenario["batch"]
+
+def metricOf(scenario: Dict[str, Any], metric: str) -> float:
+    value: Any = scenario
+    for part in metric.split("."):
+        value = value[part]
+    return float(value)
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    previous = {scenarioKey(s): s for s in baseline["scenarios"]}
+    for scenario in result["scenarios"]:
+        base = previous.get(scenarioKey(scenario))
+        if base is None:
+            continue
+        for metric, higherIsBetter in COMPARED_METRICS.items():
+            new, old = metricOf(scenario, metric), metricOf(base, metric)
+            if old == 0:
+                continue
+            change = (new - old) / old
+            if (higherIsBetter and change < -tolerance) or (not higherIsBetter and change > tolerance):
+                regressions.append(
+                    f"parachains={scenario['parachains']} rate={scenario['rate']} depth={scenario['depth']} "
+                    f"batch={scenario['batch']}: {metric} {old:.2f} -> {new:.2f} ({change:+.0%})"
+                )
+    return regressions
+
+async def startLocalNode(module: str, port: int, blockTime: float) -> asyncio.subprocess.Process:
+    # a separate process, so client CPU per header only counts the client
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "localnode",
+        "--module", module, "--port", str(port), "--block-time", str(blockTime),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=asyncio.subprocess.DEVNULL,
+    )
+    sdk = AptosSDKPlus(f"http://127.0.0.1:{port}/v1")
+    try:
+        for _ in range(100):
+            try:
+                await sdk.info()
+                return process
+            except Exception:
+                await asyncio.sleep(0.1)
+    finally:
+        await sdk.close()
+    process.kill()
+    raise RuntimeError("local node did not come up")
+
+async def main():
+    parser = argparse.ArgumentParser(description="throughput and latency of the header relay path")
+    parser.add_argument("--node-url", default=os.environ.get("APTOS_NODE_URL"))
+    parser.add_argument("--module", default=os.environ.get("APTOS_TRUST_MODULE"))
+    parser.add_argument("--key", default="./prepare_account/testkey/Alice", help="key file of the module owner")
+    parser.add_argument("--local", action="store_true", help="start a local node with a fresh owner account")
+    parser.add_argument("--port", type=int, default=18080, help="port of the local node")
+    parser.add_argument("--block-time", type=float, default=0.25, help="block time of the local node")
+    parser.add_argument("--parachains", type=parseInts, default=[6, 100, 1000])
+    parser.add_argument("--rates", type=parseInts, default=[0], help="headers/sec, 0 submits as fast as depth allows")
+    parser.add_argument("--depths", type=parseInts, default=[32])
+    parser.add_argument("--batch-sizes", type=parseInts, default=[1, 20])
+    parser.add_argument("--headers", type=int, default=1000, help="headers per scenario")
+    parser.add_argument("--views", type=int, default=20, help="timed view calls per scenario")
+    parser.add_argument("--out", help="write the JSON result here")
+    parser.add_argument("--baseline", help="JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative change that counts as a regression")
+    parser.add_argument("--record", help="append the node traffic of this run to a log, gzip compressed for .gz")
+    parser.add_argument("--replay", help="answer from a recorded log instead of a node, with the recorded workload")
+    parser.add_argument("--replay-latency-scale", type=float, default=1.0, help="recorded latencies are waited this many times")
+    args = parser.parse_args()
+
+    process = None
+    replay = None
+    # heights are unique per run, so a persistent endpoint never sees a duplicate header
+    heightBase = int(time.time() * 1000)
+    if args.replay:
+        # the keys of a replay only match the recorded run with its workload, owner and heights
+        replay = ReplayTransport(args.replay, args.replay_latency_scale)
+        workload = replay.notes.get("workload")
+        if workload is None:
+            parser.error(f"{args.replay} was not recorded by this benchmark")
+        for name, value in workload.items():
+            setattr(args, name, value)
+        if "owner_key" in replay.notes:
+            private_key = ed25519.PrivateKey.from_str(replay.notes["owner_key"], strict=False)
+            account = Account(AccountAddress.from_key(private_key.public_key()), private_key)
+        else:
+            account = loadKey(args.key)
+        module = replay.notes["module"]
+        nodeUrl = replay.notes["node_url"]
+        heightBase = replay.notes["height_base"]
+    elif args.local:
+        account = Account.generate()
+        module = f"{account.address()}::AptosTrust"
+        process = await startLocalNode(module, args.port, args.block_time)
+        nodeUrl = f"http://127.0.0.1:{args.port}/v1"
+    else:
+        if not args.node_url or not args.module:
+            parser.error("--node-url and --module (or APTOS_NODE_URL/APTOS_TRUST_MODULE) are required without --local")
+        account = loadKey(args.key)
+        module = args.module
+        nodeUrl = args.node_url
+
+    sdk = AptosSDKPlus(nodeUrl, record=args.record, transport=replay)
+    if sdk.recorder is not None:
+        sdk.recorder.note(
+            workload={name: getattr(args, name) for name in ("parachains", "rates", "depths", "batch_sizes", "headers", "views")},
+            module=module,
+            node_url=nodeUrl,
+            height_base=heightBase,
+        )
+        if args.local:
+            # a throwaway account of the local node, the replay signs as the same sender
+            sdk.recorder.note(owner_key=str(account.private_key))
+    scenarios = []
+    try:
+        for parachains, rate, depth, batchSize in itertools.product(args.parachains, args.rates, args.depths, args.batch_sizes):
+            scenario = await runScenario(
+                sdk, account, module, parachains, rate, depth, batchSize, args.headers, args.views, heightBase
+            )
+            heightBase += args.headers
+            scenarios.append(scenario)
+            print(
+                f"parachains={parachains} rate={rate} depth={depth} batch={batchSize}: "
+                f"{scenario['headers_per_sec']:.1f} headers/s, p50 {scenario['latency_ms']['p50']:.0f} ms, "
+                f"p99 {scenario['latency_ms']['p99']:.0f} ms, {scenario['gas_per_header']:.1f} gas/header, "
+                f"{scenario['cpu_us_per_header']:.0f} us cpu/header, {scenario['failed']} failed",
+                file=sys.stderr,
+            )
+    finally:
+        await sdk.close()
+        if replay is not None:
+            stats = replay.stats()
+            print(f"replayed {stats['served']} answers, {stats['repeated']} repeated, {stats['misses']} not recorded", file=sys.stderr)
+        if process is not None:
+            process.terminate()
+            await process.wait()
+
+    result = {
+        "node_url": f"replay of {args.replay}" if args.replay else "local" if args.local else nodeUrl,
+        "created": int(time.time()),
+        "scenarios": scenarios,
+    }
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
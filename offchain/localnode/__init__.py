@@ -0,0 +1,2 @@
+from .node import LocalNode, run
+from .trust import AptosTrust, MoveAbort
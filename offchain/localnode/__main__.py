@@ -0,0 +1,43 @@
+import argparse
+from .node import LocalNode, run
+
+# run from offchain/: python -m localnode --module <address>::AptosTrust
+# then point the sdk at http://127.0.0.1:8080/v1
+
+def main():
+    parser = argparse.ArgumentParser(description="in-memory Aptos node that hosts AptosTrust")
+    parser.add_argument("--module", required=True, help="<address>::AptosTrust, the address is the module owner")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--chain-id", type=int, default=4)
+    parser.add_argument("--block-time", type=float, default=0.25, help="seconds between blocks")
+    parser.add_argument("--block-size", type=int, default=1000, help="max transactions per block")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, uniformly")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of accepted transactions that never commit")
+    parser.add_argument("--replica-latency", type=float, nargs="*", default=[],
+                        help="one more port per value, --port + 1 and up, serving the same ledger with that latency")
+    parser.add_argument("--no-verify", action="store_true", help="skip signature checks")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    node = LocalNode(
+        args.module,
+        chain_id=args.chain_id,
+        block_time=args.block_time,
+        block_size=args.block_size,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        drop_rate=args.drop_rate,
+        verify_signatures=not args.no_verify,
+        seed=args.seed,
+    )
+    print(f"local node for {args.module} on http://{args.host}:{args.port}/v1")
+    print(f"faucet on http://{args.host}:{args.port}")
+    for offset, latency in enumerate(args.replica_latency, 1):
+        print(f"replica with {latency}s latency on http://{args.host}:{args.port + offset}/v1")
+    run(node, args.host, args.port, args.replica_latency)
+
+if __name__ == "__main__":
+    main()
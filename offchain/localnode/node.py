@@ -0,0 +1,514 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from aiohttp import web
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.bcs import Deserializer
+from aptos_sdk.transactions import EntryFunction, SignedTransaction, TransactionPayload
+from sdk.headers import GAS_PER_HEADER, GAS_PER_VOTE
+from sdk.sdk import TRANSACTION_HASH_PREFIX
+from .trust import AptosTrust, MoveAbort
+
+# the node keeps this many sequence numbers of one sender in mempool
+MEMPOOL_SENDER_LIMIT = 100
+
+# the node caps one page of transactions at 100
+TRANSACTIONS_PAGE_LIMIT = 100
+
+# gas of a transaction that does nothing beyond the intrinsic cost
+GAS_BASE = 5
+
+# gas of each coin transfer, on top of GAS_BASE
+GAS_PER_TRANSFER = 2
+
+# vm_error_code of the validation statuses the sdk looks at
+VALIDATION_CODES = {
+    "SEQUENCE_NUMBER_TOO_OLD": 3,
+    "SEQUENCE_NUMBER_TOO_NEW": 4,
+    "INVALID_SIGNATURE": 1,
+    "TRANSACTION_EXPIRED": 6,
+    "BAD_CHAIN_ID": 25,
+}
+
+class _Account:
+    def __init__(self):
+        self.sequence_number = 0
+        # octas, moved by the faucet and transfers only; gas is not charged
+        self.balance = 0
+        # committed transactions by sequence number
+        self.committed: Dict[int, dict] = {}
+
+class _Pending:
+    def __init__(self, tx_hash: str, sender: str, signed: SignedTransaction):
+        self.tx_hash = tx_hash
+        self.sender = sender
+        self.signed = signed
+
+def _validation_error(code: str) -> Dict[str, Any]:
+    return {
+        "message": f"Invalid transaction: Type: Validation Code: {code}",
+        "error_code": "vm_error",
+        "vm_error_code": VALIDATION_CODES[code],
+    }
+
+class LocalNode:
+    """
+    In-memory stand-in for an Aptos fullnode that hosts AptosTrust.
+
+    It serves the part of the /v1 REST API that RestClient and AptosSDKPlus use:
+    ledger info, accounts, transactions by version, account transactions,
+    transaction by hash, BCS submit, batch submit and BCS views. Submitted transactions wait in a mempool and are
+    executed every `block_time` seconds in sequence-number order, up to
+    `block_size` per block, against an in-memory AptosTrust at `module`. Accounts
+    exist on first use with sequence number 0. POST /mint is a faucet on the same
+    port (FaucetClient with the node url minus /v1), and 0x1::aptos_account
+    transfer/batch_transfer and the 0x1::coin::balance view move and read balances.
+
+    `latency` (plus up to `jitter`) delays every response, `failure_rate` answers
+    that share of requests with 503, and `drop_rate` silently drops that share of
+    accepted transactions so they never commit. app() can be called again with
+    other fault settings to serve the same ledger from several ports. Views are served at the latest
+    version only; older versions answer 410 like a node without history.
+    """
+
+    def __init__(
+            self,
+            module: str,
+            chain_id: int = 4,
+            block_time: float = 0.25,
+            block_size: int = 1000,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            failure_rate: float = 0.0,
+            drop_rate: float = 0.0,
+            verify_signatures: bool = True,
+            seed: Optional[int] = None
+        ):
+        address, name = module.split("::")
+        self.module_address = AccountAddress.from_str_relaxed(address)
+        self.module_name = name
+        self.trust = AptosTrust(f"{self.module_address}::{name}", str(self.module_address))
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.block_size = block_size
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.verify_signatures = verify_signatures
+        self.random = random.Random(seed)
+        self.version = 0
+        self.block_height = 0
+        self.timestamp_usecs = int(time.time() * 1_000_000)
+        self.accounts: Dict[str, _Account] = {}
+        # sender => sequence number => pending transaction
+        self.mempool: Dict[str, Dict[int, _Pending]] = {}
+        self.by_hash: Dict[str, dict] = {}
+        # committed transactions by version, block metadata included; version 0 is genesis
+        # so that every version up to the latest exists and pages come back full
+        self.transactions: Dict[int, dict] = {
+            0: {
+                "type": "genesis_transaction",
+                "version": "0",
+                "success": True,
+                "vm_status": "Executed successfully",
+                "events": [],
+            },
+        }
+        self.submitted = 0
+        self.committed = 0
+        # faucet mints committed with the next block, (tx_hash, address, amount)
+        self._mints: List[Tuple[str, str, int]] = []
+        self._producer: Optional[asyncio.Task] = None
+        self._apps = 0
+
+    def app(
+            self,
+            latency: Optional[float] = None,
+            jitter: Optional[float] = None,
+            failure_rate: Optional[float] = None
+        ) -> web.Application:
+        # every app serves the same ledger; one built with its own latency, jitter or
+        # failure_rate stands in for another fullnode in front of it
+        @web.middleware
+        async def inject(request: web.Request, handler):
+            return await self._inject(
+                request,
+                handler,
+                self.latency if latency is None else latency,
+                self.jitter if jitter is None else jitter,
+                self.failure_rate if failure_rate is None else failure_rate,
+            )
+
+        app = web.Application(middlewares=[inject])
+        app.add_routes([
+            web.get("/v1", self.handle_info),
+            web.get("/v1/", self.handle_info),
+            web.get("/v1/accounts/{address}", self.handle_account),
+            web.get("/v1/accounts/{address}/transactions", self.handle_account_transactions),
+            web.get("/v1/transactions", self.handle_transactions),
+            web.get("/v1/transactions/by_hash/{hash}", self.handle_by_hash),
+            web.post("/v1/transactions", self.handle_submit),
+            web.post("/v1/transactions/batch", self.handle_submit_batch),
+            web.post("/v1/view", self.handle_view),
+            web.post("/mint", self.handle_mint),
+        ])
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def _start(self, app: web.Application):
+        # blocks are produced while any app of this node is running
+        self._apps += 1
+        if self._producer is None:
+            self._producer = asyncio.ensure_future(self._produce_blocks())
+
+    async def _stop(self, app: web.Application):
+        self._apps -= 1
+        if self._apps == 0 and self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+
+    async def _inject(self, request: web.Request, handler, latency: float, jitter: float, failure_rate: float):
+        if latency or jitter:
+            await asyncio.sleep(latency + self.random.random() * jitter)
+        if failure_rate and self.random.random() < failure_rate:
+            return web.json_response({"message": "injected failure", "error_code": "internal_error"}, status=503)
+        response = await handler(request)
+        response.headers["X-Aptos-Chain-Id"] = str(self.chain_id)
+        response.headers["X-Aptos-Ledger-Version"] = str(self.version)
+        response.headers["X-Aptos-Block-Height"] = str(self.block_height)
+        response.headers["X-Aptos-Ledger-TimestampUsec"] = str(self.timestamp_usecs)
+        return response
+
+    def account_of(self, address: str) -> _Account:
+        if address not in self.accounts:
+            self.accounts[address] = _Account()
+        return self.accounts[address]
+
+    # handlers
+
+    async def handle_info(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "chain_id": self.chain_id,
+            "epoch": "1",
+            "ledger_version": str(self.version),
+            "oldest_ledger_version": "0",
+            "ledger_timestamp": str(self.timestamp_usecs),
+            "node_role": "full_node",
+            "oldest_block_height": "0",
+            "block_height": str(self.block_height),
+        })
+
+    async def handle_account(self, request: web.Request) -> web.Response:
+        address = str(AccountAddress.from_str_relaxed(request.match_info["address"]))
+        account = self.account_of(address)
+        return web.json_response({
+            "sequence_number": str(account.sequence_number),
+            "authentication_key": address,
+        })
+
+    async def handle_account_transactions(self, request: web.Request) -> web.Response:
+        address = str(AccountAddress.from_str_relaxed(request.match_info["address"]))
+        account = self.accounts.get(address)
+        if account is None:
+            return web.json_response({"message": f"Account not found by Address({address})", "error_code": "account_not_found"}, status=404)
+        limit = int(request.query.get("limit", 25))
+        start = int(request.query.get("start", max(account.sequence_number - limit, 0)))
+        transactions = []
+        for sequence_number in range(start, min(start + limit, account.sequence_number)):
+            transactions.append(account.committed[sequence_number])
+        return web.json_response(transactions)
+
+    async def handle_transactions(self, request: web.Request) -> web.Response:
+        limit = min(int(request.query.get("limit", 25)), TRANSACTIONS_PAGE_LIMIT)
+        start = int(request.query.get("start", max(self.version - limit + 1, 0)))
+        transactions = [
+            self.transactions[version]
+            for version in range(start, min(start + limit, self.version + 1))
+            if version in self.transactions
+        ]
+        return web.json_response(transactions)
+
+    async def handle_by_hash(self, request: web.Request) -> web.Response:
+        tx_hash = request.match_info["hash"]
+        tx = self.by_hash.get(tx_hash)
+        if tx is None:
+            return web.json_response({"message": f"Transaction not found by Transaction hash({tx_hash})", "error_code": "transaction_not_found"}, status=404)
+        return web.json_response(tx)
+
+    async def handle_submit(self, request: web.Request) -> web.Response:
+        tx_hash, error = self.accept(await request.read())
+        if error is not None:
+            return web.json_response(error, status=400)
+        return web.json_response(self.by_hash[tx_hash], status=202)
+
+    async def handle_submit_batch(self, request: web.Request) -> web.Response:
+        deserializer = Deserializer(await request.read())
+        failures = []
+        for index in range(deserializer.uleb128()):
+            signed = SignedTransaction.deserialize(deserializer)
+            # BCS is canonical, re-encoding gives back the submitted bytes
+            _, error = self.accept_signed(signed, signed.bytes())
+            if error is not None:
+                failures.append({"error": error, "transaction_index": index})
+        return web.json_response({"transaction_failures": failures}, status=206 if failures else 202)
+
+    async def handle_view(self, request: web.Request) -> web.Response:
+        ledger_version = request.query.get("ledger_version")
+        if ledger_version is not None:
+            if int(ledger_version) < self.version:
+                return web.json_response({"message": f"Ledger version({ledger_version}) has been pruned", "error_code": "version_pruned"}, status=410)
+            if int(ledger_version) > self.version:
+                return web.json_response({"message": f"Ledger version({ledger_version}) not found", "error_code": "version_not_found"}, status=404)
+        entry_function = EntryFunction.deserialize(Deserializer(await request.read()))
+        if f"{entry_function.module}::{entry_function.function}" == "0x1::coin::balance":
+            address = str(Deserializer(entry_function.args[0]).struct(AccountAddress))
+            account = self.accounts.get(address)
+            return web.json_response([str(account.balance if account is not None else 0)])
+        view = self._resolve(entry_function)
+        if view is None or entry_function.function not in self.trust.views:
+            return web.json_response({"message": f"could not find view function {entry_function.function}", "error_code": "invalid_input"}, status=400)
+        try:
+            result = self.trust.views[entry_function.function](entry_function.args)
+        except MoveAbort as e:
+            return web.json_response({"message": str(e), "error_code": "invalid_input", "vm_error_code": 4016}, status=400)
+        return web.json_response(result)
+
+    async def handle_mint(self, request: web.Request) -> web.Response:
+        # the faucet API: creates the account and credits it, the hash commits with the next block
+        address = str(AccountAddress.from_str_relaxed(request.query["address"]))
+        amount = int(request.query["amount"])
+        tx_hash = "0x" + hashlib.sha3_256(f"mint:{address}:{amount}:{len(self._mints)}:{self.version}".encode()).hexdigest()
+        self.account_of(address)
+        self._mints.append((tx_hash, address, amount))
+        self.by_hash[tx_hash] = {"type": "pending_transaction", "hash": tx_hash, "sender": "0x1"}
+        return web.json_response([tx_hash])
+
+    def _resolve(self, entry_function: EntryFunction) -> Optional[str]:
+        module = entry_function.module
+        if module.address != self.module_address or module.name != self.module_name:
+            return None
+        return entry_function.function
+
+    # mempool and execution
+
+    def accept(self, data: bytes) -> Tuple[str, Optional[Dict[str, Any]]]:
+        return self.accept_signed(SignedTransaction.deserialize(Deserializer(data)), data)
+
+    def accept_signed(self, signed: SignedTransaction, data: bytes) -> Tuple[str, Optional[Dict[str, Any]]]:
+        raw = signed.transaction
+        tx_hash = "0x" + hashlib.sha3_256(TRANSACTION_HASH_PREFIX + b"\x00" + data).hexdigest()
+        if self.verify_signatures and not signed.verify():
+            return tx_hash, _validation_error("INVALID_SIGNATURE")
+        if raw.chain_id != self.chain_id:
+            return tx_hash, _validation_error("BAD_CHAIN_ID")
+        if raw.expiration_timestamps_secs * 1_000_000 <= self.timestamp_usecs:
+            return tx_hash, _validation_error("TRANSACTION_EXPIRED")
+        sender = str(raw.sender)
+        account = self.account_of(sender)
+        if raw.sequence_number < account.sequence_number:
+            return tx_hash, _validation_error("SEQUENCE_NUMBER_TOO_OLD")
+        if raw.sequence_number >= account.sequence_number + MEMPOOL_SENDER_LIMIT:
+            return tx_hash, _validation_error("SEQUENCE_NUMBER_TOO_NEW")
+        pending = self.mempool.setdefault(sender, {})
+        existing = pending.get(raw.sequence_number)
+        if existing is not None and existing.signed.transaction.expiration_timestamps_secs * 1_000_000 <= self.timestamp_usecs:
+            # an expired transaction behind a gap no longer holds its sequence number
+            self.by_hash.pop(existing.tx_hash, None)
+            existing = None
+        if existing is not None and existing.tx_hash != tx_hash:
+            return tx_hash, {"message": "Transaction already in mempool with a different payload", "error_code": "mempool_is_full"}
+
+        self.submitted += 1
+        self.by_hash[tx_hash] = {
+            "type": "pending_transaction",
+            "hash": tx_hash,
+            "sender": sender,
+            "sequence_number": str(raw.sequence_number),
+            "max_gas_amount": str(raw.max_gas_amount),
+            "gas_unit_price": str(raw.gas_unit_price),
+            "expiration_timestamp_secs": str(raw.expiration_timestamps_secs),
+        }
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            # accepted but lost before reaching a block
+            return tx_hash, None
+        pending[raw.sequence_number] = _Pending(tx_hash, sender, signed)
+        return tx_hash, None
+
+    async def _produce_blocks(self):
+        while True:
+            await asyncio.sleep(self.block_time)
+            self.produce_block()
+
+    def produce_block(self):
+        self.block_height += 1
+        self.timestamp_usecs = max(self.timestamp_usecs + 1, int(time.time() * 1_000_000))
+        # block metadata transaction
+        self.version += 1
+        self.transactions[self.version] = {
+            "type": "block_metadata_transaction",
+            "version": str(self.version),
+            "success": True,
+            "vm_status": "Executed successfully",
+            "timestamp": str(self.timestamp_usecs),
+            "events": [],
+        }
+        for tx_hash, address, amount in self._mints:
+            self.account_of(address).balance += amount
+            self.version += 1
+            tx = {
+                "type": "user_transaction",
+                "version": str(self.version),
+                "hash": tx_hash,
+                "sender": "0x1",
+                "success": True,
+                "vm_status": "Executed successfully",
+                "gas_used": "0",
+                "timestamp": str(self.timestamp_usecs),
+                "payload": {"type": "entry_function_payload", "function": "0x1::aptos_coin::mint"},
+                "events": [],
+            }
+            self.by_hash[tx_hash] = tx
+            self.transactions[self.version] = tx
+        self._mints = []
+        executed = 0
+        for sender in list(self.mempool):
+            pending = self.mempool[sender]
+            account = self.account_of(sender)
+            while executed < self.block_size and account.sequence_number in pending:
+                entry = pending.pop(account.sequence_number)
+                raw = entry.signed.transaction
+                if raw.expiration_timestamps_secs * 1_000_000 <= self.timestamp_usecs:
+                    # expired in mempool, the sequence number stays free
+                    self.by_hash.pop(entry.tx_hash, None)
+                    continue
+                self.execute(entry)
+                executed += 1
+            # transactions below the sequence number never execute, expired ones behind a gap are collected
+            for sequence_number in [
+                n for n, entry in pending.items()
+                if n < account.sequence_number
+                or entry.signed.transaction.expiration_timestamps_secs * 1_000_000 <= self.timestamp_usecs
+            ]:
+                self.by_hash.pop(pending.pop(sequence_number).tx_hash, None)
+            if not pending:
+                del self.mempool[sender]
+
+    def execute(self, entry: _Pending):
+        raw = entry.signed.transaction
+        account = self.account_of(entry.sender)
+        self.version += 1
+        self.trust.events = []
+        success, vm_status, gas_used = self._run(entry.sender, raw.payload, raw.max_gas_amount)
+        payload = raw.payload.value
+        # module events, like every event of an aborted transaction, are discarded on failure
+        events = [
+            {
+                "guid": {"creation_number": "0", "account_address": "0x0"},
+                "sequence_number": "0",
+                "type": f"{self.module_address}::{self.module_name}::{name}",
+                "data": data,
+            }
+            for name, data in self.trust.events
+        ] if success else []
+        tx = {
+            "type": "user_transaction",
+            "version": str(self.version),
+            "hash": entry.tx_hash,
+            "sender": entry.sender,
+            "sequence_number": str(raw.sequence_number),
+            "max_gas_amount": str(raw.max_gas_amount),
+            "gas_unit_price": str(raw.gas_unit_price),
+            "expiration_timestamp_secs": str(raw.expiration_timestamps_secs),
+            "gas_used": str(gas_used),
+            "success": success,
+            "vm_status": vm_status,
+            "timestamp": str(self.timestamp_usecs),
+            "payload": {
+                "type": "entry_function_payload",
+                "function": f"{payload.module}::{payload.function}" if isinstance(payload, EntryFunction) else "",
+            },
+            "events": events,
+        }
+        account.committed[raw.sequence_number] = tx
+        account.sequence_number += 1
+        self.by_hash[entry.tx_hash] = tx
+        self.transactions[self.version] = tx
+        self.committed += 1
+
+    def _run(self, sender: str, payload: TransactionPayload, max_gas_amount: int) -> Tuple[bool, str, int]:
+        entry_function = payload.value
+        if not isinstance(entry_function, EntryFunction):
+            return False, "FEATURE_UNDER_GATING", GAS_BASE
+        if str(entry_function.module) == "0x1::aptos_account":
+            return self._transfer(sender, entry_function, max_gas_amount)
+        function = self._resolve(entry_function)
+        if function is None or function not in self.trust.entries:
+            return False, "LINKER_ERROR", GAS_BASE
+        gas_used = self._estimate_gas(function, entry_function.args)
+        if gas_used > max_gas_amount:
+            return False, "Out of gas", max_gas_amount
+        try:
+            self.trust.entries[function](sender, entry_function.args, self.block_height)
+        except MoveAbort as e:
+            return False, str(e), gas_used
+        return True, "Executed successfully", gas_used
+
+    def _transfer(self, sender: str, entry_function: EntryFunction, max_gas_amount: int) -> Tuple[bool, str, int]:
+        args = entry_function.args
+        if entry_function.function == "transfer":
+            recipients = [Deserializer(args[0]).struct(AccountAddress)]
+            amounts = [Deserializer(args[1]).u64()]
+        elif entry_function.function == "batch_transfer":
+            recipients = Deserializer(args[0]).sequence(lambda d: d.struct(AccountAddress))
+            amounts = Deserializer(args[1]).sequence(Deserializer.u64)
+        else:
+            return False, "LINKER_ERROR", GAS_BASE
+        gas_used = GAS_BASE + GAS_PER_TRANSFER * len(recipients)
+        if gas_used > max_gas_amount:
+            return False, "Out of gas", max_gas_amount
+        if len(recipients) != len(amounts):
+            return False, "Move abort in 0x1::aptos_account: EMISMATCHING_RECIPIENTS_AND_AMOUNTS_LENGTH(0x10005)", gas_used
+        account = self.account_of(sender)
+        if sum(amounts) > account.balance:
+            return False, "Move abort in 0x1::coin: EINSUFFICIENT_BALANCE(0x10006)", gas_used
+        for recipient, amount in zip(recipients, amounts):
+            account.balance -= amount
+            self.account_of(str(recipient)).balance += amount
+        return True, "Executed successfully", gas_used
+
+    def _estimate_gas(self, function: str, args: List[bytes]) -> int:
+        # the same per-header and per-vote costs the HeaderBatcher plans with
+        if function == "collectHeader":
+            return GAS_BASE + GAS_PER_HEADER + GAS_PER_VOTE * Deserializer(args[4]).uleb128()
+        if function == "collectHeaders":
+            sequences = Deserializer(args[4]).sequence(lambda d: d.sequence(Deserializer.u64))
+            return GAS_BASE + sum(GAS_PER_HEADER + GAS_PER_VOTE * len(s) for s in sequences)
+        return GAS_BASE
+
+def run(node: LocalNode, host: str = "127.0.0.1", port: int = 8080, replica_latencies: List[float] = ()):
+    # each replica latency adds one more port, port + 1 and up, serving the same ledger
+    if not replica_latencies:
+        web.run_app(node.app(), host=host, port=port, print=None)
+        return
+
+    async def serve():
+        runners = []
+        for offset, latency in enumerate([None, *replica_latencies]):
+            runner = web.AppRunner(node.app(latency=latency))
+            await runner.setup()
+            await web.TCPSite(runner, host, port + offset).start()
+            runners.append(runner)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for runner in runners:
+                await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,586 @@
+import heapq
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.bcs import Deserializer
+from sdk.keccak import keccak256
+
+# In-memory AptosTrust with the semantics of sources/AptosTrust.move. An entry
+# function either applies completely or raises MoveAbort before touching state,
+# like a transaction that aborts.
+
+ENOT_MODULE_OWNER = 1
+EVERIFY_HEADER_FAILED = 2
+EINVALID_ROOT_LENGTH = 3
+EBATCH_LENGTH_MISMATCH = 4
+EPAGE_TOO_LARGE = 5
+ENOT_OPERATOR = 6
+EHEADER_PRUNED = 7
+
+ERROR_NAMES = {
+    ENOT_MODULE_OWNER: "ENOT_MODULE_OWNER",
+    EVERIFY_HEADER_FAILED: "EVERIFY_HEADER_FAILED",
+    EINVALID_ROOT_LENGTH: "EINVALID_ROOT_LENGTH",
+    EBATCH_LENGTH_MISMATCH: "EBATCH_LENGTH_MISMATCH",
+    EPAGE_TOO_LARGE: "EPAGE_TOO_LARGE",
+    ENOT_OPERATOR: "ENOT_OPERATOR",
+    EHEADER_PRUNED: "EHEADER_PRUNED",
+}
+
+# big_ordered_map::EKEY_ALREADY_EXISTS
+EKEY_ALREADY_EXISTS = 1
+
+MAX_VIEW_PAGE = 100
+
+CHECK_UNINIT = 0
+CHECK_VOTE_OK = 1
+CHECK_VOTE_NOT_ENOUGH = 2
+CHECK_NOT_EXIST = 3
+CHECK_PRUNED = 4
+
+class MoveAbort(Exception):
+    def __init__(self, location: str, code: int, name: str = ""):
+        super().__init__(f"Move abort in {location}: {name}(0x{code:x}): " if name else f"Move abort in {location}: 0x{code:x}")
+        self.location = location
+        self.code = code
+
+class _OrderedKeys:
+    """Min-heap over the keys of a dict, removed keys are skipped lazily"""
+
+    def __init__(self):
+        self._heap: List[int] = []
+
+    def push(self, key: int):
+        heapq.heappush(self._heap, key)
+
+    def front(self, live: Dict[int, Any]) -> Optional[int]:
+        while self._heap and self._heap[0] not in live:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+class ChainHeaders:
+    def __init__(self):
+        self.count = 0
+        self.latest = 0
+        # height => (relayHeight, root)
+        self.headers: Dict[int, Tuple[int, bytes]] = {}
+        self.order = _OrderedKeys()
+        self.pruned = 0
+        self.prunedTo = 0
+        # pruned height => relayHeight, at most Retention.keep of the latest
+        self.anchors: Dict[int, int] = {}
+        self.anchorsOrder = _OrderedKeys()
+        self.expired = 0
+        self.expiredTo = 0
+
+class Checkpoint:
+    def __init__(self):
+        self.count = 0
+        self.height = 0
+        self.hcr = b""
+        self.votes = 0
+
+class Retention:
+    def __init__(self, window: int, step: int, keep: int):
+        self.window = window
+        self.step = step
+        self.keep = keep
+        self.checkpoint = Checkpoint()
+        self.pruned = 0
+        self.prunedTo = 0
+        # pruned relay height => reached quorum, pruned in height order so the dict is ordered
+        self.verdicts: Dict[int, bool] = {}
+        self.expired = 0
+        self.expiredTo = 0
+
+def _u64_vector(deserializer: Deserializer) -> List[int]:
+    return deserializer.sequence(Deserializer.u64)
+
+def _bytes_vector(deserializer: Deserializer) -> List[bytes]:
+    return deserializer.sequence(Deserializer.to_bytes)
+
+def _hex(value: bytes) -> str:
+    return "0x" + value.hex()
+
+class AptosTrust:
+    def __init__(self, location: str, owner: str):
+        # location is "<address>::AptosTrust" as it shows in abort messages
+        self.location = location
+        self.owner = owner
+        self.paraChains: Optional[Dict[int, bool]] = None
+        self.operators: Optional[Dict[str, bool]] = None
+        self.allHeaders: Optional[Dict[int, ChainHeaders]] = None
+        self.votes: Optional[Dict[int, int]] = None
+        self.votesOrder = _OrderedKeys()
+        self.finalized: Dict[int, int] = {}
+        # block height => hcr, blocks only grow so insertion order is height order
+        self.hcrs: Optional[Dict[int, bytes]] = None
+        self.retention: Optional[Retention] = None
+        # (name, data) of the events emitted by the running entry function, in Move JSON encoding
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self.entries: Dict[str, Callable[[str, List[bytes], int], None]] = {
+            "registParaChain": self.registParaChain,
+            "addOperator": self.addOperator,
+            "removeOperator": self.removeOperator,
+            "collectHeader": self.collectHeader,
+            "collectHeaders": self.collectHeaders,
+            "setRetention": self.setRetention,
+            "prune": self.prune,
+            "pruneHeaders": self.pruneHeaders,
+        }
+        self.views: Dict[str, Callable[[List[bytes]], List[Any]]] = {
+            "getParachain": self.getParachain,
+            "getParachainCount": self.getParachainCount,
+            "isOperator": self.isOperator,
+            "getOperatorCount": self.getOperatorCount,
+            "getHeader": self.getHeader,
+            "getChainHeaders": self.getChainHeaders,
+            "getHeaders": self.getHeaders,
+            "getRetention": self.getRetention,
+            "getCheckpoint": self.getCheckpoint,
+            "checkParaHeaderValid": self.checkParaHeaderValid,
+            "checkParaHeadersValid": self.checkParaHeadersValid,
+            "getParaHeaderVotes": self.getParaHeaderVotes,
+            "checkRelayHeaderValid": self.checkRelayHeaderValid,
+            "getRelayHeaderFinality": self.getRelayHeaderFinality,
+            "getRelayHeaderVotes": self.getRelayHeaderVotes,
+            "getRelayHeadersVotes": self.getRelayHeadersVotes,
+            "getHCRs": self.getHCRs,
+        }
+
+    def abort(self, code: int):
+        raise MoveAbort(self.location, code, ERROR_NAMES.get(code, ""))
+
+    def emit(self, name: str, data: Dict[str, Any]):
+        self.events.append((name, data))
+
+    def assertOwner(self, sender: str):
+        if sender != self.owner:
+            self.abort(ENOT_MODULE_OWNER)
+
+    def assertOperator(self, sender: str):
+        if not self.operatorOf(sender):
+            self.abort(ENOT_OPERATOR)
+
+    def operatorOf(self, address: str) -> bool:
+        return address == self.owner or (self.operators is not None and address in self.operators)
+
+    # entry functions, each takes (sender, BCS arguments, current block height)
+
+    def registParaChain(self, sender: str, args: List[bytes], current_height: int):
+        chainId = Deserializer(args[0]).u64()
+        self.assertOwner(sender)
+        if self.paraChains is None:
+            self.paraChains = {}
+        if chainId in self.paraChains:
+            return
+        self.paraChains[chainId] = True
+        self.emit("ParaChainRegistered", {"chainId": str(chainId), "count": str(len(self.paraChains))})
+
+    def addOperator(self, sender: str, args: List[bytes], current_height: int):
+        operator = str(AccountAddress.deserialize(Deserializer(args[0])))
+        self.assertOwner(sender)
+        # the Move code creates the storage of the collect path here
+        if self.votes is None:
+            self.votes = {}
+        if self.allHeaders is None:
+            self.allHeaders = {}
+        if self.hcrs is None:
+            self.hcrs = {}
+        if self.operators is None:
+            self.operators = {}
+        if operator == self.owner or operator in self.operators:
+            return
+        self.operators[operator] = True
+        self.emit("OperatorUpdated", {"operator": operator, "authorized": True})
+
+    def removeOperator(self, sender: str, args: List[bytes], current_height: int):
+        operator = str(AccountAddress.deserialize(Deserializer(args[0])))
+        self.assertOwner(sender)
+        if self.operators is None or operator not in self.operators:
+            return
+        del self.operators[operator]
+        self.emit("OperatorUpdated", {"operator": operator, "authorized": False})
+
+    def collectHeader(self, sender: str, args: List[bytes], current_height: int):
+        chainId = Deserializer(args[0]).u64()
+        height = Deserializer(args[1]).u64()
+        root = Deserializer(args[2]).to_bytes()
+        sequences = _u64_vector(Deserializer(args[4]))
+        # countVotes returns before creating VotesByHeight when there is nothing to count
+        self._collect(sender, [chainId], [height], [root], [sequences], current_height, initVotes=bool(sequences))
+
+    def collectHeaders(self, sender: str, args: List[bytes], current_height: int):
+        chainIds = _u64_vector(Deserializer(args[0]))
+        heights = _u64_vector(Deserializer(args[1]))
+        roots = _bytes_vector(Deserializer(args[2]))
+        hcrs = _bytes_vector(Deserializer(args[3]))
+        sequences = Deserializer(args[4]).sequence(_u64_vector)
+        self.assertOperator(sender)
+        length = len(chainIds)
+        if any(len(v) != length for v in (heights, roots, hcrs, sequences)):
+            self.abort(EBATCH_LENGTH_MISMATCH)
+        self._collect(sender, chainIds, heights, roots, sequences, current_height)
+
+    def _collect(
+            self,
+            sender: str,
+            chainIds: List[int],
+            heights: List[int],
+            roots: List[bytes],
+            sequences: List[List[int]],
+            current_height: int,
+            initVotes: bool = True
+        ):
+        self.assertOperator(sender)
+        # every abort of the Move code is checked before anything is written
+        seen = set()
+        for chainId, height, root in zip(chainIds, heights, roots):
+            key = (chainId, height)
+            chain = self.allHeaders.get(chainId) if self.allHeaders is not None else None
+            if chain is not None and (height in chain.anchors or (chain.expired > 0 and height <= chain.expiredTo)):
+                self.abort(EHEADER_PRUNED)
+            if key in seen or (chain is not None and height in chain.headers):
+                raise MoveAbort("0x1::big_ordered_map", EKEY_ALREADY_EXISTS, "EKEY_ALREADY_EXISTS")
+            seen.add(key)
+            if len(root) != 32:
+                self.abort(EINVALID_ROOT_LENGTH)
+
+        if self.votes is None and initVotes:
+            self.votes = {}
+        if self.allHeaders is None:
+            self.allHeaders = {}
+        if self.hcrs is None:
+            self.hcrs = {}
+        totalParachains = self.parachainCount()
+        firstOpen = self.firstOpenRelayHeight()
+        for chainId, height, root, chainSequences in zip(chainIds, heights, roots, sequences):
+            if chainSequences:
+                self.countVotesInto(chainSequences, firstOpen, totalParachains, current_height)
+            self.storeHeaderInto(chainId, height, root, current_height)
+            self.buildInto(root, current_height)
+        self.pruneStep(chainIds, current_height)
+
+    def countVotesInto(self, sequences: List[int], firstOpen: int, totalParachains: int, current_height: int):
+        relayHeights = []
+        totals = []
+        for relayHeight in sequences:
+            # the result of a pruned relay height is final
+            if relayHeight < firstOpen:
+                continue
+            if relayHeight not in self.votes:
+                self.votes[relayHeight] = 0
+                self.votesOrder.push(relayHeight)
+            self.votes[relayHeight] += 1
+            relayHeights.append(str(relayHeight))
+            totals.append(str(self.votes[relayHeight]))
+            if totalParachains > 0 and hasQuorum(self.votes[relayHeight], totalParachains) and relayHeight not in self.finalized:
+                self.finalized[relayHeight] = current_height
+                self.emit("RelayHeaderFinalized", {
+                    "relayHeight": str(relayHeight),
+                    "finalizedAt": str(current_height),
+                    "votes": str(self.votes[relayHeight]),
+                })
+        if relayHeights:
+            self.emit("VotesCounted", {"relayHeights": relayHeights, "votes": totals})
+
+    def storeHeaderInto(self, chainId: int, height: int, root: bytes, relayHeight: int):
+        if chainId not in self.allHeaders:
+            self.allHeaders[chainId] = ChainHeaders()
+        chain = self.allHeaders[chainId]
+        chain.headers[height] = (relayHeight, root)
+        chain.order.push(height)
+        chain.count += 1
+        if height > chain.latest:
+            chain.latest = height
+        self.emit("HeaderCollected", {
+            "chainId": str(chainId),
+            "height": str(height),
+            "relayHeight": str(relayHeight),
+            "root": _hex(root),
+        })
+
+    def buildInto(self, root: bytes, current_height: int):
+        if current_height in self.hcrs:
+            self.hcrs[current_height] = keccak256(self.hcrs[current_height] + root)
+        else:
+            self.hcrs[current_height] = root
+
+    def setRetention(self, sender: str, args: List[bytes], current_height: int):
+        window = Deserializer(args[0]).u64()
+        step = Deserializer(args[1]).u64()
+        keep = Deserializer(args[2]).u64()
+        self.assertOwner(sender)
+        if self.retention is None:
+            self.retention = Retention(window, step, keep)
+            return
+        self.retention.window = window
+        self.retention.step = step
+        self.retention.keep = keep
+
+    def prune(self, sender: str, args: List[bytes], current_height: int):
+        maxHeights = Deserializer(args[0]).u64()
+        self.assertOwner(sender)
+        self.pruneRelayHeights(maxHeights, current_height)
+
+    def pruneHeaders(self, sender: str, args: List[bytes], current_height: int):
+        chainIds = _u64_vector(Deserializer(args[0]))
+        maxHeaders = Deserializer(args[1]).u64()
+        self.assertOwner(sender)
+        self.pruneHeadersOf(chainIds, maxHeaders)
+
+    def pruneStep(self, chainIds: List[int], current_height: int):
+        if self.retention is None or self.retention.step == 0:
+            return
+        self.pruneRelayHeights(self.retention.step, current_height)
+        self.pruneHeadersOf(chainIds, self.retention.step)
+
+    def pruneRelayHeights(self, maxHeights: int, current_height: int) -> int:
+        if self.retention is None or self.hcrs is None:
+            return 0
+        window = self.retention.window
+        if window == 0 or current_height <= window:
+            return 0
+        if self.votes is None:
+            self.votes = {}
+        cutoff = current_height - window
+        retention = self.retention
+        pruned = 0
+        # relay heights with an HCR or votes, oldest first
+        while pruned < maxHeights:
+            candidates = [h for h in (next(iter(self.hcrs), None), self.votesOrder.front(self.votes)) if h is not None]
+            if not candidates or min(candidates) >= cutoff:
+                break
+            relayHeight = min(candidates)
+            totalVotes = self.votes.pop(relayHeight, 0)
+            accepted = self.finalized.pop(relayHeight, None) is not None
+            if relayHeight in self.hcrs:
+                hcr = self.hcrs.pop(relayHeight)
+                checkpoint = retention.checkpoint
+                checkpoint.hcr = hcr if checkpoint.count == 0 else keccak256(checkpoint.hcr + hcr)
+                checkpoint.count += 1
+                checkpoint.height = relayHeight
+                checkpoint.votes = totalVotes
+            retention.verdicts[relayHeight] = accepted
+            retention.pruned += 1
+            retention.prunedTo = relayHeight
+            while retention.keep > 0 and retention.pruned - retention.expired > retention.keep:
+                retention.expiredTo = next(iter(retention.verdicts))
+                del retention.verdicts[retention.expiredTo]
+                retention.expired += 1
+            pruned += 1
+        return pruned
+
+    def pruneHeadersOf(self, chainIds: List[int], maxHeaders: int) -> int:
+        if self.retention is None or self.allHeaders is None:
+            return 0
+        pruned = 0
+        for chainId in chainIds:
+            if pruned < maxHeaders and chainId in self.allHeaders:
+                pruned += self.pruneChainHeadersInto(self.allHeaders[chainId], maxHeaders - pruned)
+        return pruned
+
+    def pruneChainHeadersInto(self, chain: ChainHeaders, maxHeaders: int) -> int:
+        retention = self.retention
+        if retention.pruned == 0:
+            return 0
+        pruned = 0
+        # headers anchored at pruned relay heights, lowest height first
+        while pruned < maxHeaders:
+            height = chain.order.front(chain.headers)
+            if height is None:
+                break
+            relayHeight = chain.headers[height][0]
+            if relayHeight > retention.prunedTo:
+                break
+            del chain.headers[height]
+            chain.anchors[height] = relayHeight
+            chain.anchorsOrder.push(height)
+            chain.count -= 1
+            chain.pruned += 1
+            chain.prunedTo = max(chain.prunedTo, height)
+            while retention.keep > 0 and chain.pruned - chain.expired > retention.keep:
+                expiredTo = chain.anchorsOrder.front(chain.anchors)
+                del chain.anchors[expiredTo]
+                chain.expired += 1
+                chain.expiredTo = max(chain.expiredTo, expiredTo)
+            pruned += 1
+        return pruned
+
+    def firstOpenRelayHeight(self) -> int:
+        if self.retention is None or self.retention.pruned == 0:
+            return 0
+        return self.retention.prunedTo + 1
+
+    def prunedRelayVerdict(self, relayHeight: int) -> Optional[int]:
+        retention = self.retention
+        if retention.pruned == 0 or relayHeight > retention.prunedTo:
+            return None
+        if relayHeight in retention.verdicts:
+            return CHECK_VOTE_OK if retention.verdicts[relayHeight] else CHECK_VOTE_NOT_ENOUGH
+        if retention.expired > 0 and relayHeight <= retention.expiredTo:
+            return CHECK_PRUNED
+        # never carried a header or a vote
+        return CHECK_NOT_EXIST
+
+    def prunedHeaderVerdict(self, chainId: int, height: int) -> Optional[int]:
+        chain = self.allHeaders.get(chainId)
+        if chain is None:
+            return None
+        if height in chain.anchors:
+            verdict = self.prunedRelayVerdict(chain.anchors[height])
+            return CHECK_PRUNED if verdict is None else verdict
+        if chain.expired > 0 and height <= chain.expiredTo:
+            return CHECK_PRUNED
+        return None
+
+    def findHeader(self, chainId: int, height: int) -> Optional[Tuple[int, bytes]]:
+        chain = self.allHeaders.get(chainId)
+        if chain is None:
+            return None
+        return chain.headers.get(height)
+
+    # views, each takes the BCS arguments and returns the JSON values the node responds with
+
+    def getParachain(self, args: List[bytes]) -> List[Any]:
+        chainId = Deserializer(args[0]).u64()
+        return [self.paraChains is not None and chainId in self.paraChains]
+
+    def getParachainCount(self, args: List[bytes]) -> List[Any]:
+        return [str(self.parachainCount())]
+
+    def isOperator(self, args: List[bytes]) -> List[Any]:
+        return [self.operatorOf(str(AccountAddress.deserialize(Deserializer(args[0]))))]
+
+    def getOperatorCount(self, args: List[bytes]) -> List[Any]:
+        return [str(len(self.operators) if self.operators is not None else 0)]
+
+    def parachainCount(self) -> int:
+        return len(self.paraChains) if self.paraChains is not None else 0
+
+    def getHeader(self, args: List[bytes]) -> List[Any]:
+        chainId = Deserializer(args[0]).u64()
+        height = Deserializer(args[1]).u64()
+        header = self.findHeader(chainId, height) if self.allHeaders is not None else None
+        if header is None:
+            return ["0", "0x"]
+        return [str(header[0]), _hex(header[1])]
+
+    def getChainHeaders(self, args: List[bytes]) -> List[Any]:
+        chainId = Deserializer(args[0]).u64()
+        if self.allHeaders is None or chainId not in self.allHeaders:
+            return ["0", "0"]
+        chain = self.allHeaders[chainId]
+        return [str(chain.count), str(chain.latest)]
+
+    def getHeaders(self, args: List[bytes]) -> List[Any]:
+        chainId = Deserializer(args[0]).u64()
+        start = Deserializer(args[1]).u64()
+        end = Deserializer(args[2]).u64()
+        heights, relayHeights, roots = [], [], []
+        if start < end and self.allHeaders is not None and chainId in self.allHeaders:
+            headers = self.allHeaders[chainId].headers
+            # the first MAX_VIEW_PAGE stored heights from start on, like the Move iterator
+            for height in heapq.nsmallest(MAX_VIEW_PAGE, (h for h in headers if start <= h < end)):
+                relayHeight, root = headers[height]
+                heights.append(str(height))
+                relayHeights.append(str(relayHeight))
+                roots.append(_hex(root))
+        return [heights, relayHeights, roots]
+
+    def getRetention(self, args: List[bytes]) -> List[Any]:
+        if self.retention is None:
+            return ["0", "0", "0"]
+        return [str(self.retention.window), str(self.retention.step), str(self.retention.keep)]
+
+    def getCheckpoint(self, args: List[bytes]) -> List[Any]:
+        if self.retention is None:
+            return ["0", "0", "0x", "0"]
+        checkpoint = self.retention.checkpoint
+        return [str(checkpoint.count), str(checkpoint.height), _hex(checkpoint.hcr), str(checkpoint.votes)]
+
+    def paraHeaderStatus(self, chainId: int, height: int) -> int:
+        if self.allHeaders is None:
+            return CHECK_UNINIT
+        header = self.findHeader(chainId, height)
+        if header is None:
+            verdict = self.prunedHeaderVerdict(chainId, height) if self.retention is not None else None
+            return CHECK_NOT_EXIST if verdict is None else verdict
+        relayHeight = header[0]
+        if self.votes is None:
+            # the Move view asserts VotesByHeight exists
+            raise MoveAbort(self.location, 0)
+        if relayHeight in self.finalized:
+            return CHECK_VOTE_OK
+        verdict = self.prunedRelayVerdict(relayHeight) if self.retention is not None else None
+        return CHECK_VOTE_NOT_ENOUGH if verdict is None else verdict
+
+    def checkParaHeaderValid(self, args: List[bytes]) -> List[Any]:
+        chainId = Deserializer(args[0]).u64()
+        height = Deserializer(args[1]).u64()
+        return [str(self.paraHeaderStatus(chainId, height))]
+
+    def checkParaHeadersValid(self, args: List[bytes]) -> List[Any]:
+        chainIds = _u64_vector(Deserializer(args[0]))
+        heights = _u64_vector(Deserializer(args[1]))
+        if len(chainIds) != len(heights):
+            self.abort(EBATCH_LENGTH_MISMATCH)
+        if len(chainIds) > MAX_VIEW_PAGE:
+            self.abort(EPAGE_TOO_LARGE)
+        return [[str(self.paraHeaderStatus(chainId, height)) for chainId, height in zip(chainIds, heights)]]
+
+    def getParaHeaderVotes(self, args: List[bytes]) -> List[Any]:
+        chainId = Deserializer(args[0]).u64()
+        height = Deserializer(args[1]).u64()
+        if self.allHeaders is None:
+            raise MoveAbort(self.location, 0)
+        header = self.findHeader(chainId, height)
+        if header is None:
+            return [str(CHECK_NOT_EXIST)]
+        if self.votes is None or header[0] not in self.votes:
+            # borrow of a missing key in the Move view
+            raise MoveAbort("0x1::big_ordered_map", 2)
+        return [str(self.votes[header[0]])]
+
+    def checkRelayHeaderValid(self, args: List[bytes]) -> List[Any]:
+        relayHeight = Deserializer(args[0]).u64()
+        if self.votes is None:
+            return [str(CHECK_UNINIT)]
+        if relayHeight in self.finalized:
+            return [str(CHECK_VOTE_OK)]
+        if relayHeight in self.votes:
+            return [str(CHECK_VOTE_NOT_ENOUGH)]
+        verdict = self.prunedRelayVerdict(relayHeight) if self.retention is not None else None
+        return [str(CHECK_NOT_EXIST if verdict is None else verdict)]
+
+    def getRelayHeaderFinality(self, args: List[bytes]) -> List[Any]:
+        relayHeight = Deserializer(args[0]).u64()
+        if relayHeight not in self.finalized:
+            return [False, "0"]
+        return [True, str(self.finalized[relayHeight])]
+
+    def getRelayHeaderVotes(self, args: List[bytes]) -> List[Any]:
+        relayHeight = Deserializer(args[0]).u64()
+        maxVotes = self.parachainCount()
+        votes = self.votes.get(relayHeight, 0) if self.votes is not None else 0
+        return [str(votes), str(maxVotes)]
+
+    def getRelayHeadersVotes(self, args: List[bytes]) -> List[Any]:
+        relayHeights = _u64_vector(Deserializer(args[0]))
+        if len(relayHeights) > MAX_VIEW_PAGE:
+            self.abort(EPAGE_TOO_LARGE)
+        maxVotes = self.parachainCount()
+        votes = self.votes if self.votes is not None else {}
+        return [[str(votes.get(h, 0)) for h in relayHeights], str(maxVotes)]
+
+    def getHCRs(self, args: List[bytes]) -> List[Any]:
+        start = Deserializer(args[0]).u64()
+        end = Deserializer(args[1]).u64()
+        relayHeights, hcrs = [], []
+        if start < end and self.hcrs is not None:
+            for relayHeight in heapq.nsmallest(MAX_VIEW_PAGE, (h for h in self.hcrs if start <= h < end)):
+                relayHeights.append(str(relayHeight))
+                hcrs.append(_hex(self.hcrs[relayHeight]))
+        return [relayHeights, hcrs]
+
+def hasQuorum(totalVotes: int, totalParachains: int) -> bool:
+    return totalVotes > totalParachains // 3 * 2
@@ -1,4 +1,5 @@
 import asyncio
+import os
 from typing import List, Tuple
 from aptos_sdk.account import Account
 from aptos_sdk.async_client import FaucetClient, RestClient
@@ -8,12 +9,15 @@ from aptos_sdk import ed25519
 from aptos_sdk.account_address import AccountAddress
 import time
 from sdk.sdk import AptosSDKPlus
+from sdk.headers import HeaderBatcher, ParaHeader
+from sdk.cache import ViewCache
+from sdk.metrics import Metrics
  
-# Network configuration
-NODE_URL = "https://fullnode.devnet.aptoslabs.com/v1"
+# Network configuration, APTOS_NODE_URL/APTOS_TRUST_MODULE point it at a local node (python -m localnode)
+NODE_URL = os.environ.get("APTOS_NODE_URL", "https://fullnode.devnet.aptoslabs.com/v1")
 FAUCET_URL = "https://faucet.devnet.aptoslabs.com"
 
-MODULE = "0x9351b6102cc8a05e5b05fedd1f3f3e44f2f760518aa4d1334914e014d165210a::AptosTrust"
+MODULE = os.environ.get("APTOS_TRUST_MODULE", "0x9351b6102cc8a05e5b05fedd1f3f3e44f2f760518aa4d1334914e014d165210a::AptosTrust")
 
 parachain_height = int(time.time()*1000)
 
@@ -63,8 +67,11 @@ async def registParachain(sdk: AptosSDKPlus, account_from: Account, chainId: int
 async def registAllParachains(sdk: AptosSDKPlus, account_from: Account, chainIds: List[int]):
     print(f"*********************************************************")
     print(f"register all parachains to Aptos(Hub)")
-    for chainId in chainIds:
-        await registParachain(sdk=sdk, account_from=account_from, chainId=chainId)
+    # registrations are in flight together, the sdk confirms them from one polling loop
+    await asyncio.gather(*[
+        registParachain(sdk=sdk, account_from=account_from, chainId=chainId)
+        for chainId in chainIds
+    ])
     print(f"*********************************************************")
 
 async def sendHeaderToRelaychainBy1001(sdk: AptosSDKPlus, account_from: Account) -> Tuple[int, int]:
@@ -111,17 +118,11 @@ async def sendHeaderToRelaychainBy1001(sdk: AptosSDKPlus, account_from: Account)
     print(f"--- Gas used: {gas_used}")
     return height, relayHeight
 
-async def collectHeaderFromEachParachain(
-        sdk: AptosSDKPlus, 
-        account_from: Account, 
-        chainId: int, 
-        height: int, 
-        sequences: List[int]
-    ):
+def collectHeaderEntryFunction(chainId: int, height: int, sequences: List[int]) -> EntryFunction:
     root = [1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8]
     hcr = [1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8]
     # sequences = []
-    entry_function = EntryFunction.natural(
+    return EntryFunction.natural(
         MODULE,  # Module address and name
         "collectHeader",            # Function name
         [],                    # Type arguments (empty for this function)
@@ -133,13 +134,8 @@ async def collectHeaderFromEachParachain(
             TransactionArgument(sequences, Serializer.sequence_serializer(Serializer.u64)), # parachain sequences of relay chain height
         ],
     )
-    success, vm_status, gas_used = await sdk.transact(
-        entry_function=entry_function,
-        account_from=account_from,
-        wait=True
-    )
-    # print(f"Transaction(collectHeaderFromEachParachain) completed with status: {'SUCCESS' if success else 'FAILURE'}")
-    
+
+async def printCollectedHeader(sdk: AptosSDKPlus, chainId: int, height: int, vm_status: str, gas_used: int):
     result = await sdk.view_bcs_payload(
         module=MODULE,
         function="getHeader",
@@ -155,6 +151,22 @@ async def collectHeaderFromEachParachain(
     print(f"--- VM Status: {vm_status}")
     print(f"--- Gas used: {gas_used}")
 
+async def collectHeaderFromEachParachain(
+        sdk: AptosSDKPlus, 
+        account_from: Account, 
+        chainId: int, 
+        height: int, 
+        sequences: List[int]
+    ):
+    entry_function = collectHeaderEntryFunction(chainId, height, sequences)
+    success, vm_status, gas_used = await sdk.transact(
+        entry_function=entry_function,
+        account_from=account_from,
+        wait=True
+    )
+    # print(f"Transaction(collectHeaderFromEachParachain) completed with status: {'SUCCESS' if success else 'FAILURE'}")
+    await printCollectedHeader(sdk, chainId, height, vm_status, gas_used)
+
 async def queryVote(sdk: AptosSDKPlus, account_from: Account, para_chain_id: int, para_chain_height: int, relay_height: int):
     result = await sdk.view_bcs_payload(
         module=MODULE,
@@ -179,9 +191,28 @@ async def collectHeadersFromParachains(
     global parachain_height
     parachain_height += 1
     await queryVote(sdk, account_from, para_chain_id, para_chain_height, relay_height)
+    # headers of every parachain for this round are coalesced into collectHeaders batches,
+    # and the batches go out together in one batch request
+    root = bytes([1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8])
+    hcr = bytes([1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8,1,2,3,4,5,6,7,8])
+    batcher = HeaderBatcher(MODULE)
     for chainId in chainIds:
-        await collectHeaderFromEachParachain(sdk, account_from, chainId, parachain_height, sequences=[relay_height])
-        await queryVote(sdk, account_from, para_chain_id, para_chain_height, relay_height)
+        batcher.add(ParaHeader(chainId, parachain_height, root, hcr, [relay_height]))
+    batches = batcher.drain()
+    results = await sdk.transact_many(
+        entry_functions=[batcher.entry_function(batch) for batch in batches],
+        account_from=account_from,
+        max_gas_amount=batcher.max_gas_amount,
+        wait=True
+    )
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            print(f"Aptos(Hub) rejects {len(batch)} parachain headers(height={parachain_height}): {result}")
+            continue
+        success, vm_status, gas_used = result
+        for header in batch:
+            await printCollectedHeader(sdk, header.chainId, header.height, vm_status, gas_used // len(batch))
+    await queryVote(sdk, account_from, para_chain_id, para_chain_height, relay_height)
     pass
 
 async def evaluate(sdk: AptosSDKPlus, account_from: Account):
@@ -216,7 +247,12 @@ def load_key(key: str) -> Account:
 
 async def main():
     # Initialize the clients
-    sdk = AptosSDKPlus(NODE_URL)
+    # APTOS_METRICS_PORT serves the sdk metrics on http://127.0.0.1:<port>/metrics
+    metrics = None
+    if "APTOS_METRICS_PORT" in os.environ:
+        metrics = Metrics()
+        await metrics.serve(port=int(os.environ["APTOS_METRICS_PORT"]))
+    sdk = AptosSDKPlus(NODE_URL, view_cache=ViewCache(), metrics=metrics)
     
     print("Connected to Aptos devnet")
     
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import os
+import sys
+from aptos_sdk.account import Account
+from aptos_sdk import ed25519
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import FaucetClient
+from sdk.sdk import AptosSDKPlus
+from sdk.keystore import Keystore, account_states, fund_by_transfer, fund_from_faucet
+
+# many operator keys in one keystore, generated, funded and inspected in bulk
+# run from offchain/:
+#   python -m prepare_account.provision generate --count 32
+#   python -m prepare_account.provision fund --amount 100000000                  # devnet faucet
+#   python -m prepare_account.provision fund --funder-key ./prepare_account/testkey/Alice
+#   python -m prepare_account.provision status
+#   python -m prepare_account.provision export --out-dir ./prepare_account/testkey/operators
+# against the local node (python -m localnode ...) add
+#   --node-url http://127.0.0.1:8080/v1 --faucet-url http://127.0.0.1:8080
+
+# Network configuration
+NODE_URL = "https://fullnode.devnet.aptoslabs.com/v1"
+FAUCET_URL = "https://faucet.devnet.aptoslabs.com"
+
+KEYSTORE = "./prepare_account/testkey/operators.jsonl"
+
+def loadKey(path: str) -> Account:
+    with open(path, "r") as f:
+        private_key = ed25519.PrivateKey.from_str(f.read(), strict=False)
+    return Account(AccountAddress.from_key(private_key.public_key()), private_key)
+
+async def main():
+    parser = argparse.ArgumentParser(description="generate, fund and inspect many operator keys")
+    parser.add_argument("command", choices=["generate", "fund", "status", "export"])
+    parser.add_argument("--keystore", default=KEYSTORE)
+    parser.add_argument("--node-url", default=os.environ.get("APTOS_NODE_URL", NODE_URL))
+    parser.add_argument("--faucet-url", default=os.environ.get("APTOS_FAUCET_URL", FAUCET_URL))
+    parser.add_argument("--count", type=int, default=10, help="keys to add with generate")
+    parser.add_argument("--prefix", default="operator", help="name prefix of generated keys")
+    parser.add_argument("--names", nargs="*", help="keys to fund, inspect or export, default all")
+    parser.add_argument("--amount", type=int, default=100_000_000, help="octas per key, 1 APT = 100,000,000 octas")
+    parser.add_argument("--funder-key", help="transfer from this key file instead of using the faucet")
+    parser.add_argument("--parallelism", type=int, default=8, help="faucet requests or status reads at once")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--out-dir", default="./prepare_account/testkey/operators", help="key files written by export")
+    args = parser.parse_args()
+
+    keystore = Keystore(args.keystore)
+    if args.command == "generate":
+        created = keystore.generate(args.count, args.prefix)
+        keystore.save()
+        for entry in created:
+            print(f"{entry.name} {entry.address}")
+        print(f"{len(keystore)} keys in {args.keystore}", file=sys.stderr)
+        return
+
+    entries = list(keystore) if not args.names else [keystore[name] for name in args.names]
+    if not entries:
+        parser.error(f"no keys in {args.keystore}, run generate first")
+    if args.command == "export":
+        for path in keystore.export(args.out_dir, [entry.name for entry in entries]):
+            print(path)
+        return
+
+    sdk = AptosSDKPlus(args.node_url)
+    try:
+        if args.command == "fund":
+            addresses = [entry.address for entry in entries]
+            if args.funder_key:
+                failures = await fund_by_transfer(sdk, loadKey(args.funder_key), addresses, args.amount, args.retries)
+            else:
+                faucet = FaucetClient(args.faucet_url, sdk)
+                failures = await fund_from_faucet(faucet, addresses, args.amount, args.parallelism, args.retries)
+            for address, error in failures.items():
+                print(f"not funded {address}: {error}", file=sys.stderr)
+            print(f"funded {len(addresses) - len(failures)} of {len(addresses)} keys with {args.amount} octas", file=sys.stderr)
+            if failures:
+                sys.exit(1)
+        else:
+            states = await account_states(sdk, entries, args.parallelism)
+            for state in states:
+                print(f"{state.name} {state.address} {state.balance} octas, sequence number {state.sequence_number}")
+            print(f"{sum(1 for s in states if s.balance > 0)} of {len(states)} keys funded", file=sys.stderr)
+    finally:
+        await sdk.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from typing import List, Optional
+from aptos_sdk.account import Account
+from aptos_sdk import ed25519
+from aptos_sdk.account_address import AccountAddress
+from sdk.sdk import AptosSDKPlus
+from sdk.headers import HeaderBatcher, ParaHeader
+from sdk.loadgen import ParachainSimulator
+from sdk.payload import RegistParaChainTemplate
+from sdk.outbox import Outbox
+from sdk.pool import SenderPool
+from sdk.relayer import Relayer, RelayerClosed
+from sdk.shards import ShardedRelayer
+from sdk.signing import SigningPool
+
+# long-running relayer, every parachain produces headers into the relayer until SIGINT/SIGTERM
+# run from offchain/:
+#   python relay.py --node-url <url> --module <addr>::AptosTrust --parachains 1000 --interval 6
+# headers still queued at shutdown are written to --pending and relayed first on the next start,
+# transactions sent but not confirmed are kept in the --journal outbox and resent after a crash.
+# with --shards N the parachains are relayed by N processes, each signing with its share of --operator-keys
+# with --record the node traffic is appended to a log that sdk.replay.ReplayTransport answers from
+
+def loadKey(path: str) -> Account:
+    with open(path, "r") as f:
+        private_key = ed25519.PrivateKey.from_str(f.read(), strict=False)
+    return Account(AccountAddress.from_key(private_key.public_key()), private_key)
+
+def loadPending(path: str) -> List[ParaHeader]:
+    if not os.path.exists(path):
+        return []
+    headers = []
+    with open(path, "r") as f:
+        for line in f:
+            h = json.loads(line)
+            headers.append(ParaHeader(h["chainId"], h["height"], bytes.fromhex(h["root"]), bytes.fromhex(h["hcr"]), h["sequences"]))
+    return headers
+
+def savePending(path: str, headers: List[ParaHeader]):
+    with open(path, "w") as f:
+        for h in headers:
+            f.write(json.dumps({
+                "chainId": h.chainId,
+                "height": h.height,
+                "root": bytes(h.root).hex(),
+                "hcr": bytes(h.hcr).hex(),
+                "sequences": list(h.sequences),
+            }) + "\n")
+
+async def followRelay(simulator: ParachainSimulator, sdk: AptosSDKPlus, interval: float):
+    # the simulated parachains vote for hub blocks the node actually produced
+    while True:
+        simulator.observe_relay(int((await sdk.info())["block_height"]))
+        await asyncio.sleep(interval)
+
+async def produceHeaders(relayer: Relayer | ShardedRelayer, simulator: ParachainSimulator):
+    # stands in for the parachains, headers arrive as the simulation delivers them
+    async for header in simulator:
+        try:
+            # waits while the chain's queue is full, which holds back every chain
+            await relayer.put(header)
+        except RelayerClosed:
+            return
+
+def failures(results: list) -> list:
+    return [r for r in results if isinstance(r, Exception) or not r[0]]
+
+async def exitSetup(sdk: AptosSDKPlus, signingPool: Optional[SigningPool], message: str):
+    print(message, file=sys.stderr)
+    await sdk.close()
+    if signingPool is not None:
+        signingPool.close()
+    sys.exit(1)
+
+def printResult(headers: List[ParaHeader], success: bool, vm_status: str, gas_used: int):
+    if not success:
+        print(f"{len(headers)} headers failed: {vm_status}", file=sys.stderr)
+
+async def main():
+    parser = argparse.ArgumentParser(description="relay parachain headers to AptosTrust until interrupted")
+    parser.add_argument("--node-url", nargs="+", default=os.environ.get("APTOS_NODE_URL", "").split(), help="several urls are load balanced")
+    parser.add_argument("--hedge-after", type=float, help="seconds before a slow read is also sent to another node")
+    parser.add_argument("--module", default=os.environ.get("APTOS_TRUST_MODULE"))
+    parser.add_argument("--key", default="./prepare_account/testkey/Alice", help="key file of the module owner")
+    parser.add_argument("--operator-keys", nargs="*", default=[], help="key files of operators that sign headers instead of the owner")
+    parser.add_argument("--parachains", type=int, default=6)
+    parser.add_argument("--interval", type=float, default=6.0, help="seconds between headers of one parachain")
+    parser.add_argument("--jitter", type=float, default=0.1, help="share of the interval a block may come early or late")
+    parser.add_argument("--reorder-rate", type=float, default=0.0, help="share of headers delivered after later ones")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--queue-size", type=int, default=100, help="queued headers per parachain")
+    parser.add_argument("--inflight", type=int, default=32, help="unconfirmed transactions")
+    parser.add_argument("--gas-budget", type=int, help="estimated gas of unconfirmed transactions")
+    parser.add_argument("--shards", type=int, default=0, help="relayer processes, parachains are split by chainId")
+    parser.add_argument("--sign-workers", type=int, default=0, help="processes that sign transactions, per relayer process")
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0)
+    parser.add_argument("--pending", default="./relay-pending.jsonl", help="headers left at shutdown")
+    parser.add_argument("--journal", default="./relay-outbox.jsonl", help="outbox journal of unconfirmed transactions")
+    parser.add_argument("--record", help="append the node traffic to a log, gzip compressed for .gz")
+    args = parser.parse_args()
+    if not args.node_url or not args.module:
+        parser.error("--node-url and --module (or APTOS_NODE_URL/APTOS_TRUST_MODULE) are required")
+    if args.shards > 1 and len(args.operator_keys) < args.shards:
+        parser.error("--shards needs at least as many --operator-keys")
+    if args.record and args.shards > 0:
+        parser.error("--record covers a single relayer process, not --shards")
+
+    account = loadKey(args.key)
+    # a sharded relayer signs in its own processes, this client only registers and observes
+    signingPool = SigningPool(args.sign_workers) if args.sign_workers > 0 and args.shards < 1 else None
+    sdk = AptosSDKPlus(args.node_url, hedge_after=args.hedge_after, signing_pool=signingPool, record=args.record)
+    chainIds = list(range(1001, 1001 + args.parachains))
+    template = RegistParaChainTemplate(args.module)
+    # both are idempotent, a restart registers and authorizes again; without them
+    # every header the relayer sends would abort
+    failed = failures(await sdk.transact_many([template.chain(chainId) for chainId in chainIds], account))
+    if failed:
+        await exitSetup(sdk, signingPool, f"{len(failed)} of {len(chainIds)} parachain registrations failed: {failed[0]}")
+    sender = account
+    signers = [account]
+    if args.operator_keys:
+        sender = SenderPool(sdk, [loadKey(path) for path in args.operator_keys])
+        signers = sender.operators
+        authorized = await sender.authorize(account, args.module)
+        failed = failures(authorized)
+        if failed:
+            await exitSetup(sdk, signingPool, f"{len(failed)} of {len(authorized)} operator authorizations failed: {failed[0]}")
+    outbox = None
+    recovery = None
+    if args.shards > 0:
+        # every shard keeps and recovers its own outbox next to --journal
+        relayer = ShardedRelayer(
+            args.node_url,
+            signers,
+            HeaderBatcher(args.module),
+            args.shards,
+            queue_size=args.queue_size,
+            max_inflight=args.inflight,
+            gas_budget=args.gas_budget,
+            on_result=printResult,
+            journal=args.journal,
+            hedge_after=args.hedge_after,
+            sign_workers=args.sign_workers,
+        )
+    else:
+        outbox = Outbox(sdk, args.journal)
+        if len(outbox):
+            print(f"resending {len(outbox)} unconfirmed transactions from {args.journal}", file=sys.stderr)
+        recovery = asyncio.ensure_future(outbox.recover(signers))
+        relayer = Relayer(
+            sdk,
+            sender,
+            HeaderBatcher(args.module),
+            queue_size=args.queue_size,
+            max_inflight=args.inflight,
+            gas_budget=args.gas_budget,
+            on_result=printResult,
+            outbox=outbox,
+        )
+    relayer.start()
+    for header in loadPending(args.pending):
+        await relayer.put(header)
+    # the relayer holds them now and saves what is left at shutdown, a crash before
+    # that must not hand the same headers over again on the next start
+    savePending(args.pending, [])
+    simulator = ParachainSimulator(
+        chainIds,
+        block_interval=args.interval,
+        jitter=args.jitter,
+        relay_interval=None,
+        reorder_rate=args.reorder_rate,
+        seed=args.seed,
+    )
+    simulator.observe_relay(int((await sdk.info())["block_height"]))
+    producers = [
+        asyncio.ensure_future(followRelay(simulator, sdk, 1.0)),
+        asyncio.ensure_future(produceHeaders(relayer, simulator)),
+    ]
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    while not stopping.is_set():
+        try:
+            await asyncio.wait_for(stopping.wait(), 10)
+        except asyncio.TimeoutError:
+            print(f"relayer {relayer.stats()}", file=sys.stderr)
+            if sdk.router is not None:
+                print(f"nodes {sdk.router.stats()}", file=sys.stderr)
+            if isinstance(relayer, ShardedRelayer):
+                for shard, error in relayer.errors.items():
+                    print(f"shard {shard} stopped: {error}", file=sys.stderr)
+
+    print("stopping, relaying queued headers", file=sys.stderr)
+    deadline = loop.time() + args.shutdown_timeout
+    left = await relayer.stop(args.shutdown_timeout)
+    for producer in producers:
+        producer.cancel()
+    await asyncio.gather(*producers, return_exceptions=True)
+    savePending(args.pending, left)
+    if outbox is not None:
+        try:
+            # recovery ran alongside the relayer, what it has not resent stays journaled
+            await asyncio.wait_for(recovery, max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            print(f"{len(outbox)} unconfirmed transactions left in {args.journal}", file=sys.stderr)
+        outbox.close()
+    if signingPool is not None:
+        signingPool.close()
+    print(f"relayer {relayer.stats()}, {len(left)} headers saved to {args.pending}", file=sys.stderr)
+    await sdk.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
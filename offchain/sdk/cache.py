@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from aptos_sdk.async_client import ApiError
+from aptos_sdk.transactions import TransactionArgument
+from aptos_sdk.type_tag import TypeTag
+
+ViewKey = Tuple[str, str, Tuple[str, ...], Tuple[bytes, ...], Optional[int]]
+
+# (module, function, ty_args, args, ledger_version) -> (result, ledger version it was read at)
+ViewRequest = Callable[[str, str, List[TypeTag], List[TransactionArgument], Optional[int]], Awaitable[Tuple[Any, int]]]
+
+def view_key(
+        module: str,
+        function: str,
+        ty_args: List[TypeTag],
+        args: List[TransactionArgument],
+        ledger_version: Optional[int] = None
+    ) -> ViewKey:
+    return (
+        module,
+        function,
+        tuple(str(ty_arg) for ty_arg in ty_args),
+        tuple(arg.encode() for arg in args),
+        ledger_version,
+    )
+
+class ViewCache:
+    """
+    LRU cache of view results that all belong to one ledger version.
+
+    Views without an explicit ledger_version are pinned: the first miss reads the
+    latest state and pins its version, later misses read at that same version, so
+    cached and fresh results never mix two states. The pin moves, and the pinned
+    entries are dropped, when a newer version is observed (one of our transactions
+    committed) or when the pin is older than max_age seconds, and is dropped when
+    the node answers that it pruned the pinned version (410) or has not reached it
+    yet (404 version_not_found). Views at an explicit ledger_version never change
+    and are only subject to LRU eviction.
+
+    Concurrent misses of the same key share one request.
+    """
+
+    def __init__(self, capacity: int = 1024, max_age: Optional[float] = 2.0):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._pinned_at = 0.0
+        self._entries: "OrderedDict[ViewKey, Any]" = OrderedDict()
+        self._inflight: Dict[ViewKey, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._entries),
+            "version": self.version,
+        }
+
+    def observe(self, version: int):
+        # anything read before `version` may be stale now
+        if self.version is None or version > self.version:
+            self._pin(version)
+
+    def invalidate(self):
+        self.version = None
+        self._clear_pinned()
+
+    async def fetch(
+            self,
+            module: str,
+            function: str,
+            ty_args: List[TypeTag],
+            args: List[TransactionArgument],
+            ledger_version: Optional[int],
+            request: ViewRequest
+        ) -> Any:
+        key = view_key(module, function, ty_args, args, ledger_version)
+        if ledger_version is None and self.version is not None and self.max_age is not None:
+            if time.monotonic() - self._pinned_at > self.max_age:
+                self.invalidate()
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if key in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._read(key, module, function, ty_args, args, ledger_version, request)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # nobody else may be waiting, do not warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def _read(
+            self,
+            key: ViewKey,
+            module: str,
+            function: str,
+            ty_args: List[TypeTag],
+            args: List[TransactionArgument],
+            ledger_version: Optional[int],
+            request: ViewRequest
+        ) -> Any:
+        if ledger_version is not None:
+            result, _ = await request(module, function, ty_args, args, ledger_version)
+            self._store(key, result)
+            return result
+
+        pinned = self.version
+        try:
+            result, version = await request(module, function, ty_args, args, pinned)
+        except ApiError as e:
+            # the node pruned the pinned version, or lags behind it, start over from its latest state
+            if pinned is None or not (e.status_code == 410 or (e.status_code == 404 and "version_not_found" in str(e))):
+                raise
+            self.invalidate()
+            result, version = await request(module, function, ty_args, args, None)
+        self.observe(version)
+        # the pin moved while this request was out, its result belongs to an older state
+        if version == self.version:
+            self._store(key, result)
+        return result
+
+    def _pin(self, version: int):
+        self._clear_pinned()
+        self.version = version
+        self._pinned_at = time.monotonic()
+
+    def _clear_pinned(self):
+        for key in [key for key in self._entries if key[4] is None]:
+            del self._entries[key]
+
+    def _store(self, key: ViewKey, result: Any):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
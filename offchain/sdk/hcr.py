@@ -0,0 +1,115 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from .keccak import keccak256
+
+# relay heights one verify() round fetches, by cursor with VIEW_PAGE_LIMIT HCRs per view call
+VERIFY_WINDOW = 1600
+
+class HCRMismatch(NamedTuple):
+    relayHeight: int
+    # None when the hub holds an HCR the collected headers do not explain
+    expected: Optional[bytes]
+    # None when the hub holds no HCR for the height
+    stored: Optional[bytes]
+
+class HCRVerifier:
+    """
+    Rebuilds the HCR of each relay height from collected headers, the fold build()
+    does on chain: the first root of a relay height is its HCR, every later one
+    makes it keccak256(hcr ++ root).
+
+    Headers are added as (relayHeight, root) in the order the module collected
+    them, by relay height, then transaction, then position in the batch;
+    EventIndexer.collected() streams them that way. Only one HCR per relay height
+    is kept, so millions of headers fold in constant memory per height, and
+    forget() drops heights that are done. keccak256 runs on pycryptodome or
+    eth-hash when installed, see sdk/keccak.py.
+
+    verify() compares the rebuilt HCRs with HCRByHeight through paged getHCRs
+    views, and matches() lets a parachain check an HCR it embedded without asking
+    the hub at all.
+    """
+
+    def __init__(self):
+        # relayHeight => HCR folded so far
+        self.hcrs: Dict[int, bytes] = {}
+        self.headers = 0
+
+    def __len__(self) -> int:
+        return len(self.hcrs)
+
+    def add(self, relay_height: int, root: bytes):
+        hcr = self.hcrs.get(relay_height)
+        self.hcrs[relay_height] = bytes(root) if hcr is None else keccak256(hcr + root)
+        self.headers += 1
+
+    def extend(self, headers: Iterable[Tuple[int, bytes]]) -> int:
+        # same as add() for each header, with the lookups hoisted out of the loop
+        hcrs = self.hcrs
+        get = hcrs.get
+        fold = keccak256
+        count = 0
+        for relay_height, root in headers:
+            hcr = get(relay_height)
+            hcrs[relay_height] = bytes(root) if hcr is None else fold(hcr + root)
+            count += 1
+        self.headers += count
+        return count
+
+    def expected(self, relay_height: int) -> Optional[bytes]:
+        return self.hcrs.get(relay_height)
+
+    def matches(self, relay_height: int, hcr: bytes) -> bool:
+        return self.hcrs.get(relay_height) == bytes(hcr)
+
+    def forget(self, below: int):
+        # drops the relay heights under `below`, once they are verified or pruned
+        for relay_height in [h for h in self.hcrs if h < below]:
+            del self.hcrs[relay_height]
+
+    def checkpoint(self, through: int) -> Tuple[int, bytes]:
+        # (count, hcr) the module's checkpoint holds once every relay height up to
+        # `through` is pruned; only meaningful if all their headers were added
+        count = 0
+        folded = b""
+        for relay_height in sorted(h for h in self.hcrs if h <= through):
+            hcr = self.hcrs[relay_height]
+            folded = hcr if count == 0 else keccak256(folded + hcr)
+            count += 1
+        return count, folded
+
+    async def verify(
+            self,
+            sdk,
+            module: str,
+            start: Optional[int] = None,
+            end: Optional[int] = None
+        ) -> List[HCRMismatch]:
+        # compares relay heights in [start, end), by default every one added; heights the
+        # hub already pruned into its checkpoint are skipped, see verify_checkpoint()
+        if not self.hcrs and (start is None or end is None):
+            return []
+        start = min(self.hcrs) if start is None else start
+        end = max(self.hcrs) + 1 if end is None else end
+        count, pruned_through, _, _ = await sdk.view_bcs_payload(module, "getCheckpoint", [], [])
+        if int(count) > 0:
+            start = max(start, int(pruned_through) + 1)
+        mismatches: List[HCRMismatch] = []
+        for window in range(start, end, VERIFY_WINDOW):
+            stored = await sdk.get_hcrs(module, window, min(window + VERIFY_WINDOW, end))
+            for relay_height in range(window, min(window + VERIFY_WINDOW, end)):
+                expected = self.hcrs.get(relay_height)
+                hcr = stored.get(relay_height)
+                if expected != hcr:
+                    mismatches.append(HCRMismatch(relay_height, expected, hcr))
+        return mismatches
+
+    async def verify_checkpoint(self, sdk, module: str) -> Optional[HCRMismatch]:
+        # compares the fold of everything pruned so far, None when it matches
+        count, through, hcr, _ = await sdk.view_bcs_payload(module, "getCheckpoint", [], [])
+        if int(count) == 0:
+            return None
+        stored = bytes.fromhex(hcr[2:] if hcr.startswith("0x") else hcr)
+        expected_count, expected = self.checkpoint(int(through))
+        if expected_count == int(count) and expected == stored:
+            return None
+        return HCRMismatch(int(through), expected, stored)
@@ -0,0 +1,142 @@
+from collections import deque
+from typing import Deque, List, NamedTuple, Set, Tuple
+from aptos_sdk.transactions import EntryFunction, TransactionArgument
+from aptos_sdk.bcs import Serializer
+
+# a signed transaction may not exceed 64KiB, keep headroom for the envelope
+MAX_BATCH_BYTES = 60_000
+
+# gas estimates from single collectHeader runs on devnet (see readme)
+GAS_PER_HEADER = 60
+GAS_PER_VOTE = 5
+
+class ParaHeader(NamedTuple):
+    chainId: int
+    height: int
+    root: bytes
+    hcr: bytes
+    sequences: List[int]
+
+class StoredHeader(NamedTuple):
+    chainId: int
+    height: int
+    relayHeight: int
+    root: bytes
+
+def collect_header_entry_function(module: str, header: ParaHeader) -> EntryFunction:
+    return EntryFunction.natural(
+        module,
+        "collectHeader",
+        [],
+        [
+            TransactionArgument(header.chainId, Serializer.u64), # parachain chainId
+            TransactionArgument(header.height, Serializer.u64), # parachain header height
+            TransactionArgument(header.root, Serializer.to_bytes), # parachain header root
+            TransactionArgument(header.hcr, Serializer.to_bytes), # parachain hcr
+            TransactionArgument(header.sequences, Serializer.sequence_serializer(Serializer.u64)), # parachain sequences of relay chain height
+        ],
+    )
+
+def collect_headers_entry_function(module: str, headers: List[ParaHeader]) -> EntryFunction:
+    return EntryFunction.natural(
+        module,
+        "collectHeaders",
+        [],
+        [
+            TransactionArgument([h.chainId for h in headers], Serializer.sequence_serializer(Serializer.u64)),
+            TransactionArgument([h.height for h in headers], Serializer.sequence_serializer(Serializer.u64)),
+            TransactionArgument([h.root for h in headers], Serializer.sequence_serializer(Serializer.to_bytes)),
+            TransactionArgument([h.hcr for h in headers], Serializer.sequence_serializer(Serializer.to_bytes)),
+            TransactionArgument(
+                [h.sequences for h in headers],
+                Serializer.sequence_serializer(Serializer.sequence_serializer(Serializer.u64))
+            ),
+        ],
+    )
+
+def _uleb128_size(value: int) -> int:
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+def header_size_of(header: ParaHeader) -> int:
+    # bytes this header adds to the collectHeaders arguments
+    return (
+        8 + 8
+        + _uleb128_size(len(header.root)) + len(header.root)
+        + _uleb128_size(len(header.hcr)) + len(header.hcr)
+        + _uleb128_size(len(header.sequences)) + 8 * len(header.sequences)
+    )
+
+class HeaderBatcher:
+    """
+    Coalesces queued headers into collectHeaders batches.
+
+    A batch is closed when it reaches max_headers, when its arguments would exceed
+    max_bytes, or when its estimated gas would exceed max_gas_amount. Headers keep
+    their queue order, and a (chainId, height) already queued is dropped because the
+    module would abort the whole batch on the duplicate key.
+    """
+
+    def __init__(
+            self,
+            module: str,
+            max_headers: int = 100,
+            max_bytes: int = MAX_BATCH_BYTES,
+            max_gas_amount: int = 2000,
+            gas_per_header: int = GAS_PER_HEADER,
+            gas_per_vote: int = GAS_PER_VOTE
+        ):
+        self.module = module
+        self.max_headers = max_headers
+        self.max_bytes = max_bytes
+        self.max_gas_amount = max_gas_amount
+        self.gas_per_header = gas_per_header
+        self.gas_per_vote = gas_per_vote
+        self.queue: Deque[ParaHeader] = deque()
+        self._queued: Set[Tuple[int, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def add(self, header: ParaHeader) -> bool:
+        key = (header.chainId, header.height)
+        if key in self._queued:
+            return False
+        self._queued.add(key)
+        self.queue.append(header)
+        return True
+
+    def estimate_gas(self, header: ParaHeader) -> int:
+        return self.gas_per_header + self.gas_per_vote * len(header.sequences)
+
+    def next_batch(self) -> List[ParaHeader]:
+        batch: List[ParaHeader] = []
+        size = 0
+        gas = 0
+        while self.queue and len(batch) < self.max_headers:
+            header = self.queue[0]
+            header_size = header_size_of(header)
+            header_gas = self.estimate_gas(header)
+            # an oversized header still goes out alone
+            if batch and (size + header_size > self.max_bytes or gas + header_gas > self.max_gas_amount):
+                break
+            self.queue.popleft()
+            self._queued.discard((header.chainId, header.height))
+            batch.append(header)
+            size += header_size
+            gas += header_gas
+        return batch
+
+    def drain(self) -> List[List[ParaHeader]]:
+        batches = []
+        while self.queue:
+            batches.append(self.next_batch())
+        return batches
+
+    def entry_function(self, batch: List[ParaHeader]) -> EntryFunction:
+        if len(batch) == 1:
+            return collect_header_entry_function(self.module, batch[0])
+        return collect_headers_entry_function(self.module, batch)
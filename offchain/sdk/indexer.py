@@ -0,0 +1,200 @@
+import asyncio
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import RestClient, ApiError
+from .headers import StoredHeader
+
+# the node caps one page of transactions at 100
+TRANSACTIONS_PAGE_LIMIT = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursor (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chains (
+    chainId INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS headers (
+    chainId INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    relayHeight INTEGER NOT NULL,
+    root BLOB NOT NULL,
+    version INTEGER NOT NULL,
+    event INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chainId, height)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS votes (
+    relayHeight INTEGER PRIMARY KEY,
+    votes INTEGER NOT NULL,
+    finalizedAt INTEGER
+);
+"""
+
+class EventIndexer:
+    """
+    Local index of one AptosTrust module built from the events it emits.
+
+    sync() pages through committed transactions from the version after the last
+    one indexed, applies the module's events and advances the stored cursor in the
+    same SQLite transaction, so after a restart it resumes exactly where it
+    stopped. Queries only read the local store; headers and votes pruned on chain
+    stay in the index.
+    """
+
+    def __init__(self, client: RestClient, module: str, path: str = ":memory:", start_version: int = 0):
+        address, name = module.split("::")
+        self.client = client
+        self.module_address = AccountAddress.from_str_relaxed(address)
+        self.module_name = name
+        self.db = sqlite3.connect(path)
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        if "event" not in [row[1] for row in self.db.execute("PRAGMA table_info(headers)")]:
+            # index written before headers kept their event position
+            self.db.execute("ALTER TABLE headers ADD COLUMN event INTEGER NOT NULL DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS headers_by_relay ON headers (relayHeight, version, event)")
+        self.db.execute("INSERT OR IGNORE INTO cursor (id, version) VALUES (0, ?)", (start_version,))
+        self.db.commit()
+        self.version = self.db.execute("SELECT version FROM cursor WHERE id = 0").fetchone()[0]
+        self._parachains = self.db.execute("SELECT COUNT(*) FROM chains").fetchone()[0]
+        # event type string => event name, or None for events of other modules
+        self._types: Dict[str, Optional[str]] = {}
+
+    def close(self):
+        self.db.close()
+
+    async def sync(self) -> int:
+        # indexes every committed transaction up to the latest one, returns how many were read
+        processed = 0
+        while True:
+            try:
+                transactions = await self.client.transactions(limit=TRANSACTIONS_PAGE_LIMIT, start=self.version)
+            except ApiError as e:
+                # a start beyond the latest version is not found, nothing new yet
+                if e.status_code == 404:
+                    break
+                raise
+            if not transactions:
+                break
+            last = int(transactions[-1]["version"])
+            with self.db:
+                for tx in transactions:
+                    if tx.get("success", True):
+                        for index, event in enumerate(tx.get("events", ())):
+                            self._apply(event, int(tx["version"]), index)
+                self.db.execute("UPDATE cursor SET version = ? WHERE id = 0", (last + 1,))
+            self.version = last + 1
+            processed += len(transactions)
+            if len(transactions) < TRANSACTIONS_PAGE_LIMIT:
+                break
+        return processed
+
+    async def run(self, interval: float = 1.0):
+        # follows the chain until cancelled
+        while True:
+            if await self.sync() < TRANSACTIONS_PAGE_LIMIT:
+                await asyncio.sleep(interval)
+
+    def _event_name(self, event_type: str) -> Optional[str]:
+        if event_type not in self._types:
+            name = None
+            parts = event_type.split("::")
+            if len(parts) == 3 and parts[1] == self.module_name:
+                try:
+                    if AccountAddress.from_str_relaxed(parts[0]) == self.module_address:
+                        name = parts[2]
+                except Exception:
+                    pass
+            self._types[event_type] = name
+        return self._types[event_type]
+
+    def _apply(self, event: dict, version: int, index: int):
+        name = self._event_name(event["type"])
+        if name is None:
+            return
+        data = event["data"]
+        if name == "HeaderCollected":
+            self.db.execute(
+                "INSERT OR REPLACE INTO headers (chainId, height, relayHeight, root, version, event) VALUES (?, ?, ?, ?, ?, ?)",
+                (int(data["chainId"]), int(data["height"]), int(data["relayHeight"]), _hex_bytes(data["root"]), version, index),
+            )
+        elif name == "VotesCounted":
+            # totals are absolute, a replayed event writes the same value
+            self.db.executemany(
+                "INSERT INTO votes (relayHeight, votes) VALUES (?, ?) "
+                "ON CONFLICT (relayHeight) DO UPDATE SET votes = excluded.votes",
+                [(int(h), int(v)) for h, v in zip(data["relayHeights"], data["votes"])],
+            )
+        elif name == "RelayHeaderFinalized":
+            self.db.execute(
+                "INSERT INTO votes (relayHeight, votes, finalizedAt) VALUES (?, ?, ?) "
+                "ON CONFLICT (relayHeight) DO UPDATE SET votes = excluded.votes, finalizedAt = excluded.finalizedAt",
+                (int(data["relayHeight"]), int(data["votes"]), int(data["finalizedAt"])),
+            )
+        elif name == "ParaChainRegistered":
+            inserted = self.db.execute("INSERT OR IGNORE INTO chains (chainId, version) VALUES (?, ?)", (int(data["chainId"]), version))
+            self._parachains += inserted.rowcount
+
+    # queries, answered from the local index with the semantics of the views
+
+    def parachain_count(self) -> int:
+        return self._parachains
+
+    def header(self, chain_id: int, height: int) -> Optional[StoredHeader]:
+        row = self.db.execute(
+            "SELECT relayHeight, root FROM headers WHERE chainId = ? AND height = ?", (chain_id, height)
+        ).fetchone()
+        if row is None:
+            return None
+        return StoredHeader(chain_id, height, row[0], row[1])
+
+    def headers(self, chain_id: int, start: int, end: int) -> List[StoredHeader]:
+        # headers of one chain with start <= height < end, by height
+        rows = self.db.execute(
+            "SELECT height, relayHeight, root FROM headers WHERE chainId = ? AND height >= ? AND height < ? ORDER BY height",
+            (chain_id, start, end),
+        )
+        return [StoredHeader(chain_id, height, relay_height, root) for height, relay_height, root in rows]
+
+    def collected(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        # (relayHeight, root) of the headers with start <= relayHeight < end, in the order
+        # the module folded them into HCRs; streamed from the store
+        if end is None:
+            rows = self.db.execute(
+                "SELECT relayHeight, root FROM headers WHERE relayHeight >= ? ORDER BY relayHeight, version, event",
+                (start,),
+            )
+        else:
+            rows = self.db.execute(
+                "SELECT relayHeight, root FROM headers WHERE relayHeight >= ? AND relayHeight < ? ORDER BY relayHeight, version, event",
+                (start, end),
+            )
+        return iter(rows)
+
+    def relay_header_votes(self, relay_height: int) -> Tuple[int, int]:
+        # (votes, registered parachains) like getRelayHeaderVotes
+        row = self.db.execute("SELECT votes FROM votes WHERE relayHeight = ?", (relay_height,)).fetchone()
+        return (row[0] if row is not None else 0), self.parachain_count()
+
+    def relay_header_finality(self, relay_height: int) -> Tuple[bool, int]:
+        # (finalized, hub block height it was finalized at) like getRelayHeaderFinality
+        row = self.db.execute("SELECT finalizedAt FROM votes WHERE relayHeight = ?", (relay_height,)).fetchone()
+        if row is None or row[0] is None:
+            return False, 0
+        return True, row[0]
+
+    def para_header_votes(self, chain_id: int, height: int) -> int:
+        row = self.db.execute(
+            "SELECT votes.votes FROM headers JOIN votes ON votes.relayHeight = headers.relayHeight "
+            "WHERE headers.chainId = ? AND headers.height = ?",
+            (chain_id, height),
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+def _hex_bytes(value: str) -> bytes:
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
@@ -0,0 +1,99 @@
+import struct
+from typing import List
+
+# Keccak-256 as aptos_hash::keccak256 computes it (the original 0x01 padding, not
+# SHA3's 0x06). hashlib only ships SHA3, so keccak256 uses pycryptodome or eth-hash
+# when one is installed and falls back to the plain Python Keccak-f[1600] below,
+# roughly a hundred times slower. BACKEND names the one in use.
+
+_RATE = 136
+_MASK = (1 << 64) - 1
+_LANES = struct.Struct("<17Q")
+_DIGEST = struct.Struct("<4Q")
+
+_ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+
+# rotation offsets indexed by x + 5 * y
+_ROTATIONS = [
+    0, 1, 62, 28, 27,
+    36, 44, 6, 55, 20,
+    3, 10, 43, 25, 39,
+    41, 45, 15, 21, 8,
+    18, 2, 61, 56, 14,
+]
+
+# (source lane, destination lane, rotation) of rho and pi: b[y + 5 * ((2x + 3y) % 5)] = rotl(a[x + 5y])
+_RHO_PI = [
+    (x + 5 * y, y + 5 * ((2 * x + 3 * y) % 5), _ROTATIONS[x + 5 * y])
+    for x in range(5)
+    for y in range(5)
+]
+
+def _permute(lanes: List[int]):
+    a = lanes
+    b = [0] * 25
+    for round_constant in _ROUND_CONSTANTS:
+        # theta
+        c0 = a[0] ^ a[5] ^ a[10] ^ a[15] ^ a[20]
+        c1 = a[1] ^ a[6] ^ a[11] ^ a[16] ^ a[21]
+        c2 = a[2] ^ a[7] ^ a[12] ^ a[17] ^ a[22]
+        c3 = a[3] ^ a[8] ^ a[13] ^ a[18] ^ a[23]
+        c4 = a[4] ^ a[9] ^ a[14] ^ a[19] ^ a[24]
+        d = (
+            c4 ^ (((c1 << 1) | (c1 >> 63)) & _MASK),
+            c0 ^ (((c2 << 1) | (c2 >> 63)) & _MASK),
+            c1 ^ (((c3 << 1) | (c3 >> 63)) & _MASK),
+            c2 ^ (((c4 << 1) | (c4 >> 63)) & _MASK),
+            c3 ^ (((c0 << 1) | (c0 >> 63)) & _MASK),
+        )
+        # rho and pi
+        for source, target, shift in _RHO_PI:
+            value = a[source] ^ d[source % 5]
+            b[target] = ((value << shift) | (value >> (64 - shift))) & _MASK if shift else value
+        # chi
+        for y in (0, 5, 10, 15, 20):
+            b0, b1, b2, b3, b4 = b[y], b[y + 1], b[y + 2], b[y + 3], b[y + 4]
+            a[y] = b0 ^ (~b1 & b2)
+            a[y + 1] = b1 ^ (~b2 & b3)
+            a[y + 2] = b2 ^ (~b3 & b4)
+            a[y + 3] = b3 ^ (~b4 & b0)
+            a[y + 4] = b4 ^ (~b0 & b1)
+        # iota
+        a[0] ^= round_constant
+
+def _keccak256(data: bytes) -> bytes:
+    padded = bytearray(data)
+    padded.append(0x01)
+    padded.extend(b"\x00" * (-len(padded) % _RATE))
+    padded[-1] |= 0x80
+    lanes = [0] * 25
+    for offset in range(0, len(padded), _RATE):
+        for i, lane in enumerate(_LANES.unpack_from(padded, offset)):
+            lanes[i] ^= lane
+        _permute(lanes)
+    return _DIGEST.pack(*lanes[:4])
+
+try:
+    from Crypto.Hash import keccak as _pycryptodome
+
+    def keccak256(data: bytes) -> bytes:
+        return _pycryptodome.new(data=data, digest_bits=256).digest()
+
+    BACKEND = "pycryptodome"
+except ImportError:
+    try:
+        from eth_hash.auto import keccak as _eth_hash
+        # eth-hash imports without a backend and only fails on the first hash
+        _eth_hash(b"")
+        keccak256 = _eth_hash
+        BACKEND = "eth-hash"
+    except Exception:
+        keccak256 = _keccak256
+        BACKEND = "python"
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional
+import httpx
+from aptos_sdk import ed25519
+from aptos_sdk.account import Account
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import ApiError, FaucetClient
+from aptos_sdk.bcs import Serializer
+from aptos_sdk.transactions import EntryFunction, TransactionArgument
+from .tracker import TransactionExpired, TransactionReplaced
+
+# recipients of one batch_transfer transaction
+TRANSFER_BATCH = 100
+
+# gas units of a batch_transfer besides its recipients, and per recipient; a transfer
+# that creates the account pays for its new state slots, far more than the transfer
+TRANSFER_BASE_GAS = 2_000
+TRANSFER_GAS_PER_RECIPIENT = 1_500
+
+class KeyEntry(NamedTuple):
+    name: str
+    address: str
+    # AIP-80 string, ed25519-priv-0x...
+    private_key: str
+
+    def account(self) -> Account:
+        return Account(AccountAddress.from_str(self.address), ed25519.PrivateKey.from_str(self.private_key, strict=False))
+
+class AccountState(NamedTuple):
+    name: str
+    address: str
+    balance: int
+    sequence_number: int
+
+class Keystore:
+    """
+    Many named keys in one file, a JSON line of name, address and private key each.
+
+    generate() appends fresh keys named `{prefix}-{index}` after the highest index
+    already there, so a keystore grows without renaming or replacing anything;
+    save() replaces the file atomically and readable by the owner only. export()
+    writes the single-key files the scripts take with --key and --operator-keys.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, KeyEntry] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = KeyEntry(**json.loads(line))
+                        self.entries[entry.name] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[KeyEntry]:
+        return iter(self.entries.values())
+
+    def __getitem__(self, name: str) -> KeyEntry:
+        return self.entries[name]
+
+    def accounts(self, names: Optional[List[str]] = None) -> List[Account]:
+        entries = self.entries.values() if names is None else [self.entries[name] for name in names]
+        return [entry.account() for entry in entries]
+
+    def generate(self, count: int, prefix: str = "operator") -> List[KeyEntry]:
+        # after the highest index, a gap left by a removed key is not filled
+        indexes = [
+            int(name[len(prefix) + 1:]) for name in self.entries
+            if name.startswith(f"{prefix}-") and name[len(prefix) + 1:].isdigit()
+        ]
+        start = max(indexes, default=-1) + 1
+        created = []
+        for index in range(start, start + count):
+            account = Account.generate()
+            entry = KeyEntry(f"{prefix}-{index}", str(account.address()), str(account.private_key))
+            if entry.name in self.entries:
+                raise ValueError(f"{entry.name} is in the keystore already")
+            self.entries[entry.name] = entry
+            created.append(entry)
+        return created
+
+    def save(self):
+        temporary = f"{self.path}.tmp"
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry._asdict()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    def export(self, directory: str, names: Optional[List[str]] = None) -> List[str]:
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for entry in self.entries.values() if names is None else [self.entries[name] for name in names]:
+            path = os.path.join(directory, entry.name)
+            descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, "w") as f:
+                f.write(entry.private_key)
+            paths.append(path)
+        return paths
+
+def _retryable(error: Exception) -> bool:
+    # faucets rate limit and time out under load, a rejected request does not get better
+    if isinstance(error, ApiError):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+async def fund_from_faucet(
+        faucet: FaucetClient,
+        addresses: List[str],
+        amount: int,
+        parallelism: int = 8,
+        retries: int = 3,
+        backoff: float = 1.0
+    ) -> Dict[str, Exception]:
+    # at most `parallelism` mint requests at once, each retried with doubling delays;
+    # returns the addresses that could not be funded
+    gate = asyncio.Semaphore(parallelism)
+
+    async def fund(address: str) -> Optional[Exception]:
+        for attempt in range(retries + 1):
+            try:
+                async with gate:
+                    await faucet.fund_account(AccountAddress.from_str(address), amount)
+                return None
+            except Exception as e:
+                if not _retryable(e) or attempt == retries:
+                    return e
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+    results = await asyncio.gather(*[fund(address) for address in addresses])
+    return {address: error for address, error in zip(addresses, results) if error is not None}
+
+async def fund_by_transfer(
+        sdk,
+        funder: Account,
+        addresses: List[str],
+        amount: int,
+        retries: int = 3
+    ) -> Dict[str, Exception | str]:
+    # batch_transfer from an account that is funded already, which creates the
+    # recipients as well; the batches go out pipelined on the funder's sequence numbers.
+    # A batch is sent again only when it certainly did not commit: rejected, expired or
+    # its number taken by another transaction. One that timed out or whose request was
+    # lost may still commit and is reported instead, as is an aborted one, so nobody is
+    # paid twice. Returns the addresses that were not funded with the error or vm status
+    # of their last attempt.
+    failures: Dict[str, Exception | str] = {}
+    pending = list(addresses)
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        batches = [pending[i:i + TRANSFER_BATCH] for i in range(0, len(pending), TRANSFER_BATCH)]
+        results = await sdk.transact_many(
+            [
+                EntryFunction.natural(
+                    "0x1::aptos_account",
+                    "batch_transfer",
+                    [],
+                    [
+                        TransactionArgument([AccountAddress.from_str(a) for a in batch], Serializer.sequence_serializer(Serializer.struct)),
+                        TransactionArgument([amount] * len(batch), Serializer.sequence_serializer(Serializer.u64)),
+                    ],
+                )
+                for batch in batches
+            ],
+            funder,
+            max_gas_amount=TRANSFER_BASE_GAS + TRANSFER_GAS_PER_RECIPIENT * min(len(pending), TRANSFER_BATCH),
+        )
+        pending = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, (ApiError, TransactionExpired, TransactionReplaced)):
+                pending.extend(batch)
+            for address in batch:
+                if isinstance(result, Exception) or not result[0]:
+                    failures[address] = result if isinstance(result, Exception) else result[1]
+                else:
+                    failures.pop(address, None)
+    return failures
+
+async def account_states(sdk, entries: List[KeyEntry], parallelism: int = 16) -> List[AccountState]:
+    # balance and sequence number of every key, an account that does not exist yet has 0 of both
+    gate = asyncio.Semaphore(parallelism)
+
+    async def state(entry: KeyEntry) -> AccountState:
+        async with gate:
+            address = AccountAddress.from_str(entry.address)
+            balance, sequence_number = await asyncio.gather(
+                sdk.account_balance(address),
+                sdk.account_sequence_number(address),
+            )
+        return AccountState(entry.name, entry.address, balance, sequence_number)
+
+    return list(await asyncio.gather(*[state(entry) for entry in entries]))
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import heapq
+import random
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from .headers import ParaHeader
+
+# relay heights a parachain votes for in one header at most, the oldest unvoted ones are skipped
+MAX_VOTES = 16
+
+# relay heights whose HCR is kept for parachains that lag behind
+HCR_HISTORY = 1024
+
+class _Chain:
+    __slots__ = ("chainId", "height", "root", "next_at", "lag", "voted")
+
+    def __init__(self, chainId: int, height: int, root: bytes, next_at: float, lag: int):
+        self.chainId = chainId
+        self.height = height
+        self.root = root
+        self.next_at = next_at
+        # relay blocks this chain sees later than the hub produced them
+        self.lag = lag
+        # highest relay height this chain voted for
+        self.voted: Optional[int] = None
+
+class ParachainSimulator:
+    """
+    Header streams of simulated parachains, in the order a relayer receives them.
+
+    Every chain produces a block each `block_interval` seconds, give or take
+    `jitter` of it, from a random phase. Roots are a hash chain over the parent
+    root, chainId and height, so every header carries a distinct 32-byte root.
+    The hub advances one block per `relay_interval` seconds from `relay_start`, or
+    only through observe_relay() when relay_interval is None; each chain sees hub
+    blocks up to `relay_lag` blocks late, its headers vote for the relay heights
+    it saw since its previous header (at most `max_votes`, the newest) and carry
+    the HCR of the latest one.
+
+    A share `fork_rate` of blocks also yields a competing header at the same height
+    with another root and no votes; the module refuses the second header of a
+    height, so a relayer has to drop it. A share `reorder_rate` is delivered up to
+    `reorder_depth` blocks late, after headers of the same chain above it, and
+    `delivery_jitter` seconds of random delay reorder chains among each other.
+
+    take() returns headers without waiting; iterating with `async for` (or
+    stream()) paces them to the simulated time, scaled by `speed`.
+    """
+
+    def __init__(
+            self,
+            chain_ids: List[int],
+            block_interval: float = 6.0,
+            jitter: float = 0.1,
+            relay_interval: Optional[float] = 1.0,
+            relay_start: int = 0,
+            relay_lag: int = 2,
+            max_votes: int = MAX_VOTES,
+            fork_rate: float = 0.0,
+            reorder_rate: float = 0.0,
+            reorder_depth: int = 2,
+            delivery_jitter: float = 0.0,
+            start_height: Optional[int] = None,
+            seed: Optional[int] = None
+        ):
+        self.block_interval = block_interval
+        self.jitter = jitter
+        self.relay_interval = relay_interval
+        self.relay_start = relay_start
+        self.max_votes = max_votes
+        self.fork_rate = fork_rate
+        self.reorder_rate = reorder_rate
+        self.reorder_depth = reorder_depth
+        self.delivery_jitter = delivery_jitter
+        self.random = random.Random(seed)
+        # a fresh height range per run, like the heights main.py takes from the clock
+        if start_height is None:
+            start_height = int(time.time() * 1000)
+        self.chains = [
+            _Chain(
+                chainId,
+                start_height,
+                hashlib.sha3_256(b"genesis" + chainId.to_bytes(8, "little")).digest(),
+                self.random.random() * block_interval,
+                self.random.randint(0, relay_lag),
+            )
+            for chainId in chain_ids
+        ]
+        # simulated seconds since the start
+        self.now = 0.0
+        self._relay_height = relay_start
+        self._hcrs: Dict[int, bytes] = {relay_start: _hcr_seed(relay_start)}
+        # (next block at, chainId) of every chain
+        self._blocks: List[Tuple[float, int]] = [(chain.next_at, chain.chainId) for chain in self.chains]
+        heapq.heapify(self._blocks)
+        self._by_id = {chain.chainId: chain for chain in self.chains}
+        # (delivered at, order, header) of produced headers not yet handed out
+        self._deliveries: List[Tuple[float, int, ParaHeader]] = []
+        self._order = 0
+        self.produced = 0
+        self.forks = 0
+        self.reordered = 0
+
+    @property
+    def relay_height(self) -> int:
+        return self._relay_at(self.now)
+
+    def _relay_at(self, at: float) -> int:
+        if self.relay_interval is None:
+            return self._relay_height
+        return self.relay_start + int(at / self.relay_interval)
+
+    def observe_relay(self, height: int):
+        # the latest hub block height, from the node when relay_interval is None
+        self._relay_height = max(self._relay_height, height)
+
+    def hcr(self, relay_height: int) -> bytes:
+        # each relay height's HCR folds the previous one, like the module's hash chain
+        latest = max(self._hcrs)
+        if relay_height > latest:
+            if relay_height - latest > HCR_HISTORY:
+                # a jump to the node's height, the chain restarts below it instead of hashing the gap
+                latest = relay_height - HCR_HISTORY
+                self._hcrs[latest] = _hcr_seed(latest)
+            for height in range(latest + 1, relay_height + 1):
+                self._hcrs[height] = hashlib.sha3_256(self._hcrs[height - 1] + height.to_bytes(8, "little")).digest()
+            for height in [h for h in self._hcrs if h < relay_height - HCR_HISTORY]:
+                del self._hcrs[height]
+        if relay_height not in self._hcrs:
+            return _hcr_seed(relay_height)
+        return self._hcrs[relay_height]
+
+    def next(self) -> Tuple[float, ParaHeader]:
+        # the next delivered header and the simulated time it arrives at
+        while not self._deliveries or self._deliveries[0][0] > self._blocks[0][0]:
+            self._produce()
+        delivered_at, _, header = heapq.heappop(self._deliveries)
+        self.now = max(self.now, delivered_at)
+        return delivered_at, header
+
+    def take(self, count: int) -> List[ParaHeader]:
+        return [self.next()[1] for _ in range(count)]
+
+    async def stream(self, speed: float = 1.0, limit: Optional[int] = None) -> AsyncIterator[ParaHeader]:
+        # speed 2 runs the simulation twice as fast as real time, 0 as fast as it is consumed
+        started = time.monotonic()
+        base = self.now
+        count = 0
+        while limit is None or count < limit:
+            delivered_at, header = self.next()
+            if speed > 0:
+                delay = started + (delivered_at - base) / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % 100 == 0:
+                await asyncio.sleep(0)
+            count += 1
+            yield header
+
+    def __aiter__(self) -> AsyncIterator[ParaHeader]:
+        return self.stream()
+
+    def _produce(self):
+        at, chainId = heapq.heappop(self._blocks)
+        chain = self._by_id[chainId]
+        parent = chain.root
+        chain.height += 1
+        chain.root = _root(parent, chainId, chain.height, 0)
+
+        seen = self._relay_at(at) - chain.lag
+        sequences: List[int] = []
+        if seen >= self.relay_start:
+            first = seen if chain.voted is None else chain.voted + 1
+            first = max(first, seen - self.max_votes + 1, self.relay_start)
+            sequences = list(range(first, seen + 1))
+            if sequences:
+                chain.voted = seen
+        hcr = self.hcr(max(seen, self.relay_start))
+
+        header = ParaHeader(chainId, chain.height, chain.root, hcr, sequences)
+        delay = self.random.random() * self.delivery_jitter
+        if self.reorder_rate and self.random.random() < self.reorder_rate:
+            delay += self.block_interval * self.random.randint(1, self.reorder_depth)
+            self.reordered += 1
+        self._deliver(at + delay, header)
+        if self.fork_rate and self.random.random() < self.fork_rate:
+            sibling = ParaHeader(chainId, chain.height, _root(parent, chainId, chain.height, 1), hcr, [])
+            self._deliver(at + self.random.random() * self.delivery_jitter, sibling)
+            self.forks += 1
+            if self.random.random() < 0.5:
+                # the sibling wins, later blocks build on it
+                chain.root = sibling.root
+        self.produced += 1
+
+        spread = self.block_interval * self.jitter
+        chain.next_at = at + max(self.block_interval + self.random.uniform(-spread, spread), 0.0)
+        heapq.heappush(self._blocks, (chain.next_at, chainId))
+
+    def _deliver(self, at: float, header: ParaHeader):
+        heapq.heappush(self._deliveries, (at, self._order, header))
+        self._order += 1
+
+def _hcr_seed(relay_height: int) -> bytes:
+    return hashlib.sha3_256(b"hcr" + relay_height.to_bytes(8, "little")).digest()
+
+def _root(parent: bytes, chainId: int, height: int, branch: int) -> bytes:
+    return hashlib.sha3_256(parent + chainId.to_bytes(8, "little") + height.to_bytes(8, "little") + bytes([branch])).digest()
@@ -0,0 +1,205 @@
+import bisect
+import json
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, IO, List, Optional, Sequence, Tuple
+from aiohttp import web
+
+# seconds, from a local signature to a slow confirmation
+PHASE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+GAS_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2000, 5000, 10000, 50000)
+
+PHASE_SECONDS = "aptos_sdk_phase_seconds"
+HTTP_RESPONSES = "aptos_sdk_http_responses_total"
+SEQUENCE_RETRIES = "aptos_sdk_sequence_retries_total"
+MEMPOOL_REJECTIONS = "aptos_sdk_mempool_rejections_total"
+TRANSACTIONS = "aptos_sdk_transactions_total"
+GAS_USED = "aptos_sdk_gas_used"
+ENDPOINT_REQUESTS = "aptos_sdk_endpoint_requests_total"
+ENDPOINT_EJECTIONS = "aptos_sdk_endpoint_ejections_total"
+HEDGED_REQUESTS = "aptos_sdk_hedged_requests_total"
+
+HELP = {
+    PHASE_SECONDS: ("histogram", "Duration of one phase of a request: chain_id, account, sign, submit, submit_batch, confirm, poll, view"),
+    HTTP_RESPONSES: ("counter", "HTTP responses from the node by method, endpoint and status"),
+    SEQUENCE_RETRIES: ("counter", "Submissions re-signed after a sequence number rejection"),
+    MEMPOOL_REJECTIONS: ("counter", "Transactions the node refused to accept, by validation code"),
+    TRANSACTIONS: ("counter", "Tracked transactions by outcome: success, failure (committed, aborted), expired or dropped"),
+    GAS_USED: ("histogram", "Gas used by committed transactions"),
+    ENDPOINT_REQUESTS: ("counter", "Requests routed to each node by outcome: ok, error (5xx, 429 or transport error)"),
+    ENDPOINT_EJECTIONS: ("counter", "Times a node was taken out of rotation after consecutive errors"),
+    HEDGED_REQUESTS: ("counter", "Reads sent to a second node because the first was slow to answer"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+SpanSink = Callable[[dict], None]
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class _Phase:
+    __slots__ = ("metrics", "name", "labels", "start", "wall")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        if self.metrics.span_sink is not None:
+            self.wall = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        outcome = "ok" if exc_type is None else "error"
+        self.metrics.observe(PHASE_SECONDS, duration, PHASE_BUCKETS, phase=self.name, outcome=outcome, **self.labels)
+        if self.metrics.span_sink is not None:
+            self.metrics.span_sink({
+                "name": self.name,
+                "start": self.wall,
+                "duration": duration,
+                "outcome": outcome,
+                **self.labels,
+            })
+        return False
+
+_DISABLED_PHASE = nullcontext()
+
+class Metrics:
+    """
+    Counters and histograms of one AptosSDKPlus, rendered as Prometheus text.
+
+    phase() times a block into aptos_sdk_phase_seconds and, when a span_sink is
+    set, also hands it a span dict. A disabled instance returns a shared no-op
+    context from phase() and ignores observe()/inc(), so instrumented code costs
+    one attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = True, span_sink: Optional[SpanSink] = None):
+        self.enabled = enabled
+        self.span_sink = span_sink
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+
+    def phase(self, name: str, **labels: str):
+        if not self.enabled:
+            return _DISABLED_PHASE
+        return _Phase(self, name, labels)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = PHASE_BUCKETS, **labels: str):
+        if not self.enabled:
+            return
+        series = self._histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = _Histogram(buckets)
+        histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        if not self.enabled:
+            return
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self) -> dict:
+        # plain tuples, picklable, to hand the series of another process to merge()
+        return {
+            "counters": {name: list(series.items()) for name, series in self._counters.items()},
+            "histograms": {
+                name: [(labels, h.buckets, list(h.counts), h.sum, h.count) for labels, h in series.items()]
+                for name, series in self._histograms.items()
+            },
+        }
+
+    def merge(self, snapshot: dict):
+        # adds the series of a snapshot() to this instance's, e.g. the shards of one relayer
+        for name, series in snapshot["counters"].items():
+            own = self._counters.setdefault(name, {})
+            for labels, value in series:
+                own[labels] = own.get(labels, 0) + value
+        for name, series in snapshot["histograms"].items():
+            own = self._histograms.setdefault(name, {})
+            for labels, buckets, counts, total, count in series:
+                histogram = own.get(labels)
+                if histogram is None:
+                    histogram = own[labels] = _Histogram(buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._counters):
+            _describe(lines, name, "counter")
+            for labels, value in self._counters[name].items():
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for name in sorted(self._histograms):
+            _describe(lines, name, "histogram")
+            for labels, histogram in self._histograms[name].items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9100):
+        # GET /metrics on a local port; returns the runner, await runner.cleanup() to stop
+        async def handle(request: web.Request) -> web.Response:
+            # scrapers only parse the exposition as OpenMetrics with the version given
+            return web.Response(
+                body=self.render().encode("utf-8"),
+                headers={"Content-Type": "application/openmetrics-text; version=1.0.0; charset=utf-8"},
+            )
+
+        app = web.Application()
+        app.add_routes([web.get("/metrics", handle)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+def json_lines_sink(stream: IO[str]) -> SpanSink:
+    # writes each span as one JSON line, e.g. json_lines_sink(open("spans.jsonl", "a"))
+    def sink(span: dict):
+        stream.write(json.dumps(span) + "\n")
+    return sink
+
+def _describe(lines: List[str], name: str, default_type: str):
+    # counters drop the _total suffix in the OpenMetrics family name
+    family = name[:-len("_total")] if name.endswith("_total") else name
+    metric_type, text = HELP.get(name, (default_type, name))
+    lines.append(f"# TYPE {family} {metric_type}")
+    lines.append(f"# HELP {family} {text}")
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
@@ -0,0 +1,343 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, IO, List, Optional, Tuple
+from aptos_sdk.account import Account
+from aptos_sdk.async_client import ApiError
+from aptos_sdk.transactions import EntryFunction
+from .payload import EncodedPayload, encode_payload
+from .sequence import is_sequence_error
+from .tracker import TransactionDropped, TransactionExpired, TransactionReplaced
+
+# outbox transactions expire soon, so a lost one is noticed and resent quickly
+OUTBOX_EXPIRATION_SECS = 60
+
+# past its expiration by this much on the local clock, a transaction counts as expired
+# even when no node response said so
+EXPIRATION_SLACK_SECS = 30
+
+class OutboxFailed(Exception):
+    """The outbox gave up on a transaction after max_attempts attempts that were rejected or never committed"""
+
+    def __init__(self, message: str, key: str):
+        super().__init__(message)
+        self.key = key
+
+class OutboxEntry:
+    __slots__ = ("key", "sender", "payload", "max_gas_amount", "gas_unit_price", "tx_hash", "sequence_number", "expiration")
+
+    def __init__(self, key: str, sender: str, payload: EncodedPayload, max_gas_amount: int, gas_unit_price: int):
+        self.key = key
+        self.sender = sender
+        self.payload = payload
+        self.max_gas_amount = max_gas_amount
+        self.gas_unit_price = gas_unit_price
+        # the last signed attempt
+        self.tx_hash: Optional[str] = None
+        self.sequence_number: Optional[int] = None
+        self.expiration: Optional[int] = None
+
+class Outbox:
+    """
+    Sends transactions until they commit and journals them, so that after a crash
+    only unconfirmed work is resent.
+
+    The journal is append-only JSON lines: "put" with the payload when a transaction
+    is handed in (fsynced before anything is signed), "signed" with hash and
+    expiration before each signed attempt is posted, "sent" with its sequence number
+    once the node accepted it, and "done" once it committed or was given up. A new
+    Outbox loads the entries without "done" and compacts the file; recover() then
+    follows the last attempt of each of them. A number is only the entry's once
+    "sent" says so: a rejected attempt's number goes back to the allocator, and an
+    attempt recovered from "signed" alone is followed by hash and resent at a new
+    number if it expires.
+
+    Concurrent puts share one fsync, run in an executor like the fsync of a
+    compaction, so the event loop never waits on the disk.
+
+    An attempt that expires uncommitted is resent at the same sequence number while
+    the chain has not moved past it, since that gap holds back every later
+    transaction of the sender, and at a new number otherwise. An attempt whose number
+    another transaction took is resent at a new number. A local timeout only resumes
+    tracking, the attempt can still commit until it expires. After `max_attempts`
+    attempts that were rejected or expired uncommitted the entry is given up with
+    OutboxFailed.
+    """
+
+    def __init__(
+            self,
+            sdk,
+            path: str,
+            expiration_secs: int = OUTBOX_EXPIRATION_SECS,
+            max_attempts: int = 5,
+            compact_after: int = 10000
+        ):
+        self.sdk = sdk
+        self.path = path
+        self.expiration_secs = expiration_secs
+        self.max_attempts = max_attempts
+        self.compact_after = compact_after
+        self.pending: Dict[str, OutboxEntry] = {}
+        self._finished = 0
+        self._journal: Optional[IO[str]] = None
+        # records written, and how many of them an fsync covered
+        self._written = 0
+        self._synced = 0
+        self._syncing: Optional[asyncio.Future] = None
+        self._compacting: Optional[asyncio.Future] = None
+        # records written while a compaction runs, it copies them to the new journal
+        self._held: Optional[List[str]] = None
+        self._closed = False
+        self._load()
+        self._compact()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def close(self):
+        # a compaction still running finds the journal closed and leaves the file alone
+        self._closed = True
+        self._journal.close()
+
+    async def send(
+            self,
+            entry_function: EntryFunction | EncodedPayload,
+            account: Account,
+            max_gas_amount: int = 2000,
+            gas_unit_price: int = 100,
+            key: Optional[str] = None
+        ) -> Tuple[bool, str, int]:
+        # resolves to (success, vm_status, gas_used) of the committed attempt
+        entry = OutboxEntry(
+            key if key is not None else uuid.uuid4().hex,
+            str(account.address()),
+            encode_payload(entry_function),
+            max_gas_amount,
+            gas_unit_price,
+        )
+        self.pending[entry.key] = entry
+        self._write(_put_record(entry))
+        await self._commit()
+        return await self._drive(entry, account, None)
+
+    async def recover(self, accounts: List[Account]) -> List[Tuple[bool, str, int] | Exception]:
+        # drives every loaded entry whose sender is among `accounts` to completion
+        by_address = {str(account.address()): account for account in accounts}
+        drives = []
+        for entry in list(self.pending.values()):
+            account = by_address.get(entry.sender)
+            if account is None:
+                continue
+            future = None
+            if entry.tx_hash is not None:
+                future = self.sdk.tracker.track(entry.tx_hash, account.address(), entry.sequence_number, entry.expiration)
+            drives.append(self._drive(entry, account, future))
+        return await asyncio.gather(*drives, return_exceptions=True)
+
+    async def _drive(self, entry: OutboxEntry, account: Account, future: Optional[asyncio.Future]) -> Tuple[bool, str, int]:
+        # attempts rejected or never committed
+        failures = 0
+        while True:
+            if future is None:
+                try:
+                    future = await self._submit(entry, account)
+                except ApiError as e:
+                    failures += 1
+                    self._give_up(entry, failures, e)
+                    await asyncio.sleep(min(0.1 * 2 ** failures, 5.0))
+                    continue
+            try:
+                outcome = await future
+            except TransactionExpired as e:
+                future = None
+                failures += 1
+                self._give_up(entry, failures, e)
+                continue
+            except TransactionReplaced as e:
+                # the number is used up, only a new one can carry this payload
+                entry.sequence_number = None
+                future = None
+                failures += 1
+                self._give_up(entry, failures, e)
+                continue
+            except TransactionDropped as e:
+                if time.time() > entry.expiration + EXPIRATION_SLACK_SECS:
+                    future = None
+                    failures += 1
+                    self._give_up(entry, failures, e)
+                else:
+                    future = self.sdk.tracker.track(entry.tx_hash, account.address(), entry.sequence_number, entry.expiration)
+                continue
+            success, vm_status, gas_used = outcome
+            self._finish(entry, {"success": success, "vm_status": vm_status})
+            return outcome
+
+    def _give_up(self, entry: OutboxEntry, failures: int, error: Exception):
+        # a node that keeps rejecting, dropping or expiring the entry must not hold it forever
+        if failures >= self.max_attempts:
+            self._finish(entry, {"error": str(error)})
+            raise OutboxFailed(f"gave up on {entry.key} after {failures} failed attempts: {error}", entry.key) from error
+
+    async def _submit(self, entry: OutboxEntry, account: Account) -> asyncio.Future:
+        expiration = int(time.time()) + self.expiration_secs
+        attempt: Dict[str, Any] = {}
+
+        def signed(tx_hash: str, sequence_number: int, expiration: int):
+            # journaled before the post, so recovery looks for an attempt the node took just before a crash
+            attempt.update(hash=tx_hash, sequence=sequence_number, expiration=expiration)
+            self._write({"op": "signed", "key": entry.key, "hash": tx_hash, "expiration": expiration})
+
+        if entry.sequence_number is not None:
+            # the last attempt expired, its number is free again unless the chain moved past it
+            account_data = await self.sdk.account(account.address())
+            if int(account_data["sequence_number"]) <= entry.sequence_number:
+                try:
+                    future = await self.sdk.submit_at(
+                        entry.payload, account, entry.sequence_number,
+                        entry.max_gas_amount, entry.gas_unit_price, expiration, signed
+                    )
+                    self._sent(entry, attempt)
+                    return future
+                except ApiError as e:
+                    if not is_sequence_error(e):
+                        raise
+        future = await self.sdk.submit(
+            entry.payload, account, entry.max_gas_amount, entry.gas_unit_price, expiration, signed
+        )
+        self._sent(entry, attempt)
+        return future
+
+    def _sent(self, entry: OutboxEntry, attempt: Dict[str, Any]):
+        # the node accepted the attempt, from now on its number is the entry's
+        entry.tx_hash = attempt["hash"]
+        entry.sequence_number = attempt["sequence"]
+        entry.expiration = attempt["expiration"]
+        self._write({"op": "sent", "key": entry.key, "sequence": entry.sequence_number})
+
+    def _finish(self, entry: OutboxEntry, record: dict):
+        self.pending.pop(entry.key, None)
+        self._write({"op": "done", "key": entry.key, **record})
+        self._finished += 1
+        if self._finished >= self.compact_after and self._compacting is None:
+            self._compacting = asyncio.ensure_future(self._compact_in_background())
+
+    def _write(self, record: dict):
+        # a lost "signed", "sent" or "done" only costs a lookup on recovery, a lost "put"
+        # loses the payload, so send() waits for _commit() after it
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._journal.write(line)
+        self._journal.flush()
+        if self._held is not None:
+            self._held.append(line)
+        self._written += 1
+
+    async def _commit(self):
+        # returns once every record written so far is on disk; callers arriving while an
+        # fsync runs share the next one
+        target = self._written
+        while self._synced < target:
+            if self._syncing is None:
+                self._syncing = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._syncing)
+
+    async def _fsync(self):
+        written = self._written
+        # a duplicate stays valid if a compaction swaps the journal meanwhile
+        fd = os.dup(self._journal.fileno())
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, fd)
+            self._synced = max(self._synced, written)
+        finally:
+            os.close(fd)
+            self._syncing = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line of a crashed run may be cut off
+                    continue
+                key = record["key"]
+                if record["op"] == "put":
+                    self.pending[key] = OutboxEntry(
+                        key,
+                        record["sender"],
+                        EncodedPayload(bytes.fromhex(record["payload"])),
+                        record["max_gas_amount"],
+                        record["gas_unit_price"],
+                    )
+                elif record["op"] == "signed" and key in self.pending:
+                    # maybe never accepted, followed by hash and not holding its number
+                    entry = self.pending[key]
+                    entry.tx_hash = record["hash"]
+                    entry.sequence_number = None
+                    entry.expiration = record["expiration"]
+                elif record["op"] == "sent" and key in self.pending:
+                    self.pending[key].sequence_number = record["sequence"]
+                elif record["op"] == "done":
+                    self.pending.pop(key, None)
+
+    def _compact(self):
+        # rewrites the journal with only the pending entries, then keeps appending to it
+        if self._journal is not None:
+            self._journal.close()
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write("".join(self._snapshot()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self._journal = open(self.path, "a")
+        self._finished = 0
+
+    async def _compact_in_background(self):
+        # like _compact, with the fsyncs in an executor; records keep going to the old
+        # journal meanwhile and are copied over until a pass finds none new
+        loop = asyncio.get_running_loop()
+        temporary = self.path + ".tmp"
+        self._held = []
+        try:
+            with open(temporary, "w") as f:
+                lines = self._snapshot()
+                while lines:
+                    f.write("".join(lines))
+                    f.flush()
+                    await loop.run_in_executor(None, os.fsync, f.fileno())
+                    lines, self._held = self._held, []
+            if self._closed:
+                os.remove(temporary)
+                return
+            os.replace(temporary, self.path)
+            self._journal.close()
+            self._journal = open(self.path, "a")
+            self._finished = 0
+        finally:
+            self._held = None
+            self._compacting = None
+
+    def _snapshot(self) -> List[str]:
+        # the records that restore the pending entries
+        records = []
+        for entry in self.pending.values():
+            records.append(_put_record(entry))
+            if entry.tx_hash is not None:
+                records.append({"op": "signed", "key": entry.key, "hash": entry.tx_hash, "expiration": entry.expiration})
+            if entry.sequence_number is not None:
+                records.append({"op": "sent", "key": entry.key, "sequence": entry.sequence_number})
+        return [json.dumps(record, separators=(",", ":")) + "\n" for record in records]
+
+def _put_record(entry: OutboxEntry) -> dict:
+    return {
+        "op": "put",
+        "key": entry.key,
+        "sender": entry.sender,
+        "payload": entry.payload.data.hex(),
+        "max_gas_amount": entry.max_gas_amount,
+        "gas_unit_price": entry.gas_unit_price,
+    }
@@ -0,0 +1,153 @@
+import hashlib
+import struct
+from typing import Sequence, Union
+from aptos_sdk.account import Account
+from aptos_sdk.bcs import Serializer
+from aptos_sdk.transactions import EntryFunction, ModuleId, TransactionPayload
+
+RAW_TRANSACTION_PREFIX = hashlib.sha3_256(b"APTOS::RawTransaction").digest()
+
+TRANSACTION_HASH_PREFIX = hashlib.sha3_256(b"APTOS::Transaction").digest()
+
+# Authenticator::Ed25519, then the length prefixes of the 32-byte key and the 64-byte signature
+ED25519_AUTHENTICATOR = b"\x00\x20"
+ED25519_SIGNATURE = b"\x40"
+
+Bytes = Union[bytes, bytearray, memoryview]
+
+_U64 = struct.Struct("<Q")
+_GAS = struct.Struct("<QQ")
+
+def uleb128(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+# single-byte prefixes cover roots, hcrs and sequences up to 127 entries
+_ULEB128 = [uleb128(n) for n in range(0x80)]
+
+def _uleb(value: int) -> bytes:
+    return _ULEB128[value] if value < 0x80 else uleb128(value)
+
+def encode_u64(value: int) -> bytes:
+    return _U64.pack(value)
+
+def encode_bytes(value: Bytes) -> bytes:
+    return _uleb(len(value)) + value
+
+def encode_u64_vector(values: Sequence[int]) -> bytes:
+    return _uleb(len(values)) + struct.pack(f"<{len(values)}Q", *values)
+
+class EncodedPayload:
+    """A TransactionPayload that is already BCS encoded"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def serialize(self, serializer: Serializer):
+        serializer.fixed_bytes(self.data)
+
+def encode_payload(entry_function: Union[EntryFunction, EncodedPayload]) -> EncodedPayload:
+    if isinstance(entry_function, EncodedPayload):
+        return entry_function
+    ser = Serializer()
+    TransactionPayload(entry_function).serialize(ser)
+    return EncodedPayload(ser.output())
+
+class EncodedSignedTransaction:
+    """
+    A SignedTransaction that is already BCS encoded; it offers bytes() and serialize()
+    so it can go wherever the sdk submits or hashes a SignedTransaction.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def bytes(self) -> bytes:
+        return self.data
+
+    def serialize(self, serializer: Serializer):
+        serializer.fixed_bytes(self.data)
+
+class PayloadTemplate:
+    """
+    Entry function payload whose prefix, everything up to the arguments, is encoded
+    once. encode() takes the BCS bytes of each argument.
+    """
+
+    def __init__(self, module: str, function: str, arg_count: int):
+        ser = Serializer()
+        ser.uleb128(TransactionPayload.SCRIPT_FUNCTION)
+        ModuleId.from_str(module).serialize(ser)
+        ser.str(function)
+        ser.uleb128(0) # no type arguments
+        ser.uleb128(arg_count)
+        self.module = module
+        self.function = function
+        self.arg_count = arg_count
+        self.prefix = ser.output()
+
+    def encode(self, *args: bytes) -> EncodedPayload:
+        parts = [self.prefix]
+        for arg in args:
+            parts.append(_uleb(len(arg)))
+            parts.append(arg)
+        return EncodedPayload(b"".join(parts))
+
+class CollectHeaderTemplate(PayloadTemplate):
+    def __init__(self, module: str):
+        super().__init__(module, "collectHeader", 5)
+
+    def header(self, chainId: int, height: int, root: Bytes, hcr: Bytes, sequences: Sequence[int]) -> EncodedPayload:
+        # u64 arguments are always 8 bytes, the vectors get both length prefixes
+        return EncodedPayload(b"".join((
+            self.prefix,
+            b"\x08", _U64.pack(chainId),
+            b"\x08", _U64.pack(height),
+            _uleb(len(root) + len(_uleb(len(root)))), _uleb(len(root)), root,
+            _uleb(len(hcr) + len(_uleb(len(hcr)))), _uleb(len(hcr)), hcr,
+            _uleb(8 * len(sequences) + len(_uleb(len(sequences)))), encode_u64_vector(sequences),
+        )))
+
+class RegistParaChainTemplate(PayloadTemplate):
+    def __init__(self, module: str):
+        super().__init__(module, "registParaChain", 1)
+
+    def chain(self, chainId: int) -> EncodedPayload:
+        return EncodedPayload(self.prefix + b"\x08" + _U64.pack(chainId))
+
+class TransactionSigner:
+    """
+    Assembles and signs RawTransactions of one sender from cached bytes: the
+    sender address, the gas fields, the chain id and the authenticator prefix are
+    encoded once, a transaction only adds its sequence number, payload and expiry.
+    """
+
+    def __init__(self, account: Account, chain_id: int, max_gas_amount: int, gas_unit_price: int):
+        self._sender = account.address().address
+        self._key = account.private_key.key
+        self._gas = _GAS.pack(max_gas_amount, gas_unit_price)
+        self._chain_id = bytes([chain_id])
+        self._authenticator = ED25519_AUTHENTICATOR + account.public_key().key.encode() + ED25519_SIGNATURE
+
+    def raw_transaction(self, sequence_number: int, payload: EncodedPayload, expiration_timestamps_secs: int) -> bytes:
+        return b"".join((
+            self._sender,
+            _U64.pack(sequence_number),
+            payload.data,
+            self._gas,
+            _U64.pack(expiration_timestamps_secs),
+            self._chain_id,
+        ))
+
+    def sign(self, sequence_number: int, payload: EncodedPayload, expiration_timestamps_secs: int) -> EncodedSignedTransaction:
+        raw_transaction = self.raw_transaction(sequence_number, payload, expiration_timestamps_secs)
+        signature = self._key.sign(RAW_TRANSACTION_PREFIX + raw_transaction).signature
+        return EncodedSignedTransaction(raw_transaction + self._authenticator + signature)
@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional, Tuple
+from aptos_sdk.account import Account
+from aptos_sdk.bcs import Serializer
+from aptos_sdk.transactions import EntryFunction, TransactionArgument
+
+class SenderPool:
+    """
+    Spreads header transactions over several operator accounts.
+
+    Transactions of one account commit one sequence number at a time, so a single
+    signer caps the header rate however many are in flight. The pool assigns each
+    parachain to one operator the first time it is seen, the one with the fewest
+    chains so far, and keeps it there: a chain's headers are signed by one account
+    in submission order, while different chains advance independent sequence
+    numbers. Operators other than the module owner must be authorized first
+    (authorize() or the addOperator entry function).
+    """
+
+    def __init__(self, sdk, operators: List[Account], assignments: Optional[Dict[int, int]] = None):
+        if not operators:
+            raise ValueError("a sender pool needs at least one operator")
+        self.sdk = sdk
+        self.operators = operators
+        # chainId => index into operators
+        self.assignments: Dict[int, int] = dict(assignments) if assignments else {}
+        self._load = [0] * len(operators)
+        for index in self.assignments.values():
+            self._load[index] += 1
+
+    def __len__(self) -> int:
+        return len(self.operators)
+
+    def operator_index(self, chain_id: int) -> int:
+        index = self.assignments.get(chain_id)
+        if index is None:
+            index = min(range(len(self.operators)), key=self._load.__getitem__)
+            self.assignments[chain_id] = index
+            self._load[index] += 1
+        return index
+
+    def operator_for(self, chain_id: int) -> Account:
+        return self.operators[self.operator_index(chain_id)]
+
+    async def authorize(self, owner: Account, module: str) -> List[Tuple[bool, str, int] | Exception]:
+        # adds every operator except the owner to the module's operator set
+        entry_functions = [
+            EntryFunction.natural(
+                module,
+                "addOperator",
+                [],
+                [TransactionArgument(operator.address(), Serializer.struct)],
+            )
+            for operator in self.operators
+            if operator.address() != owner.address()
+        ]
+        if not entry_functions:
+            return []
+        return await self.sdk.transact_many(entry_functions, owner)
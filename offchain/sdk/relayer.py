@@ -0,0 +1,352 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+import httpx
+from aptos_sdk.account import Account
+from aptos_sdk.async_client import ApiError
+from .headers import HeaderBatcher, ParaHeader, header_size_of
+from .outbox import Outbox, OutboxFailed
+from .pool import SenderPool
+from .tracker import TransactionDropped
+
+logger = logging.getLogger(__name__)
+
+# errors after which a batch may or may not have reached the node; its headers are
+# looked up on chain before they are sent again
+RETRYABLE_ERRORS = (ApiError, TransactionDropped, OutboxFailed, httpx.HTTPError, asyncio.TimeoutError, OSError)
+
+class RelayerClosed(Exception):
+    """The relayer is shutting down and takes no more headers"""
+
+class _ChainQueue:
+    def __init__(self, capacity: int):
+        self.headers: Deque[Tuple[ParaHeader, int]] = deque()
+        self.capacity = capacity
+        self.space = asyncio.Event()
+        self.space.set()
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    def update(self):
+        if len(self.headers) < self.capacity:
+            self.space.set()
+        else:
+            self.space.clear()
+
+class Relayer:
+    """
+    Relays headers of many parachains to AptosTrust from one long-running task.
+
+    Each parachain has a bounded queue; put() waits while its chain's queue is
+    full, which pushes back on producers once submissions stop keeping up.
+    Batches are filled round-robin, one header per chain per pass, within the
+    limits of `batcher` (headers, bytes and gas per transaction). A new batch is
+    sent only while fewer than `max_inflight` transactions and less than
+    `gas_budget` estimated gas are unconfirmed.
+
+    A (chainId, height) that is already queued or unconfirmed is not taken again,
+    since the module aborts a whole batch on a key it already stores.
+
+    A batch that the node rejects, that never commits or whose request fails goes
+    back to the front of its queues, up to `max_attempts` times. Its headers are
+    looked up on chain first: one that committed after all is reported as relayed,
+    one whose height holds another root is reported as failed, and neither is
+    sent again. A batch that aborts on a key the module already stores is split
+    the same way. A batch that commits but aborts otherwise is reported through
+    `on_result` and not retried, as is one that fails with any other error. stop() flushes
+    what is queued and returns the headers it could not relay in time.
+
+    With a SenderPool as `account` a batch only holds chains of one operator and
+    is signed by it, so the operators' sequence numbers advance side by side. With
+    an `outbox` every batch is journaled and resent until it commits; only batches
+    the outbox gives up on come back to the queues, and stop() leaves the
+    unconfirmed ones to the outbox's recover() on the next start.
+    """
+
+    def __init__(
+            self,
+            sdk,
+            account: Account | SenderPool,
+            batcher: HeaderBatcher,
+            queue_size: int = 1000,
+            max_inflight: int = 32,
+            gas_budget: Optional[int] = None,
+            linger: float = 0.05,
+            max_attempts: int = 3,
+            on_result: Optional[Callable[[List[ParaHeader], bool, str, int], None]] = None,
+            outbox: Optional[Outbox] = None
+        ):
+        self.sdk = sdk
+        self.account = account
+        self.pool = account if isinstance(account, SenderPool) else None
+        self.batcher = batcher
+        self.queue_size = queue_size
+        self.max_inflight = max_inflight
+        self.gas_budget = gas_budget if gas_budget is not None else max_inflight * batcher.max_gas_amount
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        self.outbox = outbox
+        self.queues: Dict[int, _ChainQueue] = {}
+        # (chainId, height) of every header queued or unconfirmed
+        self._keys: Set[Tuple[int, int]] = set()
+        # chains with queued headers, in the order they get their next turn
+        self._ready: Deque[int] = deque()
+        self._queued = 0
+        self._inflight = 0
+        self._inflight_gas = 0
+        # unconfirmed batches by the task sending them
+        self._tasks: Dict[asyncio.Task, List[ParaHeader]] = {}
+        # tasks whose batch the outbox journaled, its recover() resends them after a restart
+        self._journaled: Set[asyncio.Task] = set()
+        # a batch taken from the queues that waits for budget
+        self._waiting: List[Tuple[ParaHeader, int]] = []
+        self._work = asyncio.Event()
+        self._budget = asyncio.Condition()
+        self._closing = False
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.committed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def __len__(self) -> int:
+        return self._queued
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queued,
+            "chains": len(self._ready),
+            "inflight": self._inflight,
+            "inflight_gas": self._inflight_gas,
+            "submitted": self.submitted,
+            "committed": self.committed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    def start(self):
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.ensure_future(self._run())
+
+    async def put(self, header: ParaHeader):
+        queue = self._queue(header.chainId)
+        while len(queue) >= queue.capacity:
+            if self._closing:
+                raise RelayerClosed()
+            await queue.space.wait()
+        if (header.chainId, header.height) not in self._keys:
+            self._enqueue(header)
+
+    def put_nowait(self, header: ParaHeader) -> bool:
+        # True also for a (chainId, height) that is already queued or unconfirmed
+        queue = self._queue(header.chainId)
+        if (header.chainId, header.height) in self._keys:
+            return True
+        if len(queue) >= queue.capacity:
+            return False
+        self._enqueue(header)
+        return True
+
+    async def stop(self, timeout: Optional[float] = None) -> List[ParaHeader]:
+        # takes no more headers and relays what is queued. After timeout returns the headers
+        # still queued or unconfirmed; an unconfirmed one may have committed after all. A
+        # batch the outbox journaled is left to the outbox, returning it would send it twice
+        self._closing = True
+        left: List[ParaHeader] = []
+        for queue in self.queues.values():
+            # wake blocked producers so they see RelayerClosed
+            queue.space.set()
+        self._work.set()
+        if self._dispatcher is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._dispatcher), timeout)
+            except asyncio.TimeoutError:
+                self._dispatcher.cancel()
+                left = [header for header, _ in self._waiting]
+                left.extend(header for task, batch in self._tasks.items() if task not in self._journaled for header in batch)
+                tasks = list(self._tasks)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        for chainId in list(self._ready):
+            left.extend(header for header, _ in self.queues[chainId].headers)
+        return left
+
+    def _queue(self, chainId: int) -> _ChainQueue:
+        if self._closing:
+            raise RelayerClosed()
+        if chainId not in self.queues:
+            self.queues[chainId] = _ChainQueue(self.queue_size)
+        return self.queues[chainId]
+
+    def _enqueue(self, header: ParaHeader, attempt: int = 0, front: bool = False):
+        queue = self.queues[header.chainId]
+        if not queue.headers:
+            self._ready.append(header.chainId)
+        if front:
+            queue.headers.appendleft((header, attempt))
+        else:
+            queue.headers.append((header, attempt))
+        queue.update()
+        self._queued += 1
+        self._keys.add((header.chainId, header.height))
+        self._work.set()
+
+    async def _run(self):
+        while True:
+            if not self._queued:
+                if self._closing and not self._inflight:
+                    return
+                self._work.clear()
+                # set on new headers, on stop() and when a transaction settles
+                await self._work.wait()
+                continue
+            if self._queued < self.batcher.max_headers and not self._closing and self.linger > 0:
+                # give a partial batch a moment to fill up
+                self._work.clear()
+                try:
+                    await asyncio.wait_for(self._work.wait(), self.linger)
+                except asyncio.TimeoutError:
+                    pass
+            batch, gas = self._next_batch()
+            self._waiting = batch
+            async with self._budget:
+                await self._budget.wait_for(
+                    lambda: self._inflight < self.max_inflight
+                    and (self._inflight == 0 or self._inflight_gas + gas <= self.gas_budget)
+                )
+                self._inflight += 1
+                self._inflight_gas += gas
+            task = asyncio.ensure_future(self._send(batch, gas))
+            self._tasks[task] = [header for header, _ in batch]
+            self._waiting = []
+            task.add_done_callback(self._settled)
+
+    def _settled(self, task: asyncio.Task):
+        del self._tasks[task]
+        self._journaled.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("relaying a batch failed", exc_info=task.exception())
+
+    def _next_batch(self) -> Tuple[List[Tuple[ParaHeader, int]], int]:
+        batch: List[Tuple[ParaHeader, int]] = []
+        size = 0
+        gas = 0
+        passed = 0
+        operator = self.pool.operator_index(self._ready[0]) if self.pool is not None else None
+        # one header per chain per turn; stop after a full pass adds nothing
+        while self._ready and len(batch) < self.batcher.max_headers and passed < len(self._ready):
+            chainId = self._ready[0]
+            queue = self.queues[chainId]
+            header, attempt = queue.headers[0]
+            header_size = header_size_of(header)
+            header_gas = self.batcher.estimate_gas(header)
+            if (
+                (operator is not None and self.pool.operator_index(chainId) != operator)
+                or (batch and (size + header_size > self.batcher.max_bytes or gas + header_gas > self.batcher.max_gas_amount))
+            ):
+                passed += 1
+                self._ready.rotate(-1)
+                continue
+            passed = 0
+            queue.headers.popleft()
+            queue.update()
+            self._queued -= 1
+            self._ready.popleft()
+            if queue.headers:
+                self._ready.append(chainId)
+            batch.append((header, attempt))
+            size += header_size
+            gas += header_gas
+        return batch, gas
+
+    async def _send(self, batch: List[Tuple[ParaHeader, int]], gas: int):
+        headers = [header for header, _ in batch]
+        try:
+            account = self.account if self.pool is None else self.pool.operator_for(headers[0].chainId)
+            if self.outbox is not None:
+                self.submitted += len(batch)
+                # send() journals the batch before it first yields
+                self._journaled.add(asyncio.current_task())
+                success, vm_status, gas_used = await self.outbox.send(
+                    self.batcher.entry_function(headers), account, max_gas_amount=self.batcher.max_gas_amount
+                )
+            else:
+                confirmation = await self.sdk.submit(
+                    self.batcher.entry_function(headers), account, max_gas_amount=self.batcher.max_gas_amount
+                )
+                self.submitted += len(batch)
+                success, vm_status, gas_used = await confirmation
+        except RETRYABLE_ERRORS as e:
+            await self._retry(batch, str(e) or type(e).__name__)
+        except Exception as e:
+            logger.exception("relaying a batch of %d headers failed", len(batch))
+            self._report(headers, False, repr(e), 0)
+        else:
+            if not success and "EKEY_ALREADY_EXISTS" in vm_status:
+                # some header of the batch is stored already, the others may still go
+                await self._retry(batch, vm_status)
+            else:
+                self._report(headers, success, vm_status, gas_used)
+        finally:
+            async with self._budget:
+                self._inflight -= 1
+                self._inflight_gas -= gas
+                self._budget.notify_all()
+            self._work.set()
+
+    def _report(self, headers: List[ParaHeader], success: bool, vm_status: str, gas_used: int):
+        if success:
+            self.committed += len(headers)
+        else:
+            self.failed += len(headers)
+        self._keys.difference_update((header.chainId, header.height) for header in headers)
+        if self.on_result is not None:
+            self.on_result(headers, success, vm_status, gas_used)
+
+    async def _retry(self, batch: List[Tuple[ParaHeader, int]], reason: str):
+        # a dropped or timed out batch may have committed, and another relayer may have
+        # stored the same header or a sibling; either would abort the resent batch
+        try:
+            stored = await self._stored([header for header, _ in batch])
+        except RETRYABLE_ERRORS:
+            stored = {}
+        relayed: List[ParaHeader] = []
+        forked: List[ParaHeader] = []
+        given_up: List[ParaHeader] = []
+        retry: List[Tuple[ParaHeader, int]] = []
+        for header, attempt in batch:
+            root = stored.get((header.chainId, header.height))
+            if root is not None:
+                (relayed if root == header.root else forked).append(header)
+            elif attempt + 1 >= self.max_attempts:
+                given_up.append(header)
+            else:
+                retry.append((header, attempt))
+        # reversed keeps the original order at the front of each queue
+        for header, attempt in reversed(retry):
+            self.retried += 1
+            self._enqueue(header, attempt + 1, front=True)
+        if relayed:
+            self._report(relayed, True, f"stored on chain after: {reason}", 0)
+        if forked:
+            self._report(forked, False, f"another root is stored at this height after: {reason}", 0)
+        if given_up:
+            self._report(given_up, False, reason, 0)
+
+    async def _stored(self, headers: List[ParaHeader]) -> Dict[Tuple[int, int], bytes]:
+        # root stored at each (chainId, height) of headers that has one
+        spans: Dict[int, Tuple[int, int]] = {}
+        for header in headers:
+            low, high = spans.get(header.chainId, (header.height, header.height))
+            spans[header.chainId] = (min(low, header.height), max(high, header.height))
+        wanted = {(header.chainId, header.height) for header in headers}
+        stored: Dict[Tuple[int, int], bytes] = {}
+        for chainId, (low, high) in spans.items():
+            for header in await self.sdk.get_headers(self.batcher.module, chainId, low, high + 1):
+                if (chainId, header.height) in wanted:
+                    stored[(chainId, header.height)] = header.root
+        return stored
@@ -0,0 +1,316 @@
+import asyncio
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import re
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import httpx
+from aptos_sdk.bcs import Deserializer
+from aptos_sdk.transactions import SignedTransaction
+from .payload import TRANSACTION_HASH_PREFIX
+
+# records written between two flushes of the log
+RECORD_FLUSH_EVERY = 256
+
+# response headers worth keeping, the rest is transport detail
+KEPT_HEADERS = ("content-type",)
+KEPT_HEADER_PREFIX = "x-aptos-"
+
+# status of a request the log has no answer for
+NOT_RECORDED = 501
+
+_HASH = re.compile(r"0x[0-9a-f]{64}")
+_ACCOUNT_TRANSACTIONS = re.compile(r"/accounts/(0x[0-9a-fA-F]+)/transactions$")
+_BY_HASH = re.compile(r"/transactions/by_hash/(0x[0-9a-f]{64})$")
+
+def _address(value: str) -> str:
+    # long form, the node writes 0x1 where a submission has 31 zero bytes before it
+    return "0x" + value[2:].lower().rjust(64, "0")
+
+def _tx_hash(data: bytes) -> str:
+    return "0x" + hashlib.sha3_256(TRANSACTION_HASH_PREFIX + b"\x00" + data).hexdigest()
+
+def _submitted(path: str, body: bytes) -> Tuple[Optional[str], List[str]]:
+    # (sender:sequence key, hashes) of a submission, (None, []) for any other request
+    if path.endswith("/transactions") and body:
+        # a RawTransaction starts with the sender and its sequence number
+        return f"0x{body[:32].hex()}:{int.from_bytes(body[32:40], 'little')}", [_tx_hash(body)]
+    if path.endswith("/transactions/batch") and body:
+        deserializer = Deserializer(body)
+        signed = [SignedTransaction.deserialize(deserializer) for _ in range(deserializer.uleb128())]
+        if not signed:
+            return "empty", []
+        first = signed[0].transaction
+        return f"0x{first.sender.address.hex()}:{first.sequence_number}+{len(signed)}", [_tx_hash(s.bytes()) for s in signed]
+    return None, []
+
+def request_key(method: str, target: str, body: bytes) -> Tuple[str, List[str]]:
+    """
+    The key a request is recorded and replayed under, with the hashes it submits.
+
+    A submission is keyed by sender and sequence number, so a replayed run that
+    signs the same transactions with other expirations or payload bytes still
+    finds its answer; other POSTs by a digest of the body, GETs by path and
+    query, except the transactions of an account, which replay builds from the
+    commits of the whole log whatever page is asked for.
+    """
+    path = target.split("?", 1)[0]
+    if method == "POST":
+        submission, hashes = _submitted(path, body)
+        if submission is not None:
+            return f"POST {path} {submission}", hashes
+        return f"POST {path} {hashlib.sha256(body).hexdigest()[:16]}", []
+    if _ACCOUNT_TRANSACTIONS.search(path):
+        return f"{method} {path}", []
+    return f"{method} {target}", []
+
+def _target(request: httpx.Request) -> str:
+    return request.url.raw_path.decode("ascii")
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+class TrafficRecorder(httpx.AsyncBaseTransport):
+    """
+    httpx transport that passes requests on and logs them with their answers.
+
+    Every exchange is one JSON line appended to `path`, gzip compressed when it
+    ends in .gz: the seconds since the recorder started and the latency through
+    the end of the body, the request key, the status, the content type and
+    x-aptos-* headers and the decoded body. Request bodies are not kept, a
+    submission logs the hashes of the transactions it carried instead. The log
+    is flushed every RECORD_FLUSH_EVERY records and on close; several runs
+    appended to one file replay as one. note() adds a line of caller context,
+    such as the workload parameters a replay has to repeat.
+    """
+
+    def __init__(self, path: str, transport: httpx.AsyncBaseTransport):
+        self.path = path
+        self._transport = transport
+        self._file = _open(path, "ab")
+        self._started = time.perf_counter()
+        self._unflushed = 0
+        self.records = 0
+        self.note(started=time.time())
+
+    def note(self, **fields: Any):
+        self._write({"n": fields})
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        start = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        try:
+            # decoded, a replayed body goes out without its content encoding
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        latency = time.perf_counter() - start
+        key, hashes = request_key(request.method, _target(request), body)
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name in KEPT_HEADERS or name.startswith(KEPT_HEADER_PREFIX)
+        }
+        record: Dict[str, Any] = {
+            "t": round(start - self._started, 6),
+            "l": round(latency, 6),
+            "k": key,
+            "s": response.status_code,
+            "h": headers,
+        }
+        try:
+            record["b"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            record["b64"] = base64.b64encode(content).decode("ascii")
+        if hashes:
+            record["x"] = hashes
+        self._write(record)
+        self.records += 1
+        return httpx.Response(response.status_code, headers=headers, content=content, extensions=response.extensions)
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._unflushed += 1
+        if self._unflushed >= RECORD_FLUSH_EVERY:
+            self._file.flush()
+            self._unflushed = 0
+
+    async def aclose(self):
+        self._file.close()
+        await self._transport.aclose()
+
+class _Recorded:
+    __slots__ = ("offset", "latency", "status", "headers", "body")
+
+    def __init__(self, record: Dict[str, Any]):
+        self.offset = float(record["t"])
+        self.latency = float(record["l"])
+        self.status = int(record["s"])
+        self.headers = record.get("h", {})
+        self.body = record["b"].encode("utf-8") if "b" in record else base64.b64decode(record.get("b64", ""))
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that answers requests from a TrafficRecorder log, no node involved.
+
+    Answers of one request key are given in the order they were recorded, the
+    last one again once they run out; a request the log has no answer for gets
+    a NOT_RECORDED status. Each answer waits its recorded latency times
+    `latency_scale` first, 1.0 for the original timing and 0 for none.
+
+    A replayed run signs its own transactions, whose hashes differ from the
+    recorded ones as soon as an expiration does. A submission maps the hashes it
+    carries to the recorded ones of the same sender and sequence numbers, and
+    hashes in answers and request paths are translated both ways. Polls for
+    commits do not depend on when the client happens to ask: a replayed
+    transaction is committed the recorded time after its submission, again times
+    `latency_scale`, and the transactions of an account and lookups by hash are
+    answered from that schedule, with the recorded latency and ledger headers.
+    The workload has to be the same for the keys to match; notes carries what
+    the recording run noted for that.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self.notes: Dict[str, Any] = {}
+        self._answers: Dict[str, Deque[_Recorded]] = collections.defaultdict(collections.deque)
+        self._last: Dict[str, _Recorded] = {}
+        self._submitted_at: Dict[str, float] = {}
+        # recorded hash => (log offset it committed at, the transaction)
+        self._committed: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # sender => sequence number => recorded hash
+        self._by_sender: Dict[str, Dict[int, str]] = collections.defaultdict(dict)
+        self._load(path)
+        self._to_live: Dict[str, str] = {}
+        self._to_recorded: Dict[str, str] = {}
+        # recorded hash => monotonic time the replayed transaction commits at
+        self._commits_at: Dict[str, float] = {}
+        self.served = 0
+        self.repeated = 0
+        self.misses = 0
+
+    def _load(self, path: str):
+        # offset of the latest poll of each path; a transaction committed between the
+        # last poll that missed it and the first that found it, taken as halfway
+        polled: Dict[str, float] = {}
+        with _open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "n" in record:
+                    self.notes.update(record["n"])
+                    continue
+                recorded = _Recorded(record)
+                key = record["k"]
+                self._answers[key].append(recorded)
+                for tx_hash in record.get("x", []):
+                    self._submitted_at.setdefault(tx_hash, recorded.offset)
+                if not key.startswith("GET "):
+                    continue
+                path = key[4:].split("?", 1)[0]
+                if _ACCOUNT_TRANSACTIONS.search(path):
+                    transactions = json.loads(recorded.body) if recorded.status == 200 else []
+                elif _BY_HASH.search(path):
+                    transactions = [json.loads(recorded.body)] if recorded.status == 200 else []
+                else:
+                    continue
+                for tx in transactions:
+                    if tx.get("type") != "user_transaction" or tx["hash"] in self._committed:
+                        continue
+                    missed = polled.get(path, recorded.offset)
+                    self._committed[tx["hash"]] = ((missed + recorded.offset) / 2, tx)
+                    self._by_sender[_address(tx["sender"])][int(tx["sequence_number"])] = tx["hash"]
+                polled[path] = max(polled.get(path, 0.0), recorded.offset)
+
+    def stats(self) -> Dict[str, int]:
+        return {"served": self.served, "repeated": self.repeated, "misses": self.misses}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        # what the node had committed is judged when the request reaches it
+        arrived = time.monotonic()
+        target = _HASH.sub(lambda m: self._to_recorded.get(m.group(0), m.group(0)), _target(request))
+        key, hashes = request_key(request.method, target, body)
+        answers = self._answers.get(key)
+        if answers:
+            recorded = answers.popleft()
+            self._last[key] = recorded
+        else:
+            recorded = self._last.get(key)
+            if recorded is not None:
+                self.repeated += 1
+        if recorded is None:
+            self.misses += 1
+            return httpx.Response(NOT_RECORDED, json={"message": f"not recorded: {key}", "error_code": "not_recorded"})
+        self.served += 1
+        if recorded.latency > 0 and self.latency_scale > 0:
+            await asyncio.sleep(recorded.latency * self.latency_scale)
+        if hashes:
+            self._submit(hashes, key, arrived)
+        path = target.split("?", 1)[0]
+        status, content = recorded.status, recorded.body
+        account = _ACCOUNT_TRANSACTIONS.search(path)
+        by_hash = _BY_HASH.search(path)
+        if account is not None and recorded.status in (200, 404):
+            transactions = self._account_transactions(account.group(1), urlsplit(target).query, arrived)
+            if transactions or recorded.status == 200:
+                status, content = 200, json.dumps(transactions).encode("utf-8")
+        elif by_hash is not None and by_hash.group(1) in self._committed:
+            tx_hash = by_hash.group(1)
+            if self._visible(tx_hash, arrived):
+                status, content = 200, json.dumps(self._live(self._committed[tx_hash][1])).encode("utf-8")
+            else:
+                status, content = 404, json.dumps({
+                    "message": f"Transaction not found by Transaction hash({self._to_live.get(tx_hash, tx_hash)})",
+                    "error_code": "transaction_not_found",
+                }).encode("utf-8")
+        elif self._to_live and b"0x" in content:
+            content = _HASH.sub(lambda m: self._to_live.get(m.group(0), m.group(0)), content.decode("utf-8")).encode("utf-8")
+        return httpx.Response(status, headers=recorded.headers, content=content)
+
+    def _submit(self, hashes: List[str], key: str, arrived: float):
+        # the recorded submission of the same sender and sequence numbers carried these
+        sender, numbers = key.rsplit(" ", 1)[1].split(":")
+        first, _, count = numbers.partition("+")
+        recorded_hashes = [
+            self._by_sender.get(sender, {}).get(int(first) + i)
+            for i in range(int(count) if count else 1)
+        ]
+        for live, tx_hash in zip(hashes, recorded_hashes):
+            if tx_hash is None:
+                continue
+            self._to_live[tx_hash] = live
+            self._to_recorded[live] = tx_hash
+            if tx_hash in self._committed and tx_hash in self._submitted_at:
+                delay = max(self._committed[tx_hash][0] - self._submitted_at[tx_hash], 0.0)
+                self._commits_at[tx_hash] = arrived + delay * self.latency_scale
+
+    def _visible(self, tx_hash: str, now: float) -> bool:
+        # committed before the recording submitted anything of ours, or replayed and due
+        if tx_hash not in self._submitted_at:
+            return True
+        commits_at = self._commits_at.get(tx_hash)
+        return commits_at is not None and commits_at <= now
+
+    def _live(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        live = self._to_live.get(tx["hash"])
+        return tx if live is None else {**tx, "hash": live}
+
+    def _account_transactions(self, sender: str, query: str, now: float) -> List[Dict[str, Any]]:
+        params = parse_qs(query)
+        start = int(params.get("start", ["0"])[0])
+        limit = int(params.get("limit", ["25"])[0])
+        committed = self._by_sender.get(_address(sender), {})
+        transactions = []
+        # an account commits in sequence number order, the page ends at the first gap
+        for sequence_number in range(start, start + limit):
+            tx_hash = committed.get(sequence_number)
+            if tx_hash is None or not self._visible(tx_hash, now):
+                break
+            transactions.append(self._live(self._committed[tx_hash][1]))
+        return transactions
@@ -0,0 +1,277 @@
+import asyncio
+import random
+import re
+import time
+from typing import Dict, List, Optional, Set
+import httpx
+from .metrics import Metrics, ENDPOINT_EJECTIONS, ENDPOINT_REQUESTS, HEDGED_REQUESTS
+
+# weight of the newest sample in an endpoint's moving latency average
+LATENCY_SMOOTHING = 0.2
+
+# the account resource, the allocator takes sequence numbers from it
+ACCOUNT_PATH = re.compile(r"/accounts/[^/]+/?$")
+
+class Endpoint:
+    __slots__ = ("url", "latency", "inflight", "requests", "errors", "failures", "ejected_until", "probing")
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        # moving average in seconds, 0 until the first answer
+        self.latency = 0.0
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        # consecutive errors, reset by any good answer
+        self.failures = 0
+        # out of rotation until then, None while healthy
+        self.ejected_until: Optional[float] = None
+        self.probing = False
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until is None
+
+    def score(self) -> float:
+        # expected wait, an endpoint that is already busy looks slower
+        return self.latency * (1 + self.inflight)
+
+class EndpointRouter(httpx.AsyncBaseTransport):
+    """
+    httpx transport that spreads the requests of one client over several nodes.
+
+    Requests are built against the first url and rewritten to the node chosen
+    for them. Submissions and the account resource stay on one node, the writer,
+    as long as it is healthy, so the sequence numbers the client allocates follow
+    a single mempool; when the writer is ejected the next healthy node in the
+    given order takes over and keeps the role. Every other request is a read and
+    goes to the healthy node with the lowest moving latency weighted by its
+    requests in flight, with a share of `explore` sent to a random node so a
+    node that recovered gets measured again.
+
+    With `hedge_after` a read that has no answer after that many seconds is sent
+    to a second node as well and the first good answer wins. A transport error,
+    5xx or 429 counts against a node; after `eject_after` in a row it leaves the
+    rotation and is probed with a ledger-info request every `probe_interval`
+    seconds until it answers. A failed request is tried on the next node, reads
+    and writes alike: a signed transaction posted twice commits once. A read at a
+    ledger version the node has not reached yet goes to the next node too, without
+    counting against the lagging one.
+    """
+
+    def __init__(
+            self,
+            urls: List[str],
+            hedge_after: Optional[float] = None,
+            eject_after: int = 3,
+            probe_interval: float = 5.0,
+            explore: float = 0.05,
+            http2: bool = False,
+            metrics: Optional[Metrics] = None,
+            seed: Optional[int] = None
+        ):
+        if not urls:
+            raise ValueError("an endpoint router needs at least one url")
+        self.endpoints = [Endpoint(url) for url in urls]
+        # the url requests are built against
+        self.base_url = self.endpoints[0].url
+        self.hedge_after = hedge_after
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.explore = explore
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.random = random.Random(seed)
+        self.writer = self.endpoints[0]
+        self.hedged = 0
+        self._transport = httpx.AsyncHTTPTransport(http2=http2)
+        self._probes: Set[asyncio.Task] = set()
+
+    def stats(self) -> List[Dict[str, object]]:
+        return [
+            {
+                "url": endpoint.url,
+                "healthy": endpoint.healthy,
+                "writer": endpoint is self.writer,
+                "latency": endpoint.latency,
+                "inflight": endpoint.inflight,
+                "requests": endpoint.requests,
+                "errors": endpoint.errors,
+            }
+            for endpoint in self.endpoints
+        ]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # the body is sent again on failover and hedging
+        await request.aread()
+        if not str(request.url).startswith(self.base_url):
+            return await self._transport.handle_async_request(request)
+        path = request.url.path
+        if (request.method == "POST" and not path.endswith("/view")) or ACCOUNT_PATH.search(path):
+            return await self._write(request)
+        return await self._read(request)
+
+    async def aclose(self):
+        for probe in self._probes:
+            probe.cancel()
+        await asyncio.gather(*self._probes, return_exceptions=True)
+        await self._transport.aclose()
+
+    async def _write(self, request: httpx.Request) -> httpx.Response:
+        tried: List[Endpoint] = []
+        while True:
+            if not self.writer.healthy:
+                self.writer = next((e for e in self.endpoints if e.healthy), self.writer)
+            endpoint = self.writer if self.writer not in tried else self._pick(tried, fallback=True)
+            tried.append(endpoint)
+            last = len(tried) == len(self.endpoints)
+            try:
+                response = await self._send(endpoint, request)
+            except httpx.TransportError:
+                if last:
+                    raise
+                continue
+            if not _failed(response) or last:
+                return response
+
+    async def _read(self, request: httpx.Request) -> httpx.Response:
+        tried: List[Endpoint] = []
+        attempts: Set[asyncio.Task] = set()
+        hedging = self.hedge_after is not None
+        failure: Optional[httpx.Response | Exception] = None
+        try:
+            while True:
+                if not attempts:
+                    endpoint = self._pick(tried, fallback=True)
+                    if endpoint is None:
+                        break
+                    tried.append(endpoint)
+                    attempts.add(asyncio.ensure_future(self._send(endpoint, request)))
+                hedge = hedging and len(attempts) == 1
+                done, _ = await asyncio.wait(
+                    attempts, timeout=self.hedge_after if hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # the first node is slow, ask another one too
+                    endpoint = self._pick(tried, fallback=False)
+                    if endpoint is None:
+                        hedging = False
+                        continue
+                    tried.append(endpoint)
+                    attempts.add(asyncio.ensure_future(self._send(endpoint, request)))
+                    self.hedged += 1
+                    self.metrics.inc(HEDGED_REQUESTS)
+                    continue
+                for task in done:
+                    attempts.discard(task)
+                    try:
+                        response = task.result()
+                    except httpx.TransportError as e:
+                        failure = e
+                        continue
+                    if not _failed(response):
+                        if not await _behind(response):
+                            return response
+                        # the node has not reached the ledger version asked for yet, another
+                        # may have; this does not count against it
+                    failure = response
+        finally:
+            for task in attempts:
+                task.cancel()
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
+
+    def _pick(self, exclude: List[Endpoint], fallback: bool) -> Optional[Endpoint]:
+        # a healthy endpoint, or with `fallback` the ejected one that is due first
+        now = time.monotonic()
+        healthy = []
+        ejected = []
+        for endpoint in self.endpoints:
+            if endpoint.healthy:
+                if endpoint not in exclude:
+                    healthy.append(endpoint)
+                continue
+            if endpoint.ejected_until <= now and not endpoint.probing:
+                self._probe(endpoint)
+            if endpoint not in exclude:
+                ejected.append(endpoint)
+        if healthy:
+            if len(healthy) > 1 and self.random.random() < self.explore:
+                return self.random.choice(healthy)
+            return min(healthy, key=Endpoint.score)
+        if fallback and ejected:
+            return min(ejected, key=lambda endpoint: endpoint.ejected_until)
+        return None
+
+    async def _send(self, endpoint: Endpoint, request: httpx.Request) -> httpx.Response:
+        routed = httpx.Request(
+            request.method,
+            endpoint.url + str(request.url)[len(self.base_url):],
+            headers=[(name, value) for name, value in request.headers.raw if name.lower() != b"host"],
+            content=request.content,
+            extensions=request.extensions,
+        )
+        endpoint.inflight += 1
+        endpoint.requests += 1
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(routed)
+            try:
+                # read here, so the latency covers the body and a cancelled hedge frees its connection
+                content = b"".join([chunk async for chunk in response.aiter_raw()])
+            finally:
+                await response.aclose()
+        except httpx.TransportError:
+            self._failure(endpoint)
+            raise
+        finally:
+            endpoint.inflight -= 1
+        if _failed(response):
+            self._failure(endpoint)
+        else:
+            self._success(endpoint, time.perf_counter() - start)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(content),
+            extensions=response.extensions,
+        )
+
+    def _success(self, endpoint: Endpoint, latency: float):
+        if endpoint.latency == 0.0:
+            endpoint.latency = latency
+        else:
+            endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+        endpoint.failures = 0
+        endpoint.ejected_until = None
+        self.metrics.inc(ENDPOINT_REQUESTS, node=endpoint.url, outcome="ok")
+
+    def _failure(self, endpoint: Endpoint):
+        endpoint.errors += 1
+        endpoint.failures += 1
+        self.metrics.inc(ENDPOINT_REQUESTS, node=endpoint.url, outcome="error")
+        if endpoint.failures >= self.eject_after:
+            if endpoint.healthy:
+                self.metrics.inc(ENDPOINT_EJECTIONS, node=endpoint.url)
+            endpoint.ejected_until = time.monotonic() + self.probe_interval
+
+    def _probe(self, endpoint: Endpoint):
+        endpoint.probing = True
+        probe = asyncio.ensure_future(self._run_probe(endpoint))
+        self._probes.add(probe)
+        probe.add_done_callback(self._probes.discard)
+
+    async def _run_probe(self, endpoint: Endpoint):
+        try:
+            await self._send(endpoint, httpx.Request("GET", self.base_url))
+        except httpx.TransportError:
+            pass
+        finally:
+            endpoint.probing = False
+
+def _failed(response: httpx.Response) -> bool:
+    return response.status_code >= 500 or response.status_code == 429
+
+async def _behind(response: httpx.Response) -> bool:
+    # a read at a ledger_version past the node's latest one
+    return response.status_code == 404 and b"version_not_found" in await response.aread()
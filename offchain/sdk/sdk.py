@@ -1,30 +1,323 @@
+import asyncio
+import hashlib
+import json
+import re
 import time
-from typing import Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from aptos_sdk.account import Account
-from aptos_sdk.async_client import FaucetClient, RestClient, ClientConfig
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import FaucetClient, RestClient, ClientConfig, ApiError
 from aptos_sdk.transactions import EntryFunction, TransactionPayload, TransactionArgument, RawTransaction, SignedTransaction
 from aptos_sdk.bcs import Serializer
+from aptos_sdk.type_tag import TypeTag
+import httpx
+from .sequence import SequenceAllocator, is_sequence_error
+from .tracker import ConfirmationTracker
+from .headers import StoredHeader
+from .cache import ViewCache
+from .payload import TRANSACTION_HASH_PREFIX, EncodedPayload, EncodedSignedTransaction, TransactionSigner
+from .replay import TrafficRecorder
+from .router import EndpointRouter
+from .signing import SigningPool
+from .metrics import Metrics, GAS_BUCKETS, GAS_USED, HTTP_RESPONSES, MEMPOOL_REJECTIONS, SEQUENCE_RETRIES, TRANSACTIONS
+
+# default max_submit_transaction_batch_size of the node api
+BATCH_SUBMIT_LIMIT = 100
+
+# seconds from signing until a transaction expires, unless the caller gives an expiration
+EXPIRATION_SECS = 600
+
+# keys one batched view call looks at, MAX_VIEW_PAGE in the module
+VIEW_PAGE_LIMIT = 100
+
+# view calls of one paged wrapper in flight at once
+VIEW_PAGE_CONCURRENCY = 8
+
+def transaction_hash(signed_transaction: SignedTransaction | EncodedSignedTransaction) -> str:
+    # hash of Transaction::UserTransaction, the same value the node returns on submit
+    return "0x" + hashlib.sha3_256(TRANSACTION_HASH_PREFIX + b"\x00" + signed_transaction.bytes()).hexdigest()
+
+def rejection_code(error: ApiError) -> str:
+    # "... Validation Code: SEQUENCE_NUMBER_TOO_OLD" or the error_code of the json body
+    match = re.search(r"Code: ([A-Z_]+)", str(error))
+    if match:
+        return match.group(1)
+    try:
+        return str(json.loads(str(error)).get("error_code", "unknown"))
+    except (ValueError, AttributeError):
+        return "unknown"
 
 class AptosSDKPlus(RestClient):
-    def __init__(self, base_url, client_config: ClientConfig = ClientConfig()):
-        super().__init__(base_url, client_config)
+    def __init__(
+            self,
+            base_url: str | List[str],
+            client_config: ClientConfig = ClientConfig(),
+            view_cache: Optional[ViewCache] = None,
+            metrics: Optional[Metrics] = None,
+            hedge_after: Optional[float] = None,
+            signing_pool: Optional[SigningPool] = None,
+            record: Optional[str] = None,
+            transport: Optional[httpx.AsyncBaseTransport] = None
+        ):
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        super().__init__(urls[0].rstrip("/"), client_config)
+        # disabled unless given, a disabled Metrics makes every hook a no-op
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        # several urls are served by one router, a single url by a plain connection pool;
+        # a given transport, such as a ReplayTransport, takes the place of both
+        self.router: Optional[EndpointRouter] = None
+        if transport is None and len(urls) > 1:
+            self.router = EndpointRouter(urls, hedge_after=hedge_after, http2=client_config.http2, metrics=self.metrics)
+            transport = self.router
+        # logs every request with its answer and timing for a later replay
+        self.recorder: Optional[TrafficRecorder] = None
+        if record is not None:
+            self.recorder = TrafficRecorder(
+                record,
+                transport if transport is not None else httpx.AsyncHTTPTransport(http2=client_config.http2, limits=httpx.Limits()),
+            )
+            transport = self.recorder
+        # the client RestClient made is replaced before it sent anything; its pool is
+        # empty but still owned here, close() closes it as well
+        self._replaced_client: Optional[httpx.AsyncClient] = None
+        if transport is not None:
+            self._replaced_client = self.client
+            self.client = httpx.AsyncClient(
+                transport=transport,
+                timeout=self.client.timeout,
+                headers=self.client.headers,
+            )
+        if metrics is not None:
+            hooks = self.client.event_hooks
+            hooks["response"].append(self._record_response)
+            self.client.event_hooks = hooks
+        self.sequences: Dict[str, SequenceAllocator] = {}
+        # times a submission is re-signed after a SEQUENCE_NUMBER_TOO_OLD/NEW rejection
+        self.sequence_retries = 3
+        self.expiration_secs = EXPIRATION_SECS
+        self._chain_id_request: Optional[asyncio.Task] = None
+        # one polling loop confirms every outstanding transaction of this client
+        self.tracker = ConfirmationTracker(self, metrics=self.metrics)
+        # optional, views go straight to the node without it
+        self.view_cache = view_cache
+        self.tracker.on_commit = self._on_commit
+        # signers of pre-encoded payloads by (sender, max_gas_amount, gas_unit_price)
+        self._signers: Dict[Tuple[str, int, int], TransactionSigner] = {}
+        # signs in worker processes when given, in the event loop otherwise
+        self.signing_pool = signing_pool
+
+    async def close(self):
+        if self._replaced_client is not None:
+            await self._replaced_client.aclose()
+        await super().close()
+
+    async def chain_id(self) -> int:
+        # concurrent first callers share one ledger-info request
+        if self._chain_id is None:
+            if self._chain_id_request is None:
+                self._chain_id_request = asyncio.ensure_future(self._fetch_chain_id())
+            try:
+                await asyncio.shield(self._chain_id_request)
+            except Exception:
+                self._chain_id_request = None
+                raise
+        return self._chain_id
+
+    async def _fetch_chain_id(self) -> int:
+        with self.metrics.phase("chain_id"):
+            return await super().chain_id()
+
+    async def account(self, account_address: AccountAddress, ledger_version: Optional[int] = None) -> Dict[str, str]:
+        with self.metrics.phase("account"):
+            return await super().account(account_address, ledger_version)
+
+    async def _record_response(self, response: httpx.Response):
+        # endpoint with addresses and hashes folded, so the label set stays small
+        endpoint = re.sub(r"0x[0-9a-fA-F]+", "{id}", response.request.url.path)
+        self.metrics.inc(HTTP_RESPONSES, method=response.request.method, endpoint=endpoint, status=str(response.status_code))
+
+    def _record_rejection(self, error: ApiError):
+        self.metrics.inc(MEMPOOL_REJECTIONS, code=rejection_code(error))
+
+    def _on_commit(self, tx: dict):
+        # our own write is visible from its version on, cached views before it are stale
+        if self.view_cache is not None:
+            self.view_cache.observe(int(tx["version"]))
+        success = bool(tx["success"])
+        self.metrics.inc(TRANSACTIONS, outcome="success" if success else "failure")
+        self.metrics.observe(GAS_USED, int(tx["gas_used"]), GAS_BUCKETS, success=str(success).lower())
+
+    def expiration(self, expiration_timestamps_secs: Optional[int] = None) -> int:
+        # computed when a transaction is signed, a default argument would be fixed at import
+        if expiration_timestamps_secs is not None:
+            return expiration_timestamps_secs
+        return int(time.time()) + self.expiration_secs
+
+    def sequence_allocator(self, address: AccountAddress) -> SequenceAllocator:
+        key = str(address)
+        if key not in self.sequences:
+            self.sequences[key] = SequenceAllocator(self, address)
+        return self.sequences[key]
 
     async def transact(
             self,
-            entry_function: EntryFunction,
+            entry_function: EntryFunction | EncodedPayload,
             account_from: Account,
             max_gas_amount: int = 2000,
             gas_unit_price: int = 100,
-            expiration_timestamps_secs: int = int(time.time()) + 600,
+            expiration_timestamps_secs: Optional[int] = None,
             wait: bool = True
         ) -> str | Tuple[bool, str, int]:
-        # Get the chain ID for the transaction
+        tx_hash, sequence_number, expiration = await self._submit_entry_function(
+            entry_function, account_from, max_gas_amount, gas_unit_price, expiration_timestamps_secs
+        )
+
+        if wait:
+            return await self.tracker.track(tx_hash, account_from.address(), sequence_number, expiration)
+        else:
+            return tx_hash
+
+    async def submit(
+            self,
+            entry_function: EntryFunction | EncodedPayload,
+            account_from: Account,
+            max_gas_amount: int = 2000,
+            gas_unit_price: int = 100,
+            expiration_timestamps_secs: Optional[int] = None,
+            on_signed: Optional[Callable[[str, int, int], None]] = None
+        ) -> asyncio.Future:
+        # returns once the node accepted the transaction, the future resolves on commit.
+        # on_signed(tx_hash, sequence_number, expiration) runs before each signed
+        # transaction is posted, so a journal can record it first
+        tx_hash, sequence_number, expiration = await self._submit_entry_function(
+            entry_function, account_from, max_gas_amount, gas_unit_price, expiration_timestamps_secs, on_signed
+        )
+        return self.tracker.track(tx_hash, account_from.address(), sequence_number, expiration)
+
+    async def submit_at(
+            self,
+            entry_function: EntryFunction | EncodedPayload,
+            account_from: Account,
+            sequence_number: int,
+            max_gas_amount: int = 2000,
+            gas_unit_price: int = 100,
+            expiration_timestamps_secs: Optional[int] = None,
+            on_signed: Optional[Callable[[str, int, int], None]] = None
+        ) -> asyncio.Future:
+        # signs at a sequence number the caller already owns, e.g. to fill the gap an
+        # expired transaction left; the allocator is not involved and rejections raise
+        chain_id = await self.chain_id()
+        expiration = self.expiration(expiration_timestamps_secs)
+        signed_transaction = await self._sign(
+            entry_function, account_from, sequence_number,
+            max_gas_amount, gas_unit_price, expiration, chain_id
+        )
+        tx_hash = transaction_hash(signed_transaction)
+        if on_signed is not None:
+            on_signed(tx_hash, sequence_number, expiration)
+        try:
+            with self.metrics.phase("submit"):
+                await self.submit_bcs_transaction(signed_transaction)
+        except ApiError as e:
+            self._record_rejection(e)
+            raise
+        return self.tracker.track(tx_hash, account_from.address(), sequence_number, expiration)
+
+    async def _submit_entry_function(
+            self,
+            entry_function: EntryFunction | EncodedPayload,
+            account_from: Account,
+            max_gas_amount: int,
+            gas_unit_price: int,
+            expiration_timestamps_secs: Optional[int],
+            on_signed: Optional[Callable[[str, int, int], None]] = None
+        ) -> Tuple[str, int, int]:
+        # Get the chain ID for the transaction, fetched once per client
         chain_id = await self.chain_id()
-        
-        # Get the sender's current sequence number
-        account_data = await self.account(account_from.address())
-        sequence_number = int(account_data["sequence_number"])
-        
+
+        allocator = self.sequence_allocator(account_from.address())
+        attempt = 0
+        while True:
+            # Get the sender's next sequence number, allocated locally
+            sequence_number, generation = await allocator.allocate()
+
+            # a re-signed transaction gets a fresh expiration too
+            expiration = self.expiration(expiration_timestamps_secs)
+            try:
+                signed_transaction = await self._sign(
+                    entry_function, account_from, sequence_number,
+                    max_gas_amount, gas_unit_price, expiration, chain_id
+                )
+            except BaseException:
+                allocator.release(sequence_number)
+                raise
+            if on_signed is not None:
+                on_signed(transaction_hash(signed_transaction), sequence_number, expiration)
+
+            # Submit the signed transaction to the blockchain
+            # This broadcasts the transaction to the network for processing
+            try:
+                with self.metrics.phase("submit"):
+                    tx_hash = await self.submit_bcs_transaction(signed_transaction)
+                break
+            except ApiError as e:
+                self._record_rejection(e)
+                if is_sequence_error(e) and attempt < self.sequence_retries:
+                    # local view of the sequence number drifted, refetch it and re-sign;
+                    # a number found too new is free again, one found too old is spent
+                    attempt += 1
+                    self.metrics.inc(SEQUENCE_RETRIES)
+                    await allocator.resync(generation)
+                    allocator.release(sequence_number)
+                    continue
+                allocator.release(sequence_number)
+                raise
+            except BaseException:
+                # a timeout, a connection error or a cancel; if the node got it after all,
+                # mempool rejects the number's next user until it commits
+                allocator.release(sequence_number)
+                raise
+
+        return tx_hash, sequence_number, expiration
+
+    async def _sign(
+            self,
+            entry_function: EntryFunction | EncodedPayload,
+            account_from: Account,
+            sequence_number: int,
+            max_gas_amount: int,
+            gas_unit_price: int,
+            expiration_timestamps_secs: int,
+            chain_id: int
+        ) -> SignedTransaction | EncodedSignedTransaction:
+        with self.metrics.phase("sign"):
+            if self.signing_pool is not None:
+                return await self.signing_pool.sign(
+                    account_from, chain_id, max_gas_amount, gas_unit_price,
+                    sequence_number, entry_function, expiration_timestamps_secs
+                )
+            return self._sign_transaction(
+                entry_function, account_from, sequence_number,
+                max_gas_amount, gas_unit_price, expiration_timestamps_secs, chain_id
+            )
+
+    def _sign_transaction(
+            self,
+            entry_function: EntryFunction | EncodedPayload,
+            account_from: Account,
+            sequence_number: int,
+            max_gas_amount: int,
+            gas_unit_price: int,
+            expiration_timestamps_secs: int,
+            chain_id: int
+        ) -> SignedTransaction | EncodedSignedTransaction:
+        if isinstance(entry_function, EncodedPayload):
+            # fast path, the payload is already BCS and the rest of the transaction comes from cached bytes
+            key = (str(account_from.address()), max_gas_amount, gas_unit_price)
+            if key not in self._signers:
+                self._signers[key] = TransactionSigner(account_from, chain_id, max_gas_amount, gas_unit_price)
+            return self._signers[key].sign(sequence_number, entry_function, expiration_timestamps_secs)
+
         # Create the raw transaction with all required fields
         raw_transaction = RawTransaction(
             sender=account_from.address(),                                    # Sender's address
@@ -32,47 +325,261 @@ class AptosSDKPlus(RestClient):
             payload=TransactionPayload(entry_function),                # The function to call
             max_gas_amount=max_gas_amount,                                       # Maximum gas units to use
             gas_unit_price=gas_unit_price,                                        # Price per gas unit in octas
-            expiration_timestamps_secs=expiration_timestamps_secs,         # Expires in 10 minutes
+            expiration_timestamps_secs=expiration_timestamps_secs,         # Expires after expiration_secs
             chain_id=chain_id,                                         # Chain ID to ensure correct network
         )
-        
-        # print("Transaction built successfully")
-        # print(f"Sender: {raw_transaction.sender}")
-        # print(f"Sequence Number: {raw_transaction.sequence_number}")
-        # print(f"Max Gas Amount: {raw_transaction.max_gas_amount}")
-        # print(f"Gas Unit Price: {raw_transaction.gas_unit_price}")
-        # print(f"Expiration Timestamp: {time.ctime(raw_transaction.expiration_timestamps_secs)}")
-
-        # 3. Sign the transaction
-        # print("\n=== 3. Signing the transaction ===")
-        
+
         # Sign the raw transaction with the sender's private key
         # This creates a cryptographic signature that proves the sender authorized this transaction
         authenticator = account_from.sign_transaction(raw_transaction)
-        signed_transaction = SignedTransaction(raw_transaction, authenticator)
-        
-        # print("Transaction signed successfully")
-
-        # 4. Submit the transaction
-        # print("\n=== 4. Submitting the transaction ===")
-        
-        # Submit the signed transaction to the blockchain
-        # This broadcasts the transaction to the network for processing
-        tx_hash = await self.submit_bcs_transaction(signed_transaction)
-        
-        # print(f"Transaction submitted with hash: {tx_hash}")
+        return SignedTransaction(raw_transaction, authenticator)
 
+    async def transact_many(
+            self,
+            entry_functions: List[EntryFunction | EncodedPayload],
+            account_from: Account,
+            max_gas_amount: int = 2000,
+            gas_unit_price: int = 100,
+            expiration_timestamps_secs: Optional[int] = None,
+            wait: bool = True
+        ) -> List[Tuple[bool, str, int] | Exception] | List[asyncio.Future]:
+        futures = await self.submit_many(
+            entry_functions, account_from, max_gas_amount, gas_unit_price, expiration_timestamps_secs
+        )
         if wait:
-            return await self.wait_tx(tx_hash)
+            # rejected and dropped transactions show up as their exception at the same index
+            return await asyncio.gather(*futures, return_exceptions=True)
         else:
-            return tx_hash
-    
+            return futures
+
+    async def submit_many(
+            self,
+            entry_functions: List[EntryFunction | EncodedPayload],
+            account_from: Account,
+            max_gas_amount: int = 2000,
+            gas_unit_price: int = 100,
+            expiration_timestamps_secs: Optional[int] = None
+        ) -> List[asyncio.Future]:
+        # signs the payloads with the next sequence numbers, released ones first, and
+        # posts them through /transactions/batch; a transaction rejected by the node, or
+        # in a chunk whose request failed, gets the error set on the future at its index
+        # and its number released, the others resolve on commit
+        chain_id = await self.chain_id()
+        allocator = self.sequence_allocator(account_from.address())
+        futures: List[asyncio.Future] = []
+        for start in range(0, len(entry_functions), BATCH_SUBMIT_LIMIT):
+            chunk = entry_functions[start:start + BATCH_SUBMIT_LIMIT]
+            numbers, generation = await allocator.allocate_many(len(chunk))
+            expiration = self.expiration(expiration_timestamps_secs)
+            try:
+                signed_transactions = await self._sign_many(
+                    chunk, account_from, numbers, max_gas_amount, gas_unit_price, expiration, chain_id
+                )
+            except BaseException:
+                for sequence_number in numbers:
+                    allocator.release(sequence_number)
+                raise
+            try:
+                with self.metrics.phase("submit_batch"):
+                    failures: Dict[int, Exception] = await self.submit_bcs_transactions(signed_transactions)
+            except Exception as e:
+                # the request failed as a whole, e.g. a 503 or a timeout; every transaction
+                # of the chunk gets the error and the chunks already sent stay tracked
+                failures = dict.fromkeys(range(len(chunk)), e)
+            except BaseException:
+                for sequence_number in numbers:
+                    allocator.release(sequence_number)
+                raise
+            resync = False
+            for i, sequence_number in enumerate(numbers):
+                if i in failures:
+                    if isinstance(failures[i], ApiError):
+                        self._record_rejection(failures[i])
+                        resync = resync or is_sequence_error(failures[i])
+                    allocator.release(sequence_number)
+            if resync:
+                await allocator.resync(generation)
+            for i, signed_transaction in enumerate(signed_transactions):
+                if i in failures:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_exception(failures[i])
+                else:
+                    future = self.tracker.track(
+                        transaction_hash(signed_transaction), account_from.address(), numbers[i], expiration
+                    )
+                futures.append(future)
+        return futures
+
+    async def _sign_many(
+            self,
+            entry_functions: List[EntryFunction | EncodedPayload],
+            account_from: Account,
+            sequence_numbers: List[int],
+            max_gas_amount: int,
+            gas_unit_price: int,
+            expiration_timestamps_secs: int,
+            chain_id: int
+        ) -> List[SignedTransaction | EncodedSignedTransaction]:
+        # one sequence number per payload, a pool signs the chunk as whole batches
+        if self.signing_pool is None:
+            return [
+                await self._sign(
+                    entry_function, account_from, sequence_number,
+                    max_gas_amount, gas_unit_price, expiration_timestamps_secs, chain_id
+                )
+                for sequence_number, entry_function in zip(sequence_numbers, entry_functions)
+            ]
+        with self.metrics.phase("sign"):
+            return await self.signing_pool.sign_many(
+                account_from, chain_id, max_gas_amount, gas_unit_price,
+                [
+                    (sequence_number, entry_function, expiration_timestamps_secs)
+                    for sequence_number, entry_function in zip(sequence_numbers, entry_functions)
+                ]
+            )
+
+    async def submit_bcs_transactions(self, signed_transactions: List[SignedTransaction | EncodedSignedTransaction]) -> Dict[int, ApiError]:
+        # posts all transactions in one request and returns the rejected ones by index
+        ser = Serializer()
+        ser.sequence(signed_transactions, Serializer.struct)
+        headers = {"Content-Type": "application/x.aptos.signed_transaction+bcs"}
+        response = await self.client.post(
+            f"{self.base_url}/transactions/batch",
+            headers=headers,
+            content=ser.output(),
+        )
+        if response.status_code >= 400:
+            raise ApiError(response.text, response.status_code)
+        failures: Dict[int, ApiError] = {}
+        for failure in response.json().get("transaction_failures", []):
+            failures[int(failure["transaction_index"])] = ApiError(json.dumps(failure["error"]), response.status_code)
+        return failures
+
     async def wait_tx(self, tx_hash: str) -> Tuple[bool, str, int]:
-        await self.wait_for_transaction(tx_hash)
-        transaction_details = await self.transaction_by_hash(tx_hash)
-        success = transaction_details["success"]
-        vm_status = transaction_details["vm_status"]
-        gas_used = transaction_details["gas_used"]
-        return bool(success), str(vm_status), int(gas_used)
-        
-        
\ No newline at end of file
+        return await self.tracker.track(tx_hash)
+
+    async def view_bcs_payload(
+            self,
+            module: str,
+            function: str,
+            ty_args: List[TypeTag],
+            args: List[TransactionArgument],
+            ledger_version: Optional[int] = None
+        ) -> Any:
+        with self.metrics.phase("view", function=function):
+            if self.view_cache is None:
+                return await super().view_bcs_payload(module, function, ty_args, args, ledger_version)
+            return await self.view_cache.fetch(module, function, ty_args, args, ledger_version, self._view_at)
+
+    async def _view_at(
+            self,
+            module: str,
+            function: str,
+            ty_args: List[TypeTag],
+            args: List[TransactionArgument],
+            ledger_version: Optional[int]
+        ) -> Tuple[Any, int]:
+        # same request as view_bcs_payload, also returns the ledger version it was served at
+        request = f"{self.base_url}/view"
+        if ledger_version is not None:
+            request = f"{request}?ledger_version={ledger_version}"
+        ser = Serializer()
+        EntryFunction.natural(module, function, ty_args, args).serialize(ser)
+        headers = {"Content-Type": "application/x.aptos.view_function+bcs"}
+        response = await self.client.post(request, headers=headers, content=ser.output())
+        if response.status_code >= 400:
+            raise ApiError(response.text, response.status_code)
+        return response.json(), int(response.headers["x-aptos-ledger-version"])
+
+    async def get_headers(self, module: str, chain_id: int, start: int, end: int) -> List[StoredHeader]:
+        # headers of chain_id with height in [start, end); heights are sparse, so pages
+        # follow a cursor past the last height returned instead of splitting the range
+        headers: List[StoredHeader] = []
+        while start < end:
+            heights, relay_heights, roots = await self.view_bcs_payload(
+                module=module,
+                function="getHeaders",
+                ty_args=[],
+                args=[
+                    TransactionArgument(chain_id, Serializer.u64),
+                    TransactionArgument(start, Serializer.u64),
+                    TransactionArgument(end, Serializer.u64),
+                ]
+            )
+            for height, relay_height, root in zip(heights, relay_heights, roots):
+                headers.append(StoredHeader(chain_id, int(height), int(relay_height), _hex_bytes(root)))
+            if len(heights) < VIEW_PAGE_LIMIT:
+                break
+            start = int(heights[-1]) + 1
+        return headers
+
+    async def get_hcrs(self, module: str, start: int, end: int) -> Dict[int, bytes]:
+        # HCR of every relay height in [start, end) that has one, paged by cursor like get_headers
+        hcrs: Dict[int, bytes] = {}
+        while start < end:
+            relay_heights, page_hcrs = await self.view_bcs_payload(
+                module=module,
+                function="getHCRs",
+                ty_args=[],
+                args=[
+                    TransactionArgument(start, Serializer.u64),
+                    TransactionArgument(end, Serializer.u64),
+                ]
+            )
+            for relay_height, hcr in zip(relay_heights, page_hcrs):
+                hcrs[int(relay_height)] = _hex_bytes(hcr)
+            if len(relay_heights) < VIEW_PAGE_LIMIT:
+                break
+            start = int(relay_heights[-1]) + 1
+        return hcrs
+
+    async def get_relay_headers_votes(self, module: str, relay_heights: List[int]) -> Tuple[List[int], int]:
+        # votes of each relay height in input order, and the number of parachains
+        pages = await _gather_bounded([
+            self.view_bcs_payload(
+                module=module,
+                function="getRelayHeadersVotes",
+                ty_args=[],
+                args=[
+                    TransactionArgument(relay_heights[start:start + VIEW_PAGE_LIMIT], Serializer.sequence_serializer(Serializer.u64)),
+                ]
+            )
+            for start in range(0, len(relay_heights), VIEW_PAGE_LIMIT)
+        ])
+        votes: List[int] = []
+        max_votes = 0
+        for page_votes, page_max_votes in pages:
+            votes.extend(int(v) for v in page_votes)
+            # pages may straddle a registration, report the latest count seen
+            max_votes = max(max_votes, int(page_max_votes))
+        return votes, max_votes
+
+    async def check_para_headers_valid(self, module: str, headers: List[Tuple[int, int]]) -> List[int]:
+        # checkParaHeaderValid status of each (chainId, height) in input order
+        pages = await _gather_bounded([
+            self.view_bcs_payload(
+                module=module,
+                function="checkParaHeadersValid",
+                ty_args=[],
+                args=[
+                    TransactionArgument([chain_id for chain_id, _ in page], Serializer.sequence_serializer(Serializer.u64)),
+                    TransactionArgument([height for _, height in page], Serializer.sequence_serializer(Serializer.u64)),
+                ]
+            )
+            for page in [headers[start:start + VIEW_PAGE_LIMIT] for start in range(0, len(headers), VIEW_PAGE_LIMIT)]
+        ])
+        return [int(status) for page in pages for status in page[0]]
+
+async def _gather_bounded(calls: List[Awaitable], limit: int = VIEW_PAGE_CONCURRENCY) -> List[Any]:
+    # like asyncio.gather, with at most `limit` of the calls running at once
+    gate = asyncio.Semaphore(limit)
+
+    async def run(call: Awaitable) -> Any:
+        async with gate:
+            return await call
+
+    return await asyncio.gather(*[run(call) for call in calls])
+
+def _hex_bytes(value: str) -> bytes:
+    # vector<u8> view results come back as 0x-prefixed hex
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
@@ -0,0 +1,83 @@
+import asyncio
+import bisect
+from typing import List, Optional, Tuple
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import RestClient, ApiError
+
+SEQUENCE_NUMBER_TOO_OLD = "SEQUENCE_NUMBER_TOO_OLD"
+SEQUENCE_NUMBER_TOO_NEW = "SEQUENCE_NUMBER_TOO_NEW"
+
+def is_sequence_error(error: ApiError) -> bool:
+    # mempool rejects with the vm status code embedded in the error body
+    message = str(error)
+    return SEQUENCE_NUMBER_TOO_OLD in message or SEQUENCE_NUMBER_TOO_NEW in message
+
+class SequenceAllocator:
+    """
+    Hands out sequence numbers of one account locally.
+
+    The on-chain sequence number is fetched once and then incremented in memory, so
+    many transactions of the same sender can be in flight at once. A number whose
+    transaction never reached mempool is released and handed out again before any
+    new one, since every later number waits in mempool until the gap is filled.
+
+    Every sync bumps a generation counter; a caller whose transaction was rejected
+    passes back the generation it was allocated in, so a burst of rejections only
+    resyncs once. A sync never hands out a number that is still out again: the next
+    number becomes max(on-chain, highest outstanding + 1).
+    """
+
+    def __init__(self, client: RestClient, address: AccountAddress):
+        self.client = client
+        self.address = address
+        self._lock = asyncio.Lock()
+        self._next: Optional[int] = None
+        # released numbers below _next, ascending
+        self._free: List[int] = []
+        # the on-chain sequence number at the last sync, lower numbers are spent
+        self._synced = 0
+        self._generation = 0
+
+    async def allocate(self) -> Tuple[int, int]:
+        numbers, generation = await self.allocate_many(1)
+        return numbers[0], generation
+
+    async def allocate_many(self, count: int) -> Tuple[List[int], int]:
+        # reserves `count` numbers, released ones first, and returns them ascending
+        async with self._lock:
+            if self._next is None:
+                await self._sync()
+            numbers = self._free[:count]
+            del self._free[:count]
+            fresh = count - len(numbers)
+            numbers.extend(range(self._next, self._next + fresh))
+            self._next += fresh
+            return numbers, self._generation
+
+    async def resync(self, generation: int):
+        async with self._lock:
+            # someone already resynced after this number was handed out
+            if generation != self._generation:
+                return
+            await self._sync()
+
+    def release(self, sequence_number: int):
+        # the transaction never reached mempool, so its number is free again
+        if self._next is None or not self._synced <= sequence_number < self._next:
+            return
+        index = bisect.bisect_left(self._free, sequence_number)
+        if index < len(self._free) and self._free[index] == sequence_number:
+            return
+        self._free.insert(index, sequence_number)
+        # released numbers at the top shrink the range instead
+        while self._free and self._free[-1] == self._next - 1:
+            self._free.pop()
+            self._next -= 1
+
+    async def _sync(self):
+        account_data = await self.client.account(self.address)
+        self._synced = int(account_data["sequence_number"])
+        # numbers below the chain's are spent, numbers still out stay taken
+        self._free = [number for number in self._free if number >= self._synced]
+        self._next = self._synced if self._next is None else max(self._synced, self._next)
+        self._generation += 1
@@ -0,0 +1,333 @@
+import asyncio
+import multiprocessing
+import queue
+import time
+import traceback
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from aptos_sdk import ed25519
+from aptos_sdk.account import Account
+from aptos_sdk.account_address import AccountAddress
+from .headers import HeaderBatcher, ParaHeader
+from .metrics import Metrics
+from .outbox import Outbox
+from .pool import SenderPool
+from .relayer import Relayer, RelayerClosed
+from .sdk import AptosSDKPlus
+from .signing import SigningPool
+
+# headers handed to a shard in one message
+SHARD_BATCH_SIZE = 256
+
+# header batches a shard's inbox holds before put() waits for it
+SHARD_QUEUE_BATCHES = 64
+
+# seconds the messages of an exited shard get to arrive before it counts as crashed
+SHARD_EXIT_GRACE = 2.0
+
+class _ShardConfig(NamedTuple):
+    index: int
+    urls: List[str]
+    # (address, private key) as strings, an Account does not pickle
+    operators: List[Tuple[str, str]]
+    batcher: HeaderBatcher
+    relayer: Dict[str, object]
+    journal: Optional[str]
+    hedge_after: Optional[float]
+    sign_workers: int
+    metrics: bool
+    stats_interval: float
+
+class _Stop(NamedTuple):
+    # the last message to a shard, with the seconds it has to relay what it holds
+    timeout: Optional[float]
+
+def _shard_main(config: _ShardConfig, inbox, results):
+    asyncio.run(_run_shard(config, inbox, results))
+
+async def _run_shard(config: _ShardConfig, inbox, results):
+    loop = asyncio.get_running_loop()
+    metrics = Metrics() if config.metrics else None
+    signing_pool = SigningPool(config.sign_workers) if config.sign_workers > 0 else None
+    sdk = AptosSDKPlus(config.urls, metrics=metrics, hedge_after=config.hedge_after, signing_pool=signing_pool)
+    operators = [
+        Account(AccountAddress.from_str(address), ed25519.PrivateKey.from_str(key, strict=False))
+        for address, key in config.operators
+    ]
+    outbox = Outbox(sdk, config.journal) if config.journal is not None else None
+    recovery = asyncio.ensure_future(outbox.recover(operators)) if outbox is not None else None
+    settled: List[Tuple[List[ParaHeader], bool, str, int]] = []
+    relayer = Relayer(
+        sdk,
+        operators[0] if len(operators) == 1 else SenderPool(sdk, operators),
+        config.batcher,
+        on_result=lambda headers, success, vm_status, gas_used: settled.append((headers, success, vm_status, gas_used)),
+        outbox=outbox,
+        **config.relayer,
+    )
+    relayer.start()
+
+    def report(kind: str, *extra):
+        if settled:
+            results.put(("results", config.index, list(settled)))
+            settled.clear()
+        results.put((kind, config.index, relayer.stats(), metrics.snapshot() if metrics is not None else None, *extra))
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(config.stats_interval)
+            report("stats")
+
+    reporting = asyncio.ensure_future(reporter())
+    timeout: Optional[float] = None
+    error = None
+    try:
+        while True:
+            # the inbox blocks, a thread waits on it so the relayer keeps sending
+            message = await loop.run_in_executor(None, inbox.get)
+            if isinstance(message, _Stop):
+                timeout = message.timeout
+                break
+            for header in message:
+                await relayer.put(header)
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        deadline = None if timeout is None else loop.time() + timeout
+        left = await relayer.stop(timeout)
+        reporting.cancel()
+        if recovery is not None:
+            try:
+                # the coordinator ends the shard soon after the deadline, what recovery has
+                # not resent by then stays journaled
+                await asyncio.wait_for(recovery, None if deadline is None else max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+            outbox.close()
+        report("stopped", left, error)
+        await sdk.close()
+        if signing_pool is not None:
+            signing_pool.close()
+
+class ShardedRelayer:
+    """
+    Runs one Relayer per process and deals parachains out to them by chainId.
+
+    A single event loop spends most of a relay round on BCS encoding, ed25519
+    signing and JSON decoding, so past a few thousand headers per second one
+    process is CPU bound however many transactions are in flight. Each shard is a
+    spawned process with its own AptosSDKPlus, connection pool, confirmation
+    tracker and Relayer; chain `chainId % shards` always goes to the same shard,
+    so a chain's headers keep their order and are signed by one of that shard's
+    operators. Operators are dealt round-robin, every shard needs at least one and
+    signs only with its own, so sequence numbers never cross processes. With
+    `sign_workers` each shard also signs in a SigningPool of that many processes.
+
+    put() buffers headers per shard and hands them over in batches of
+    `batch_size` through a bounded queue, waiting while a shard's queue is full;
+    a shard's Relayer pushes back the same way once its chain queues fill up.
+    Shards report settled batches to `on_result` and their stats and metrics
+    every `stats_interval` seconds; stats() and metrics() merge the latest ones.
+    With `journal` shard i keeps its outbox at "{journal}.{i}", recovered on the
+    next start as long as the operators and the shard count stay the same.
+    """
+
+    def __init__(
+            self,
+            urls: str | List[str],
+            operators: List[Account],
+            batcher: HeaderBatcher,
+            shards: int,
+            queue_size: int = 1000,
+            max_inflight: int = 32,
+            gas_budget: Optional[int] = None,
+            linger: float = 0.05,
+            max_attempts: int = 3,
+            on_result: Optional[Callable[[List[ParaHeader], bool, str, int], None]] = None,
+            journal: Optional[str] = None,
+            hedge_after: Optional[float] = None,
+            sign_workers: int = 0,
+            metrics: bool = False,
+            batch_size: int = SHARD_BATCH_SIZE,
+            stats_interval: float = 1.0
+        ):
+        if shards < 1 or len(operators) < shards:
+            raise ValueError(f"{shards} shards need at least as many operators, got {len(operators)}")
+        self.shards = shards
+        self.batch_size = batch_size
+        self.linger = linger
+        self.on_result = on_result
+        context = multiprocessing.get_context("spawn")
+        self.inboxes = [context.Queue(SHARD_QUEUE_BATCHES) for _ in range(shards)]
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(
+                target=_shard_main,
+                args=(
+                    _ShardConfig(
+                        index,
+                        [urls] if isinstance(urls, str) else list(urls),
+                        [(str(operator.address()), str(operator.private_key)) for operator in operators[index::shards]],
+                        batcher,
+                        {
+                            "queue_size": queue_size,
+                            "max_inflight": max_inflight,
+                            "gas_budget": gas_budget,
+                            "linger": linger,
+                            "max_attempts": max_attempts,
+                        },
+                        f"{journal}.{index}" if journal is not None else None,
+                        hedge_after,
+                        sign_workers,
+                        metrics,
+                        stats_interval,
+                    ),
+                    self.inboxes[index],
+                    self.results,
+                ),
+                name=f"relayer-shard-{index}",
+                # not a daemon, a shard may start signing processes of its own
+            )
+            for index in range(shards)
+        ]
+        self.errors: Dict[int, str] = {}
+        self._buffers: List[List[ParaHeader]] = [[] for _ in range(shards)]
+        self._stats: List[Dict[str, int]] = [{} for _ in range(shards)]
+        self._snapshots: List[Optional[dict]] = [None] * shards
+        self._left: List[ParaHeader] = []
+        self._stopped = [False] * shards
+        self._collector: Optional[asyncio.Future] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def shard_of(self, chain_id: int) -> int:
+        return chain_id % self.shards
+
+    def stats(self) -> Dict[str, int]:
+        merged: Dict[str, int] = {}
+        for stats in self._stats:
+            for name, value in stats.items():
+                merged[name] = merged.get(name, 0) + value
+        merged["buffered"] = sum(len(buffer) for buffer in self._buffers)
+        return merged
+
+    def metrics(self) -> Metrics:
+        merged = Metrics()
+        for snapshot in self._snapshots:
+            if snapshot is not None:
+                merged.merge(snapshot)
+        return merged
+
+    def start(self):
+        if self._collector is not None:
+            return
+        for process in self.processes:
+            process.start()
+        loop = asyncio.get_running_loop()
+        self._collector = loop.run_in_executor(None, self._collect, loop)
+        self._flusher = asyncio.ensure_future(self._flush_periodically())
+
+    async def put(self, header: ParaHeader):
+        if self._closing:
+            raise RelayerClosed()
+        shard = self.shard_of(header.chainId)
+        buffer = self._buffers[shard]
+        buffer.append(header)
+        if len(buffer) >= self.batch_size:
+            await self._flush(shard)
+
+    async def stop(self, timeout: Optional[float] = None) -> List[ParaHeader]:
+        # like Relayer.stop(), every shard relays what it holds within `timeout` and
+        # returns the rest; a shard that crashed returns nothing
+        self._closing = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for shard in range(self.shards):
+            await self._flush(shard)
+            await self._hand_over(shard, _Stop(None if deadline is None else max(deadline - time.monotonic(), 0)))
+        if self._collector is not None:
+            try:
+                # a shard stops its relayer with the time that is left, plus a moment to report
+                await asyncio.wait_for(
+                    asyncio.shield(self._collector),
+                    None if deadline is None else max(deadline - time.monotonic(), 0) + 5.0,
+                )
+            except asyncio.TimeoutError:
+                for process in self.processes:
+                    if process.is_alive():
+                        process.terminate()
+                await self._collector
+        for process in self.processes:
+            process.join()
+        return self._left
+
+    async def _flush_periodically(self):
+        # a partial batch waits at most `linger` in the coordinator
+        while True:
+            await asyncio.sleep(max(self.linger, 0.01))
+            for shard in range(self.shards):
+                await self._flush(shard)
+
+    async def _flush(self, shard: int):
+        if not self._buffers[shard]:
+            return
+        headers = self._buffers[shard]
+        self._buffers[shard] = []
+        await self._hand_over(shard, headers)
+
+    async def _hand_over(self, shard: int, message: List[ParaHeader] | _Stop):
+        inbox = self.inboxes[shard]
+        while True:
+            if self._stopped[shard]:
+                # the shard is gone, its headers come back with stop()
+                if not isinstance(message, _Stop):
+                    self._left.extend(message)
+                return
+            try:
+                inbox.put_nowait(message)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    def _collect(self, loop: asyncio.AbstractEventLoop):
+        # runs in a thread, hands every message from the shards to the event loop
+        exited: Dict[int, float] = {}
+        while not all(self._stopped):
+            try:
+                message = self.results.get(timeout=0.5)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                if message[0] == "stopped":
+                    self._stopped[message[1]] = True
+                loop.call_soon_threadsafe(self._receive, message)
+            # checked after every message, a queue kept busy by the other shards must not
+            # hide a dead one; what it sent before exiting is read first, unless that takes
+            # longer than SHARD_EXIT_GRACE
+            now = time.monotonic()
+            for shard, process in enumerate(self.processes):
+                if self._stopped[shard] or process.exitcode is None:
+                    continue
+                exited.setdefault(shard, now)
+                if message is None or now - exited[shard] >= SHARD_EXIT_GRACE:
+                    loop.call_soon_threadsafe(self._crashed, shard, process.exitcode)
+                    self._stopped[shard] = True
+
+    def _receive(self, message: tuple):
+        kind, shard = message[0], message[1]
+        if kind == "results":
+            if self.on_result is not None:
+                for headers, success, vm_status, gas_used in message[2]:
+                    self.on_result(headers, success, vm_status, gas_used)
+            return
+        self._stats[shard] = message[2]
+        if message[3] is not None:
+            self._snapshots[shard] = message[3]
+        if kind == "stopped":
+            self._left.extend(message[4])
+            if message[5] is not None:
+                self.errors[shard] = message[5]
+
+    def _crashed(self, shard: int, exitcode: int):
+        self.errors[shard] = f"shard process exited with code {exitcode}"
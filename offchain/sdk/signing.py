@@ -0,0 +1,117 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from aptos_sdk import ed25519
+from aptos_sdk.account import Account
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.transactions import EntryFunction
+from nacl.signing import SigningKey
+from .payload import EncodedPayload, EncodedSignedTransaction, TransactionSigner, encode_payload
+
+# transactions handed to a worker in one call
+SIGN_BATCH_SIZE = 64
+
+# (sender address, private key seed, chain id, max_gas_amount, gas_unit_price)
+SignerKey = Tuple[bytes, bytes, int, int, int]
+
+# worker side, signers are built once per process and key
+_signers: Dict[SignerKey, TransactionSigner] = {}
+
+def _sign_batch(key: SignerKey, items: List[Tuple[int, EntryFunction | EncodedPayload, int]]) -> List[bytes]:
+    signer = _signers.get(key)
+    if signer is None:
+        address, seed, chain_id, max_gas_amount, gas_unit_price = key
+        account = Account(AccountAddress(address), ed25519.PrivateKey(SigningKey(seed)))
+        signer = _signers[key] = TransactionSigner(account, chain_id, max_gas_amount, gas_unit_price)
+    return [
+        signer.sign(sequence_number, encode_payload(entry_function), expiration).data
+        for sequence_number, entry_function, expiration in items
+    ]
+
+class SigningPool:
+    """
+    Encodes and signs transactions in worker processes, off the event loop.
+
+    sign() calls made in the same turn of the loop are grouped by sender and gas
+    settings and sent to the workers in batches of `batch_size`, so a process
+    hop costs one pickle round trip per batch rather than per transaction.
+    sign_many() sends an already formed batch directly. Entry functions are BCS
+    encoded in the worker as well; the result is the same EncodedSignedTransaction
+    TransactionSigner returns in process.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = SIGN_BATCH_SIZE):
+        # spawned workers do not inherit the event loop or open sockets of the parent
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.batch_size = batch_size
+        self._pending: Dict[SignerKey, List[Tuple[Tuple[int, EntryFunction | EncodedPayload, int], asyncio.Future]]] = {}
+        self._flush_scheduled = False
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def sign(
+            self,
+            account: Account,
+            chain_id: int,
+            max_gas_amount: int,
+            gas_unit_price: int,
+            sequence_number: int,
+            entry_function: EntryFunction | EncodedPayload,
+            expiration_timestamps_secs: int
+        ) -> EncodedSignedTransaction:
+        loop = asyncio.get_running_loop()
+        key = _signer_key(account, chain_id, max_gas_amount, gas_unit_price)
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append(((sequence_number, entry_function, expiration_timestamps_secs), future))
+        if len(pending) >= self.batch_size:
+            self._dispatch(key, self._pending.pop(key))
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+        return await future
+
+    async def sign_many(
+            self,
+            account: Account,
+            chain_id: int,
+            max_gas_amount: int,
+            gas_unit_price: int,
+            items: List[Tuple[int, EntryFunction | EncodedPayload, int]]
+        ) -> List[EncodedSignedTransaction]:
+        # items are (sequence_number, entry_function, expiration), results keep their order
+        loop = asyncio.get_running_loop()
+        key = _signer_key(account, chain_id, max_gas_amount, gas_unit_price)
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _sign_batch, key, items[start:start + self.batch_size])
+            for start in range(0, len(items), self.batch_size)
+        ])
+        return [EncodedSignedTransaction(data) for batch in batches for data in batch]
+
+    def _flush(self):
+        self._flush_scheduled = False
+        pending = self._pending
+        self._pending = {}
+        for key, entries in pending.items():
+            self._dispatch(key, entries)
+
+    def _dispatch(self, key: SignerKey, entries: List[Tuple[Tuple[int, EntryFunction | EncodedPayload, int], asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        batch = loop.run_in_executor(self.executor, _sign_batch, key, [item for item, _ in entries])
+
+        def resolve(batch: asyncio.Future):
+            error = batch.exception() if not batch.cancelled() else asyncio.CancelledError()
+            for i, (_, future) in enumerate(entries):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(EncodedSignedTransaction(batch.result()[i]))
+
+        batch.add_done_callback(resolve)
+
+def _signer_key(account: Account, chain_id: int, max_gas_amount: int, gas_unit_price: int) -> SignerKey:
+    return (account.address().address, account.private_key.key.encode(), chain_id, max_gas_amount, gas_unit_price)
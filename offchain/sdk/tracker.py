@@ -0,0 +1,172 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import RestClient, ApiError
+from .metrics import Metrics, PHASE_BUCKETS, PHASE_SECONDS, TRANSACTIONS
+
+# the node caps one page of account transactions at 100
+ACCOUNT_PAGE_LIMIT = 100
+
+class TransactionDropped(Exception):
+    """The transaction did not commit in time; it may still commit unless it is one of the subclasses"""
+
+    def __init__(self, message: str, tx_hash: str):
+        super().__init__(message)
+        self.tx_hash = tx_hash
+
+class TransactionExpired(TransactionDropped):
+    """The ledger passed the transaction's expiration without committing it, it never will"""
+
+class TransactionReplaced(TransactionDropped):
+    """Another transaction committed with the same sender and sequence number"""
+
+class _Pending:
+    def __init__(self, tx_hash: str, future: asyncio.Future, tracked_at: float, deadline: float, expiration: Optional[int]):
+        self.tx_hash = tx_hash
+        self.future = future
+        self.tracked_at = tracked_at
+        self.deadline = deadline
+        self.expiration = expiration
+
+class ConfirmationTracker:
+    """
+    Resolves confirmations of many outstanding transactions from one polling loop.
+
+    Transactions tracked with their sender and sequence number are confirmed by scanning
+    the sender's committed transactions, so one request covers up to 100 of them; the
+    rest fall back to a lookup by hash. Each future resolves to (success, vm_status,
+    gas_used) taken from the same response.
+
+    A transaction tracked with its expiration fails with TransactionExpired as soon as
+    a poll response shows a ledger timestamp past it while the transaction is not
+    committed; this does not wait for the local timeout.
+    """
+
+    def __init__(self, client: RestClient, interval: float = 0.5, timeout: Optional[float] = None, metrics: Optional[Metrics] = None):
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout if timeout is not None else client.client_config.transaction_wait_in_seconds
+        self._by_sender: Dict[str, Tuple[AccountAddress, Dict[int, _Pending]]] = {}
+        self._by_hash: Dict[str, _Pending] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        # called with every committed transaction this tracker resolves
+        self.on_commit: Optional[Callable[[dict], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._by_hash) + sum(len(pending) for _, pending in self._by_sender.values())
+
+    def track(
+            self,
+            tx_hash: str,
+            sender: Optional[AccountAddress] = None,
+            sequence_number: Optional[int] = None,
+            expiration: Optional[int] = None
+        ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        now = time.monotonic()
+        pending = _Pending(tx_hash, future, now, now + self.timeout, expiration)
+        if sender is not None and sequence_number is not None:
+            key = str(sender)
+            if key not in self._by_sender:
+                self._by_sender[key] = (sender, {})
+            self._by_sender[key][1][sequence_number] = pending
+        else:
+            self._by_hash[tx_hash] = pending
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.ensure_future(self._run())
+        return future
+
+    async def _run(self):
+        while len(self) > 0:
+            await asyncio.sleep(self.interval)
+            # a failed poll is retried next round, deadlines still apply
+            with self.metrics.phase("poll"):
+                await asyncio.gather(
+                    *[self._poll_sender(key) for key in list(self._by_sender)],
+                    *[self._poll_hash(tx_hash) for tx_hash in list(self._by_hash)],
+                    return_exceptions=True,
+                )
+            self._expire()
+
+    async def _poll_sender(self, key: str):
+        sender, pending = self._by_sender[key]
+        start = min(pending)
+        limit = min(max(pending) - start + 1, ACCOUNT_PAGE_LIMIT)
+        response = await self.client._get(
+            endpoint=f"accounts/{sender}/transactions", params={"limit": limit, "start": start}
+        )
+        # a 404 means nothing of this account committed yet
+        if response.status_code >= 400 and response.status_code != 404:
+            raise ApiError(response.text, response.status_code)
+        transactions = response.json() if response.status_code < 400 else []
+        for tx in transactions:
+            entry = pending.pop(int(tx["sequence_number"]), None)
+            if entry is None or entry.future.done():
+                continue
+            if tx["hash"] != entry.tx_hash:
+                self._dropped(entry, f"sequence number {tx['sequence_number']} of {sender} committed as {tx['hash']}", TransactionReplaced)
+                continue
+            self._committed(entry, tx)
+        # whatever of the scanned range is still pending did not commit up to this ledger timestamp
+        timestamp = _ledger_timestamp(response)
+        for sequence_number in [n for n in pending if n < start + limit]:
+            if pending[sequence_number].expiration is not None and _expired(pending[sequence_number], timestamp):
+                self._dropped(pending.pop(sequence_number), None, TransactionExpired)
+        if not pending:
+            del self._by_sender[key]
+
+    async def _poll_hash(self, tx_hash: str):
+        response = await self.client._get(endpoint=f"transactions/by_hash/{tx_hash}")
+        if response.status_code >= 400 and response.status_code != 404:
+            raise ApiError(response.text, response.status_code)
+        if response.status_code == 404 or response.json()["type"] == "pending_transaction":
+            entry = self._by_hash[tx_hash]
+            if entry.expiration is not None and _expired(entry, _ledger_timestamp(response)):
+                self._dropped(self._by_hash.pop(tx_hash), None, TransactionExpired)
+            return
+        tx = response.json()
+        entry = self._by_hash.pop(tx_hash)
+        if not entry.future.done():
+            self._committed(entry, tx)
+
+    def _committed(self, entry: _Pending, tx: dict):
+        if self.on_commit is not None:
+            self.on_commit(tx)
+        self.metrics.observe(PHASE_SECONDS, time.monotonic() - entry.tracked_at, PHASE_BUCKETS, phase="confirm", outcome="ok")
+        entry.future.set_result(_outcome(tx))
+
+    def _dropped(self, entry: _Pending, message: Optional[str], error: type = TransactionDropped):
+        if entry.future.done():
+            return
+        if message is None:
+            message = f"transaction {entry.tx_hash} expired at {entry.expiration} without committing"
+        self.metrics.inc(TRANSACTIONS, outcome="expired" if error is TransactionExpired else "dropped")
+        self.metrics.observe(PHASE_SECONDS, time.monotonic() - entry.tracked_at, PHASE_BUCKETS, phase="confirm", outcome="error")
+        entry.future.set_exception(error(message, entry.tx_hash))
+
+    def _expire(self):
+        now = time.monotonic()
+        expired: List[_Pending] = []
+        for key in list(self._by_sender):
+            pending = self._by_sender[key][1]
+            for sequence_number in [n for n, entry in pending.items() if entry.deadline <= now]:
+                expired.append(pending.pop(sequence_number))
+            if not pending:
+                del self._by_sender[key]
+        for tx_hash in [h for h, entry in self._by_hash.items() if entry.deadline <= now]:
+            expired.append(self._by_hash.pop(tx_hash))
+        for entry in expired:
+            if not entry.future.done():
+                self._dropped(entry, f"transaction {entry.tx_hash} timed out")
+
+def _ledger_timestamp(response) -> Optional[int]:
+    value = response.headers.get("x-aptos-ledger-timestampusec")
+    return int(value) if value is not None else None
+
+def _expired(entry: _Pending, ledger_timestamp_usecs: Optional[int]) -> bool:
+    return ledger_timestamp_usecs is not None and entry.expiration * 1_000_000 <= ledger_timestamp_usecs
+
+def _outcome(tx: dict) -> Tuple[bool, str, int]:
+    return bool(tx["success"]), str(tx["vm_status"]), int(tx["gas_used"])
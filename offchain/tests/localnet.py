@@ -0,0 +1,60 @@
+import contextlib
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+import httpx
+from aiohttp.test_utils import TestServer
+from aptos_sdk.account import Account
+from localnode.node import LocalNode
+
+# helpers of the tests: in-process local nodes on free ports, and a transport that
+# fails chosen requests before they reach the node
+
+def fresh_node(**options) -> Tuple[Account, str, LocalNode]:
+    # a new module owner and a node hosting its module, fast blocks unless given
+    owner = Account.generate()
+    module = f"{owner.address()}::AptosTrust"
+    options.setdefault("block_time", 0.05)
+    return owner, module, LocalNode(module, **options)
+
+@contextlib.asynccontextmanager
+async def serving(node: LocalNode, **faults) -> AsyncIterator[str]:
+    # serves node.app(**faults) and yields its /v1 url
+    server = TestServer(node.app(**faults))
+    await server.start_server()
+    try:
+        yield str(server.make_url("/v1"))
+    finally:
+        await server.close()
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """
+    Passes requests on to a real connection pool, except those `fail` picks: given
+    the request it returns an exception to raise or a status to answer with, or
+    None to pass the request on.
+    """
+
+    def __init__(self, fail: Callable[[httpx.Request], Optional[Exception | int]]):
+        self.fail = fail
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        failure = self.fail(request)
+        if isinstance(failure, Exception):
+            raise failure
+        if failure is not None:
+            return httpx.Response(failure, json={"message": "injected failure", "error_code": "internal_error"})
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def on_post(suffix: str, failure: Exception | int, times: int = 1) -> Callable[[httpx.Request], Optional[Exception | int]]:
+    # fails the first `times` POSTs to a path ending in suffix
+    seen: List[httpx.Request] = []
+
+    def fail(request: httpx.Request) -> Optional[Exception | int]:
+        if request.method != "POST" or not request.url.path.endswith(suffix):
+            return None
+        seen.append(request)
+        return failure if len(seen) <= times else None
+
+    return fail
@@ -0,0 +1,117 @@
+import asyncio
+import json
+from typing import List
+import pytest
+from aptos_sdk.account import Account
+from sdk.outbox import Outbox, OutboxEntry, OutboxFailed, _put_record
+from sdk.payload import RegistParaChainTemplate, encode_payload
+from sdk.sdk import AptosSDKPlus
+from tests.localnet import FlakyTransport, fresh_node, on_post, serving
+
+def ops(path: str) -> List[str]:
+    with open(path) as f:
+        return [json.loads(line)["op"] for line in f]
+
+def journal(path: str, records: List[dict]):
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+def test_recovers_an_attempt_journaled_as_signed_only(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+
+    async def scenario():
+        owner, module, node = fresh_node()
+        template = RegistParaChainTemplate(module)
+        async with serving(node) as url:
+            client = AptosSDKPlus(url)
+            try:
+                # the node took the attempt, the process crashed before "sent"
+                attempt = {}
+                await client.submit(template.chain(1001), owner, on_signed=lambda h, n, e: attempt.update(hash=h, expiration=e))
+                entry = OutboxEntry("k", str(owner.address()), encode_payload(template.chain(1001)), 2000, 100)
+                journal(path, [
+                    _put_record(entry),
+                    {"op": "signed", "key": "k", "hash": attempt["hash"], "expiration": attempt["expiration"]},
+                ])
+                outbox = Outbox(client, path)
+                assert len(outbox) == 1
+                [outcome] = await outbox.recover([owner])
+                assert outcome[0]
+                assert len(outbox) == 0
+                # followed by hash, not sent again
+                assert int((await client.account(owner.address()))["sequence_number"]) == 1
+                outbox.close()
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+def test_rejected_attempt_does_not_keep_its_number(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+
+    async def scenario():
+        owner, module, node = fresh_node()
+        async with serving(node) as url:
+            client = AptosSDKPlus(url, transport=FlakyTransport(on_post("/transactions", 503)))
+            try:
+                outbox = Outbox(client, path)
+                assert (await outbox.send(RegistParaChainTemplate(module).chain(1001), owner))[0]
+                outbox.close()
+                assert ops(path) == ["put", "signed", "signed", "sent", "done"]
+                with open(path) as f:
+                    [sent] = [record for record in map(json.loads, f) if record["op"] == "sent"]
+                # the rejected attempt gave number 0 back, the accepted one reused it
+                assert sent["sequence"] == 0
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+def test_compaction_keeps_pending_entries(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+
+    async def scenario():
+        owner, module, node = fresh_node()
+        template = RegistParaChainTemplate(module)
+        # an entry of another sender, never recovered by this run
+        other = OutboxEntry("other", str(Account.generate().address()), encode_payload(template.chain(999)), 2000, 100)
+        journal(path, [_put_record(other)])
+        async with serving(node) as url:
+            client = AptosSDKPlus(url)
+            try:
+                outbox = Outbox(client, path, compact_after=2)
+                outcomes = await asyncio.gather(*[outbox.send(template.chain(chainId), owner) for chainId in range(1001, 1005)])
+                assert all(outcome[0] for outcome in outcomes)
+                while outbox._compacting is not None:
+                    await asyncio.sleep(0.01)
+                outbox.close()
+            finally:
+                await client.close()
+        assert "put" in ops(path)
+        reloaded = Outbox(None, path)
+        assert list(reloaded.pending) == ["other"]
+        assert ops(path) == ["put"]
+        reloaded.close()
+
+    asyncio.run(scenario())
+
+def test_gives_up_on_attempts_that_keep_expiring(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+
+    async def scenario():
+        # every transaction is accepted and lost
+        owner, module, node = fresh_node(drop_rate=1.0)
+        async with serving(node) as url:
+            client = AptosSDKPlus(url)
+            try:
+                outbox = Outbox(client, path, expiration_secs=1, max_attempts=2)
+                with pytest.raises(OutboxFailed):
+                    await asyncio.wait_for(outbox.send(RegistParaChainTemplate(module).chain(1001), owner), 20)
+                assert len(outbox) == 0
+                outbox.close()
+                assert ops(path) == ["put", "signed", "sent", "signed", "sent", "done"]
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,149 @@
+import asyncio
+from typing import List, Tuple
+import httpx
+from sdk.headers import HeaderBatcher, ParaHeader
+from sdk.outbox import Outbox
+from sdk.payload import RegistParaChainTemplate
+from sdk.relayer import Relayer
+from sdk.replay import ReplayTransport
+from sdk.sdk import AptosSDKPlus
+from sdk.tracker import TransactionDropped
+from tests.localnet import fresh_node, serving
+
+ROOT = b"\x01" * 32
+HCR = b"\x00" * 32
+
+def header(chainId: int, height: int, root: bytes = ROOT) -> ParaHeader:
+    return ParaHeader(chainId, height, root, HCR, [])
+
+class Results:
+    # on_result of a relayer, every header with its outcome
+    def __init__(self):
+        self.outcomes: List[Tuple[Tuple[int, int], bool, str]] = []
+
+    def __call__(self, headers: List[ParaHeader], success: bool, vm_status: str, gas_used: int):
+        self.outcomes.extend(((h.chainId, h.height), success, vm_status) for h in headers)
+
+    def of(self, chainId: int, height: int) -> Tuple[bool, str]:
+        return next((success, vm_status) for key, success, vm_status in self.outcomes if key == (chainId, height))
+
+async def register(client: AptosSDKPlus, owner, module: str, chainIds: List[int]):
+    template = RegistParaChainTemplate(module)
+    assert all(result[0] for result in await client.transact_many([template.chain(c) for c in chainIds], owner))
+
+def test_put_skips_headers_already_queued():
+    async def scenario():
+        owner, module, _ = fresh_node()
+        relayer = Relayer(None, owner, HeaderBatcher(module))
+        await relayer.put(header(1001, 1))
+        await relayer.put(header(1001, 1, b"\x02" * 32))
+        assert relayer.put_nowait(header(1001, 1))
+        await relayer.put(header(1001, 2))
+        assert len(relayer) == 2
+
+    asyncio.run(scenario())
+
+def test_retry_looks_up_stored_headers():
+    async def scenario():
+        owner, module, node = fresh_node()
+        async with serving(node) as url:
+            client = AptosSDKPlus(url)
+            try:
+                await register(client, owner, module, [1001, 1002])
+                # another relayer stored a sibling of (1002, 5)
+                batcher = HeaderBatcher(module, max_headers=4)
+                assert (await client.transact(batcher.entry_function([header(1002, 5, b"\x09" * 32)]), owner))[0]
+
+                submit = client.submit
+                calls = []
+
+                async def flaky_submit(*args, **kwargs):
+                    calls.append(args)
+                    attempt = len(calls)
+                    confirmation = await submit(*args, **kwargs)
+                    if attempt == 1:
+                        # committed, but reported as dropped
+                        await confirmation
+                        raise TransactionDropped("timed out", "0x0")
+                    if attempt == 2:
+                        # accepted, but the answer was lost
+                        raise httpx.ReadTimeout("lost")
+                    return confirmation
+
+                client.submit = flaky_submit
+                results = Results()
+                relayer = Relayer(client, owner, batcher, max_inflight=1, linger=0, on_result=results)
+                for height in range(1, 7):
+                    for chainId in (1001, 1002):
+                        await relayer.put(header(chainId, height))
+                relayer.start()
+                assert await relayer.stop(30) == []
+
+                assert len(results.outcomes) == 12
+                # the dropped batch had committed and is not sent again
+                assert all(results.of(1001, h)[0] and results.of(1002, h)[0] for h in (1, 2))
+                assert "stored on chain" in results.of(1001, 1)[1]
+                # the sibling fails alone, the rest of its batch still goes through
+                assert results.of(1002, 5)[0] is False
+                assert sum(1 for _, success, _ in results.outcomes if success) == 11
+                assert relayer.stats()["committed"] == 11 and relayer.stats()["failed"] == 1
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+def test_stop_leaves_journaled_batches_to_the_outbox(tmp_path):
+    async def scenario():
+        # accepted and lost, so every batch is still unconfirmed at the timeout
+        owner, module, node = fresh_node(drop_rate=1.0)
+        async with serving(node) as url:
+            client = AptosSDKPlus(url)
+            try:
+                outbox = Outbox(client, str(tmp_path / "outbox.jsonl"))
+                relayer = Relayer(client, owner, HeaderBatcher(module, max_headers=2), max_inflight=2, linger=0, outbox=outbox)
+                for height in range(1, 6):
+                    await relayer.put(header(1001, height))
+                relayer.start()
+                left = await relayer.stop(0.5)
+                # two batches in flight are in the journal, the fifth header never left the queue
+                assert [(h.chainId, h.height) for h in left] == [(1001, 5)]
+                assert len(outbox) == 2
+                outbox.close()
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+def test_replayed_run_matches_the_recording(tmp_path):
+    log = str(tmp_path / "traffic.jsonl")
+
+    async def run(client: AptosSDKPlus, owner, module: str) -> Results:
+        await register(client, owner, module, [1001, 1002, 1003])
+        results = Results()
+        # one transaction at a time, so both runs form the same batches
+        relayer = Relayer(client, owner, HeaderBatcher(module, max_headers=5), max_inflight=1, linger=0, on_result=results)
+        for height in range(1, 5):
+            for chainId in (1001, 1002, 1003):
+                await relayer.put(header(chainId, height))
+        relayer.start()
+        assert await relayer.stop(30) == []
+        return results
+
+    async def scenario():
+        owner, module, node = fresh_node()
+        async with serving(node) as url:
+            client = AptosSDKPlus(url, record=log)
+            try:
+                recorded = await run(client, owner, module)
+            finally:
+                await client.close()
+        replay = ReplayTransport(log, latency_scale=0.0)
+        client = AptosSDKPlus(url, transport=replay)
+        try:
+            replayed = await run(client, owner, module)
+        finally:
+            await client.close()
+        assert replayed.outcomes == recorded.outcomes
+        assert all(success for _, success, _ in replayed.outcomes)
+
+    asyncio.run(scenario())
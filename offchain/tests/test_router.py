@@ -0,0 +1,68 @@
+import asyncio
+from localnode.node import LocalNode
+from sdk.payload import RegistParaChainTemplate
+from sdk.sdk import AptosSDKPlus
+from tests.localnet import fresh_node, serving
+
+def test_failing_node_is_ejected_and_probed_back():
+    async def scenario():
+        owner, module, node = fresh_node(seed=1)
+        # both serve one ledger, the first follows node.failure_rate
+        node.failure_rate = 1.0
+        async with serving(node) as failing, serving(node, failure_rate=0.0) as good:
+            client = AptosSDKPlus([failing, good])
+            router = client.router
+            router.eject_after = 2
+            router.probe_interval = 0.2
+            router.explore = 0.0
+            flaky, steady = router.endpoints
+            try:
+                # every read fails over to the good node
+                for _ in range(2):
+                    await client.info()
+                assert not flaky.healthy and flaky.errors == 2
+                for _ in range(5):
+                    await client.info()
+                assert flaky.requests == 2
+                assert [stats["healthy"] for stats in router.stats()] == [False, True]
+
+                node.failure_rate = 0.0
+                await asyncio.sleep(router.probe_interval)
+                # the next read finds the node due and probes it
+                await client.info()
+                while flaky.probing:
+                    await asyncio.sleep(0.01)
+                assert flaky.healthy and flaky.failures == 0
+                assert flaky.requests == 3
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+def test_read_passes_a_node_behind_the_version():
+    async def scenario():
+        owner, module, ahead = fresh_node()
+        # never produces a block while the test runs
+        behind = LocalNode(module, block_time=60)
+        async with serving(ahead) as leading, serving(behind) as lagging:
+            writer = AptosSDKPlus(leading)
+            client = AptosSDKPlus([leading, lagging])
+            try:
+                template = RegistParaChainTemplate(module)
+                assert all(result[0] for result in await writer.transact_many([template.chain(c) for c in range(1001, 1004)], owner))
+                # every block moves the version on, hold it still so the pinned one stays served
+                ahead.block_time = 60
+                await asyncio.sleep(0.1)
+                assert behind.version < ahead.version
+                # the lagging node looks faster, so the read goes there first
+                steady, lagging_endpoint = client.router.endpoints
+                steady.latency, lagging_endpoint.latency = 1.0, 0.0001
+                client.router.explore = 0.0
+                count, version = await client._view_at(module, "getParachainCount", [], [], ahead.version)
+                assert int(count[0]) == 3 and version == ahead.version
+                assert lagging_endpoint.requests == 1 and lagging_endpoint.healthy and lagging_endpoint.errors == 0
+            finally:
+                await writer.close()
+                await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,107 @@
+import asyncio
+import httpx
+import pytest
+from aptos_sdk.account_address import AccountAddress
+from aptos_sdk.async_client import ApiError
+import sdk.sdk
+from sdk.payload import RegistParaChainTemplate
+from sdk.sdk import AptosSDKPlus
+from sdk.sequence import SequenceAllocator
+from tests.localnet import FlakyTransport, fresh_node, on_post, serving
+
+class ChainState:
+    # stands in for the client, answers account() with a sequence number the test sets
+    def __init__(self, sequence_number: int):
+        self.sequence_number = sequence_number
+        self.reads = 0
+
+    async def account(self, address: AccountAddress) -> dict:
+        self.reads += 1
+        return {"sequence_number": str(self.sequence_number)}
+
+def allocator(sequence_number: int = 0) -> SequenceAllocator:
+    return SequenceAllocator(ChainState(sequence_number), AccountAddress.from_str("0x1"))
+
+def test_released_number_is_handed_out_first():
+    async def scenario():
+        numbers = allocator(7)
+        first = [(await numbers.allocate())[0] for _ in range(4)]
+        assert first == [7, 8, 9, 10]
+        # 8 never reached mempool while 9 and 10 did, the next transaction fills the gap
+        numbers.release(8)
+        assert (await numbers.allocate())[0] == 8
+        assert (await numbers.allocate())[0] == 11
+        assert numbers.client.reads == 1
+
+    asyncio.run(scenario())
+
+def test_released_top_numbers_shrink_the_range():
+    async def scenario():
+        numbers = allocator()
+        taken, _ = await numbers.allocate_many(5)
+        for number in reversed(taken[2:]):
+            numbers.release(number)
+        assert await numbers.allocate_many(2) == ([2, 3], numbers._generation)
+
+    asyncio.run(scenario())
+
+def test_resync_keeps_numbers_still_out():
+    async def scenario():
+        numbers = allocator(3)
+        _, generation = await numbers.allocate_many(10)
+        # the chain has only committed up to 5, 6..12 are in flight
+        numbers.client.sequence_number = 5
+        await numbers.resync(generation)
+        assert (await numbers.allocate())[0] == 13
+
+    asyncio.run(scenario())
+
+def test_resync_drops_released_numbers_the_chain_passed():
+    async def scenario():
+        numbers = allocator()
+        _, generation = await numbers.allocate_many(4)
+        numbers.release(1)
+        # another client of the same account used 0..5
+        numbers.client.sequence_number = 6
+        await numbers.resync(generation)
+        assert (await numbers.allocate())[0] == 6
+        # a resync asked for with a stale generation is not repeated
+        await numbers.resync(generation)
+        assert numbers.client.reads == 2
+
+    asyncio.run(scenario())
+
+def test_transport_error_releases_the_number():
+    async def scenario():
+        owner, module, node = fresh_node()
+        template = RegistParaChainTemplate(module)
+        async with serving(node) as url:
+            client = AptosSDKPlus(url, transport=FlakyTransport(on_post("/transactions", httpx.ConnectError("lost"))))
+            try:
+                with pytest.raises(httpx.ConnectError):
+                    await client.transact(template.chain(1001), owner)
+                assert (await client.transact(template.chain(1002), owner))[0]
+                assert int((await client.account(owner.address()))["sequence_number"]) == 1
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+def test_failed_batch_request_fails_its_chunk_only(monkeypatch):
+    monkeypatch.setattr(sdk.sdk, "BATCH_SUBMIT_LIMIT", 3)
+
+    async def scenario():
+        owner, module, node = fresh_node()
+        template = RegistParaChainTemplate(module)
+        async with serving(node) as url:
+            client = AptosSDKPlus(url, transport=FlakyTransport(on_post("/transactions/batch", 503)))
+            try:
+                results = await client.transact_many([template.chain(chainId) for chainId in range(1001, 1007)], owner)
+                assert [isinstance(result, ApiError) for result in results] == [True] * 3 + [False] * 3
+                assert all(result[0] for result in results[3:])
+                # the second chunk took the numbers the first one released
+                assert int((await client.account(owner.address()))["sequence_number"]) == 3
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import pytest
+from localnode.trust import EHEADER_PRUNED, AptosTrust, MoveAbort, Retention
+
+OWNER = "0x1"
+ROOT = b"\x01" * 32
+
+def pruning(keep: int) -> AptosTrust:
+    # every collect prunes relay heights more than one block back and their headers
+    trust = AptosTrust(f"{OWNER}::AptosTrust", OWNER)
+    trust.retention = Retention(1, 10, keep)
+    return trust
+
+def collect(trust: AptosTrust, height: int, current_height: int):
+    trust._collect(OWNER, [10], [height], [ROOT], [[]], current_height)
+
+def test_pruned_header_is_not_collected_again():
+    trust = pruning(0)
+    collect(trust, 1, 1)
+    collect(trust, 2, 3)
+    assert 1 in trust.allHeaders[10].anchors
+    with pytest.raises(MoveAbort) as abort:
+        collect(trust, 1, 4)
+    assert abort.value.code == EHEADER_PRUNED
+    # the chain still takes new headers and prunes them
+    collect(trust, 3, 5)
+    collect(trust, 4, 7)
+    chain = trust.allHeaders[10]
+    assert list(chain.headers) == [4] and sorted(chain.anchors) == [1, 2, 3]
+
+def test_header_below_expired_anchors_is_not_collected():
+    trust = pruning(1)
+    collect(trust, 2, 1)
+    collect(trust, 4, 2)
+    collect(trust, 6, 4)
+    chain = trust.allHeaders[10]
+    assert chain.expiredTo == 2 and list(chain.anchors) == [4]
+    with pytest.raises(MoveAbort) as abort:
+        collect(trust, 1, 5)
+    assert abort.value.code == EHEADER_PRUNED
+    collect(trust, 5, 6)
@@ -7,28 +7,54 @@ module kimroniny::AptosTrust {
     use 0x1::ordered_map;
     use 0x1::account;
     use 0x1::event;
-    use std::bcs;
+    use 0x1::table;
+    use std::option::{Self, Option};
 
     const MODULE_OWNER: address = @kimroniny;
 
     const ENOT_MODULE_OWNER: u64 = 1;
     const EVERIFY_HEADER_FAILED: u64 = 2;
     const EINVALID_ROOT_LENGTH: u64 = 3;
+    const EBATCH_LENGTH_MISMATCH: u64 = 4;
+    const EPAGE_TOO_LARGE: u64 = 5;
+    const ENOT_OPERATOR: u64 = 6;
+    const EHEADER_PRUNED: u64 = 7;
+
+    // keys one batched view call looks at
+    const MAX_VIEW_PAGE: u64 = 100;
 
     struct ParaChains has key {
-        chains: big_ordered_map::BigOrderedMap<u64, bool>
+        chains: big_ordered_map::BigOrderedMap<u64, bool>,
+        // kept in step with `chains`, compute_length walks every leaf
+        count: u64
     }
 
-    struct Header has store, copy {
+    struct Header has store, copy, drop {
         chainId: u64,
         height: u64,
         relayHeight: u64,
         root: vector<u8>
     }
 
+    /// Headers of one parachain ordered by height. Each chain lives in its own
+    /// table slot, so headers of different chains do not write the same state.
+    struct ChainHeaders has store {
+        // headers stored now, pruned ones are not counted
+        count: u64,
+        latest: u64,
+        headers: big_ordered_map::BigOrderedMap<u64, Header>,
+        // number of pruned headers and the highest pruned height
+        pruned: u64,
+        prunedTo: u64,
+        // pruned headers, height => relayHeight, at most Retention.keep of the latest
+        anchors: big_ordered_map::BigOrderedMap<u64, u64>,
+        // anchors dropped beyond Retention.keep and the highest height among them
+        expired: u64,
+        expiredTo: u64
+    }
+
     struct AllHeaders has key {
-        headersByChainId: ordered_map::OrderedMap<u64, vector<u64>>,
-        headersByHeight: ordered_map::OrderedMap<vector<u8>, Header>
+        chains: table::Table<u64, ChainHeaders>
     }
 
     struct HCRByHeight has key {
@@ -36,19 +62,125 @@ module kimroniny::AptosTrust {
     }
 
     struct VotesByHeight has key {
-        votes: big_ordered_map::BigOrderedMap<u64, u64>
+        votes: big_ordered_map::BigOrderedMap<u64, u64>,
+        // relay heights that reached quorum => hub block height it happened at
+        finalized: table::Table<u64, u64>
+    }
+
+    /// Addresses besides the owner that may collect headers, so headers can be
+    /// signed by several accounts instead of queuing on the owner's sequence number.
+    /// `move_to` publishes under the signer's own address, so addOperator creates
+    /// every resource the collect path writes before an operator can reach it.
+    struct Operators has key {
+        operators: big_ordered_map::BigOrderedMap<address, bool>,
+        count: u64
+    }
+
+    /// Events let off-chain indexers follow the module from transactions instead of
+    /// polling the views. Vote totals are absolute, so replaying an event is harmless.
+    #[event]
+    struct ParaChainRegistered has drop, store {
+        chainId: u64,
+        // registered parachains including this one
+        count: u64
+    }
+
+    #[event]
+    struct HeaderCollected has drop, store {
+        chainId: u64,
+        height: u64,
+        relayHeight: u64,
+        root: vector<u8>
+    }
+
+    /// Totals after the sequences of one header are counted, relayHeights[i] has votes[i].
+    #[event]
+    struct VotesCounted has drop, store {
+        relayHeights: vector<u64>,
+        votes: vector<u64>
+    }
+
+    #[event]
+    struct RelayHeaderFinalized has drop, store {
+        relayHeight: u64,
+        // hub block height the quorum was reached at
+        finalizedAt: u64,
+        votes: u64
+    }
+
+    #[event]
+    struct OperatorUpdated has drop, store {
+        operator: address,
+        authorized: bool
+    }
+
+    public entry fun addOperator(owner: &signer, operator: address) acquires Operators {
+        assert!(signer::address_of(owner) == MODULE_OWNER, ENOT_MODULE_OWNER);
+        initVotes(owner);
+        initHeaders(owner);
+        initHCRs(owner);
+        if (!exists<Operators>(MODULE_OWNER)) {
+            move_to(owner, Operators {operators: big_ordered_map::new<address, bool>(), count: 0});
+        };
+        let operators = borrow_global_mut<Operators>(MODULE_OWNER);
+        if (operator == MODULE_OWNER || operators.operators.contains(&operator)) {
+            return;
+        };
+        operators.operators.add(operator, true);
+        operators.count = operators.count + 1;
+        event::emit(OperatorUpdated {operator: operator, authorized: true});
+    }
+
+    public entry fun removeOperator(owner: &signer, operator: address) acquires Operators {
+        assert!(signer::address_of(owner) == MODULE_OWNER, ENOT_MODULE_OWNER);
+        if (!exists<Operators>(MODULE_OWNER)) {
+            return;
+        };
+        let operators = borrow_global_mut<Operators>(MODULE_OWNER);
+        if (!operators.operators.contains(&operator)) {
+            return;
+        };
+        operators.operators.remove(&operator);
+        operators.count = operators.count - 1;
+        event::emit(OperatorUpdated {operator: operator, authorized: false});
+    }
+
+    /// The owner is always an operator.
+    #[view]
+    public fun isOperator(operator: address): bool acquires Operators {
+        if (operator == MODULE_OWNER) {
+            return true;
+        };
+        if (!exists<Operators>(MODULE_OWNER)) {
+            return false;
+        };
+        borrow_global<Operators>(MODULE_OWNER).operators.contains(&operator)
+    }
+
+    #[view]
+    public fun getOperatorCount(): u64 acquires Operators {
+        if (!exists<Operators>(MODULE_OWNER)) {
+            return 0;
+        };
+        borrow_global<Operators>(MODULE_OWNER).count
+    }
+
+    fun assertOperator(operator: &signer) acquires Operators {
+        assert!(isOperator(signer::address_of(operator)), ENOT_OPERATOR);
     }
 
     public entry fun registParaChain(operator: &signer, chainId: u64) acquires ParaChains {
         assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
         if (!exists<ParaChains>(MODULE_OWNER)) {
-            move_to(operator, ParaChains {chains: big_ordered_map::new<u64, bool>()});
+            move_to(operator, ParaChains {chains: big_ordered_map::new<u64, bool>(), count: 0});
         };
-        let chains_mut = &mut borrow_global_mut<ParaChains>(MODULE_OWNER).chains;
-        if (chains_mut.contains(&chainId)) {
+        let paraChains = borrow_global_mut<ParaChains>(MODULE_OWNER);
+        if (paraChains.chains.contains(&chainId)) {
             return;
         };
-        chains_mut.add(chainId, true);
+        paraChains.chains.add(chainId, true);
+        paraChains.count = paraChains.count + 1;
+        event::emit(ParaChainRegistered {chainId: chainId, count: paraChains.count});
     }
 
     #[view]
@@ -65,8 +197,7 @@ module kimroniny::AptosTrust {
         if (!exists<ParaChains>(MODULE_OWNER)) {
             return 0;
         };
-        let chains = & borrow_global<ParaChains>(MODULE_OWNER).chains;
-        chains.compute_length()
+        borrow_global<ParaChains>(MODULE_OWNER).count
     }
 
     fun verifyHeader(operator: &signer, chainId: u64, height: u64, root: vector<u8>): bool {
@@ -74,30 +205,61 @@ module kimroniny::AptosTrust {
         true
     }
 
-    fun storeHeader(operator: &signer, chainId: u64, height: u64, root: vector<u8>) acquires AllHeaders {
-        assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
+    fun storeHeader(operator: &signer, chainId: u64, height: u64, root: vector<u8>) acquires AllHeaders,Operators {
+        assertOperator(operator);
+        initHeaders(operator);
+        let current_height = block::get_current_block_height();
+        storeHeaderInto(borrow_global_mut<AllHeaders>(MODULE_OWNER), chainId, height, root, current_height);
+    }
+
+    fun initHeaders(operator: &signer) {
         if (!exists<AllHeaders>(MODULE_OWNER)) {
             move_to(operator, AllHeaders {
-                headersByChainId: ordered_map::new<u64, vector<u64>>(),
-                headersByHeight: ordered_map::new<vector<u8>, Header>()
+                chains: table::new<u64, ChainHeaders>()
             });
         };
-        let AllHeaders {headersByChainId, headersByHeight} = borrow_global_mut<AllHeaders>(MODULE_OWNER);
-        if (!headersByChainId.contains(&chainId)) {
-            headersByChainId.add(chainId, vector::empty<u64>());
+    }
+
+    fun storeHeaderInto(allHeaders: &mut AllHeaders, chainId: u64, height: u64, root: vector<u8>, relayHeight: u64) {
+        let chains = &mut allHeaders.chains;
+        if (!chains.contains(chainId)) {
+            // header size varies with the root, let the map pick its node degrees
+            chains.add(chainId, ChainHeaders {
+                count: 0,
+                latest: 0,
+                headers: big_ordered_map::new_with_config<u64, Header>(0, 0, false),
+                pruned: 0,
+                prunedTo: 0,
+                anchors: big_ordered_map::new<u64, u64>(),
+                expired: 0,
+                expiredTo: 0
+            });
         };
-        let heights = headersByChainId.borrow_mut(&chainId);
-        heights.push_back(height);
-        let chainIdBytes = bcs::to_bytes(&chainId);
-        let heightBytes = bcs::to_bytes(&height);
-        chainIdBytes.append(heightBytes);
-        let current_height = block::get_current_block_height();
-        headersByHeight.add(chainIdBytes, Header {
+        let chain = chains.borrow_mut(chainId);
+        // a pruned height is answered by its anchor, pruning it twice would abort every later collect of the chain
+        assert!(!chain.anchors.contains(&height) && (chain.expired == 0 || height > chain.expiredTo), EHEADER_PRUNED);
+        chain.headers.add(height, Header {
             chainId: chainId,
             height: height,
-            relayHeight: current_height,
+            relayHeight: relayHeight,
             root: root
         });
+        chain.count = chain.count + 1;
+        if (height > chain.latest) {
+            chain.latest = height;
+        };
+        event::emit(HeaderCollected {chainId: chainId, height: height, relayHeight: relayHeight, root: root});
+    }
+
+    fun findHeader(allHeaders: &AllHeaders, chainId: u64, height: u64): Option<Header> {
+        if (!allHeaders.chains.contains(chainId)) {
+            return option::none();
+        };
+        let headers = &allHeaders.chains.borrow(chainId).headers;
+        if (!headers.contains(&height)) {
+            return option::none();
+        };
+        option::some(*headers.borrow(&height))
     }
 
     #[view]
@@ -106,30 +268,45 @@ module kimroniny::AptosTrust {
             return (0, vector::empty<u8>());
         };
 
-        // calculate key
-        let chainIdBytes = bcs::to_bytes(&chainId);
-        let heightBytes = bcs::to_bytes(&height);
-        chainIdBytes.append(heightBytes);
-        
-        // get header.relayHeight by key
-        let headersByHeight = & borrow_global<AllHeaders>(MODULE_OWNER).headersByHeight;
-        if (!headersByHeight.contains(&chainIdBytes)) {
+        // get header.relayHeight by (chainId, height)
+        let header = findHeader(borrow_global<AllHeaders>(MODULE_OWNER), chainId, height);
+        if (header.is_none()) {
             return (0, vector::empty<u8>());
         };
-        let header = headersByHeight.borrow(&chainIdBytes);
-        (header.relayHeight, header.root)
+        let Header {chainId: _, height: _, relayHeight, root} = header.destroy_some();
+        (relayHeight, root)
     }
 
-    fun build(operator: &signer, chainId: u64, height: u64, root: vector<u8>) acquires HCRByHeight {
-        assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
-        assert!(vector::length(&root) == 32, EINVALID_ROOT_LENGTH);
+    /// Number of headers stored for a parachain, pruned ones not included, and its highest height.
+    #[view]
+    public fun getChainHeaders(chainId: u64): (u64, u64) acquires AllHeaders {
+        if (!exists<AllHeaders>(MODULE_OWNER)) {
+            return (0, 0);
+        };
+        let chains = & borrow_global<AllHeaders>(MODULE_OWNER).chains;
+        if (!chains.contains(chainId)) {
+            return (0, 0);
+        };
+        let chain = chains.borrow(chainId);
+        (chain.count, chain.latest)
+    }
 
+    fun build(operator: &signer, chainId: u64, height: u64, root: vector<u8>) acquires HCRByHeight,Operators {
+        assertOperator(operator);
+        initHCRs(operator);
+        let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+        let current_height = block::get_current_block_height();
+        buildInto(hcrs, root, current_height);
+    }
+
+    fun initHCRs(operator: &signer) {
         if (!exists<HCRByHeight>(MODULE_OWNER)) {
             move_to(operator, HCRByHeight {hcrs: ordered_map::new<u64, vector<u8>>()});
         };
+    }
 
-        let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
-        let current_height = block::get_current_block_height();
+    fun buildInto(hcrs: &mut ordered_map::OrderedMap<u64, vector<u8>>, root: vector<u8>, current_height: u64) {
+        assert!(vector::length(&root) == 32, EINVALID_ROOT_LENGTH);
         if (hcrs.contains(&current_height)) {
             let hcr = hcrs.borrow_mut(&current_height);
             hcr.append(root); // TODO: chainId+height+root
@@ -139,26 +316,60 @@ module kimroniny::AptosTrust {
         }
     }
 
-    fun countVotes(operator: &signer, sequences: &vector<u64>) acquires VotesByHeight {
-        assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
+    fun countVotes(operator: &signer, sequences: &vector<u64>) acquires VotesByHeight,Retention,ParaChains,Operators {
+        assertOperator(operator);
         let length = vector::length(sequences);
         if (length == 0) {
             return;
         };
+        initVotes(operator);
+        let firstOpen = firstOpenRelayHeight();
+        let totalParachains = getParachainCount();
+        let current_height = block::get_current_block_height();
+        countVotesInto(borrow_global_mut<VotesByHeight>(MODULE_OWNER), sequences, firstOpen, totalParachains, current_height);
+    }
+
+    fun initVotes(operator: &signer) {
         if (!exists<VotesByHeight>(MODULE_OWNER)) {
-            move_to(operator, VotesByHeight { votes: big_ordered_map::new<u64, u64>()});
+            move_to(operator, VotesByHeight { votes: big_ordered_map::new<u64, u64>(), finalized: table::new<u64, u64>()});
         };
-        let votes = &mut borrow_global_mut<VotesByHeight>(MODULE_OWNER).votes;
-        sequences.for_each_ref(|x| {
-            if (!votes.contains(x)) {
-                votes.add(*x, 0u64);
+    }
+
+    /// Adds one vote to each relay height in `sequences` and marks the ones that
+    /// cross the 2/3 quorum of `totalParachains` as finalized at `current_height`.
+    fun countVotesInto(
+        byHeight: &mut VotesByHeight,
+        sequences: &vector<u64>,
+        firstOpen: u64,
+        totalParachains: u64,
+        current_height: u64
+    ) {
+        let VotesByHeight {votes, finalized} = byHeight;
+        let relayHeights = vector::empty<u64>();
+        let totals = vector::empty<u64>();
+        for (i in 0..vector::length(sequences)) {
+            let x = *vector::borrow(sequences, i);
+            // the result of a pruned relay height is final
+            if (x >= firstOpen) {
+                if (!votes.contains(&x)) {
+                    votes.add(x, 0u64);
+                };
+                let y = votes.borrow_mut(&x);
+                *y = *y + 1;
+                relayHeights.push_back(x);
+                totals.push_back(*y);
+                if (totalParachains > 0 && hasQuorum(*y, totalParachains) && !finalized.contains(x)) {
+                    finalized.add(x, current_height);
+                    event::emit(RelayHeaderFinalized {relayHeight: x, finalizedAt: current_height, votes: *y});
+                };
             };
-            let y = votes.borrow_mut(x);
-            *y = *y + 1;
-        });
+        };
+        if (!relayHeights.is_empty()) {
+            event::emit(VotesCounted {relayHeights, votes: totals});
+        };
     }
 
-    public entry fun collectHeader(operator: &signer, chainId: u64, height: u64, root: vector<u8>, hcr: vector<u8>, sequences: vector<u64>) acquires AllHeaders,VotesByHeight,HCRByHeight {
+    public entry fun collectHeader(operator: &signer, chainId: u64, height: u64, root: vector<u8>, hcr: vector<u8>, sequences: vector<u64>) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
         // statistic the vote for each history heigtht
         countVotes(operator, &sequences);
 
@@ -170,45 +381,381 @@ module kimroniny::AptosTrust {
 
         // build hcr
         build(operator, chainId, height, root); 
+
+        // amortized pruning of old relay heights and of this chain's headers
+        pruneStep(operator, &vector[chainId]);
+    }
+
+    /// Collects a batch of headers in one transaction. The i-th header is
+    /// (chainIds[i], heights[i], roots[i], hcrs[i], sequences[i]); every resource is
+    /// borrowed once for the whole batch instead of once per header.
+    public entry fun collectHeaders(
+        operator: &signer,
+        chainIds: vector<u64>,
+        heights: vector<u64>,
+        roots: vector<vector<u8>>,
+        hcrs: vector<vector<u8>>,
+        sequences: vector<vector<u64>>
+    ) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
+        assertOperator(operator);
+        let length = vector::length(&chainIds);
+        assert!(vector::length(&heights) == length, EBATCH_LENGTH_MISMATCH);
+        assert!(vector::length(&roots) == length, EBATCH_LENGTH_MISMATCH);
+        assert!(vector::length(&hcrs) == length, EBATCH_LENGTH_MISMATCH);
+        assert!(vector::length(&sequences) == length, EBATCH_LENGTH_MISMATCH);
+
+        initVotes(operator);
+        initHeaders(operator);
+        initHCRs(operator);
+        let totalParachains = getParachainCount();
+        let votes = borrow_global_mut<VotesByHeight>(MODULE_OWNER);
+        let allHeaders = borrow_global_mut<AllHeaders>(MODULE_OWNER);
+        let hcrMap = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+        let current_height = block::get_current_block_height();
+        let firstOpen = firstOpenRelayHeight();
+
+        for (i in 0..length) {
+            let chainId = chainIds[i];
+            let height = heights[i];
+            let root = roots[i];
+
+            // statistic the vote for each history heigtht
+            countVotesInto(votes, &sequences[i], firstOpen, totalParachains, current_height);
+
+            // verify header
+            assert!(verifyHeader(operator, chainId, height, root), EVERIFY_HEADER_FAILED);
+
+            // store header
+            storeHeaderInto(allHeaders, chainId, height, root, current_height);
+
+            // build hcr
+            buildInto(hcrMap, root, current_height);
+        };
+
+        // amortized pruning of old relay heights and of these chains' headers
+        pruneStep(operator, &chainIds);
+    }
+
+    /// Compact record of the relay heights with an HCR pruned so far: how many, the
+    /// highest one, the fold of their HCRs in height order (same fold as `build`)
+    /// and the final votes of the highest one.
+    struct Checkpoint has store, copy, drop {
+        count: u64,
+        height: u64,
+        hcr: vector<u8>,
+        votes: u64
+    }
+
+    /// Relay heights more than `window` blocks behind the current block are pruned
+    /// from VotesByHeight and HCRByHeight, and headers anchored at pruned relay
+    /// heights from AllHeaders. Each collected batch prunes at most `step` entries;
+    /// with `step` 0 only `prune`/`pruneHeaders` do. A `window` of 0 keeps everything.
+    ///
+    /// A pruned relay height keeps whether it reached quorum in `verdicts` and a
+    /// pruned header its relay height in ChainHeaders.anchors, so the checks answer
+    /// for exactly what was stored and nothing else. Both keep the latest `keep`
+    /// entries, 0 keeps all; a key below the dropped ones checks as CHECK_PRUNED.
+    struct Retention has key {
+        window: u64,
+        step: u64,
+        keep: u64,
+        checkpoint: Checkpoint,
+        // relay heights pruned, with an HCR or only votes, and the highest one
+        pruned: u64,
+        prunedTo: u64,
+        // pruned relay heights, relayHeight => reached quorum
+        verdicts: big_ordered_map::BigOrderedMap<u64, bool>,
+        // verdicts dropped beyond `keep` and the highest relay height among them
+        expired: u64,
+        expiredTo: u64
+    }
+
+    public entry fun setRetention(operator: &signer, window: u64, step: u64, keep: u64) acquires Retention {
+        assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
+        if (!exists<Retention>(MODULE_OWNER)) {
+            move_to(operator, Retention {
+                window: window,
+                step: step,
+                keep: keep,
+                checkpoint: Checkpoint {count: 0, height: 0, hcr: vector::empty<u8>(), votes: 0},
+                pruned: 0,
+                prunedTo: 0,
+                verdicts: big_ordered_map::new<u64, bool>(),
+                expired: 0,
+                expiredTo: 0
+            });
+            return;
+        };
+        let retention = borrow_global_mut<Retention>(MODULE_OWNER);
+        retention.window = window;
+        retention.step = step;
+        retention.keep = keep;
+    }
+
+    public entry fun prune(operator: &signer, maxHeights: u64) acquires Retention,VotesByHeight,HCRByHeight {
+        assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
+        pruneRelayHeights(operator, maxHeights);
+    }
+
+    public entry fun pruneHeaders(operator: &signer, chainIds: vector<u64>, maxHeaders: u64) acquires Retention,AllHeaders {
+        assert!(signer::address_of(operator) == MODULE_OWNER, ENOT_MODULE_OWNER);
+        pruneHeadersOf(&chainIds, maxHeaders);
+    }
+
+    fun pruneStep(operator: &signer, chainIds: &vector<u64>) acquires Retention,AllHeaders,VotesByHeight,HCRByHeight {
+        if (!exists<Retention>(MODULE_OWNER)) {
+            return;
+        };
+        let step = borrow_global<Retention>(MODULE_OWNER).step;
+        if (step == 0) {
+            return;
+        };
+        pruneRelayHeights(operator, step);
+        pruneHeadersOf(chainIds, step);
+    }
+
+    fun pruneRelayHeights(operator: &signer, maxHeights: u64): u64 acquires Retention,VotesByHeight,HCRByHeight {
+        if (!exists<Retention>(MODULE_OWNER) || !exists<HCRByHeight>(MODULE_OWNER)) {
+            return 0;
+        };
+        let window = borrow_global<Retention>(MODULE_OWNER).window;
+        let current_height = block::get_current_block_height();
+        if (window == 0 || current_height <= window) {
+            return 0;
+        };
+        initVotes(operator);
+        pruneRelayHeightsInto(
+            borrow_global_mut<Retention>(MODULE_OWNER),
+            &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs,
+            borrow_global_mut<VotesByHeight>(MODULE_OWNER),
+            current_height - window,
+            maxHeights
+        )
+    }
+
+    fun pruneRelayHeightsInto(
+        retention: &mut Retention,
+        hcrs: &mut ordered_map::OrderedMap<u64, vector<u8>>,
+        byHeight: &mut VotesByHeight,
+        cutoff: u64,
+        maxHeights: u64
+    ): u64 {
+        let VotesByHeight {votes, finalized} = byHeight;
+        let pruned = 0;
+        // relay heights with an HCR or votes, oldest first, so every relay height
+        // below firstOpenRelayHeight is pruned and has its verdict recorded
+        while (pruned < maxHeights) {
+            let relayHeight = cutoff;
+            if (!hcrs.is_empty()) {
+                let (front, _) = hcrs.borrow_front();
+                relayHeight = *front;
+            };
+            if (!votes.is_empty()) {
+                let (front, _) = votes.borrow_front();
+                if (front < relayHeight) {
+                    relayHeight = front;
+                };
+            };
+            if (relayHeight >= cutoff) {
+                break
+            };
+            let totalVotes = 0;
+            if (votes.contains(&relayHeight)) {
+                totalVotes = votes.remove(&relayHeight);
+            };
+            let accepted = finalized.contains(relayHeight);
+            if (accepted) {
+                finalized.remove(relayHeight);
+            };
+            if (hcrs.contains(&relayHeight)) {
+                let hcr = hcrs.remove(&relayHeight);
+                let checkpoint = &mut retention.checkpoint;
+                if (checkpoint.count == 0) {
+                    checkpoint.hcr = hcr;
+                } else {
+                    checkpoint.hcr.append(hcr);
+                    checkpoint.hcr = aptos_hash::keccak256(checkpoint.hcr);
+                };
+                checkpoint.count = checkpoint.count + 1;
+                checkpoint.height = relayHeight;
+                checkpoint.votes = totalVotes;
+            };
+            retention.verdicts.add(relayHeight, accepted);
+            retention.pruned = retention.pruned + 1;
+            retention.prunedTo = relayHeight;
+            // pruned - expired is the number of verdicts kept
+            while (retention.keep > 0 && retention.pruned - retention.expired > retention.keep) {
+                let (expiredTo, _) = retention.verdicts.pop_front();
+                retention.expired = retention.expired + 1;
+                retention.expiredTo = expiredTo;
+            };
+            pruned = pruned + 1;
+        };
+        pruned
+    }
+
+    fun pruneHeadersOf(chainIds: &vector<u64>, maxHeaders: u64): u64 acquires Retention,AllHeaders {
+        if (!exists<Retention>(MODULE_OWNER) || !exists<AllHeaders>(MODULE_OWNER)) {
+            return 0;
+        };
+        let retention = borrow_global<Retention>(MODULE_OWNER);
+        let chains = &mut borrow_global_mut<AllHeaders>(MODULE_OWNER).chains;
+        let pruned = 0;
+        for (i in 0..vector::length(chainIds)) {
+            let chainId = *vector::borrow(chainIds, i);
+            if (pruned < maxHeaders && chains.contains(chainId)) {
+                pruned = pruned + pruneChainHeadersInto(chains.borrow_mut(chainId), retention, maxHeaders - pruned);
+            };
+        };
+        pruned
+    }
+
+    fun pruneChainHeadersInto(chain: &mut ChainHeaders, retention: &Retention, maxHeaders: u64): u64 {
+        if (retention.pruned == 0) {
+            return 0;
+        };
+        let pruned = 0;
+        // headers anchored at pruned relay heights, lowest height first
+        while (pruned < maxHeaders && !chain.headers.is_empty()) {
+            let (height, header) = chain.headers.borrow_front();
+            let relayHeight = header.relayHeight;
+            if (relayHeight > retention.prunedTo) {
+                break
+            };
+            let (_, _) = chain.headers.pop_front();
+            chain.anchors.add(height, relayHeight);
+            chain.count = chain.count - 1;
+            chain.pruned = chain.pruned + 1;
+            if (height > chain.prunedTo) {
+                chain.prunedTo = height;
+            };
+            // pruned - expired is the number of anchors kept
+            while (retention.keep > 0 && chain.pruned - chain.expired > retention.keep) {
+                let (expiredTo, _) = chain.anchors.pop_front();
+                chain.expired = chain.expired + 1;
+                if (expiredTo > chain.expiredTo) {
+                    chain.expiredTo = expiredTo;
+                };
+            };
+            pruned = pruned + 1;
+        };
+        pruned
+    }
+
+    /// Votes for relay heights below this are ignored, their result is final.
+    fun firstOpenRelayHeight(): u64 acquires Retention {
+        if (!exists<Retention>(MODULE_OWNER)) {
+            return 0;
+        };
+        let retention = borrow_global<Retention>(MODULE_OWNER);
+        if (retention.pruned == 0) {
+            return 0;
+        };
+        retention.prunedTo + 1
+    }
+
+    fun prunedRelayVerdict(relayHeight: u64): Option<u64> acquires Retention {
+        if (!exists<Retention>(MODULE_OWNER)) {
+            return option::none();
+        };
+        relayVerdictIn(borrow_global<Retention>(MODULE_OWNER), relayHeight)
+    }
+
+    /// Verdict of a relay height below firstOpenRelayHeight, none for the ones above.
+    fun relayVerdictIn(retention: &Retention, relayHeight: u64): Option<u64> {
+        if (retention.pruned == 0 || relayHeight > retention.prunedTo) {
+            return option::none();
+        };
+        if (retention.verdicts.contains(&relayHeight)) {
+            if (*retention.verdicts.borrow(&relayHeight)) {
+                return option::some(CHECK_VOTE_OK);
+            };
+            return option::some(CHECK_VOTE_NOT_ENOUGH);
+        };
+        if (retention.expired > 0 && relayHeight <= retention.expiredTo) {
+            return option::some(CHECK_PRUNED);
+        };
+        // never carried a header or a vote
+        option::some(CHECK_NOT_EXIST)
+    }
+
+    /// Verdict of a header that is not stored, none unless it was pruned.
+    fun prunedHeaderVerdict(allHeaders: &AllHeaders, chainId: u64, height: u64): Option<u64> acquires Retention {
+        if (!exists<Retention>(MODULE_OWNER) || !allHeaders.chains.contains(chainId)) {
+            return option::none();
+        };
+        let chain = allHeaders.chains.borrow(chainId);
+        if (chain.anchors.contains(&height)) {
+            let retention = borrow_global<Retention>(MODULE_OWNER);
+            let verdict = relayVerdictIn(retention, *chain.anchors.borrow(&height));
+            if (verdict.is_none()) {
+                return option::some(CHECK_PRUNED);
+            };
+            return verdict;
+        };
+        if (chain.expired > 0 && height <= chain.expiredTo) {
+            return option::some(CHECK_PRUNED);
+        };
+        option::none()
+    }
+
+    fun hasQuorum(totalVotes: u64, totalParachains: u64): bool {
+        totalVotes > totalParachains/3*2
+    }
+
+    #[view]
+    public fun getRetention(): (u64, u64, u64) acquires Retention {
+        if (!exists<Retention>(MODULE_OWNER)) {
+            return (0, 0, 0);
+        };
+        let retention = borrow_global<Retention>(MODULE_OWNER);
+        (retention.window, retention.step, retention.keep)
+    }
+
+    #[view]
+    public fun getCheckpoint(): (u64, u64, vector<u8>, u64) acquires Retention {
+        if (!exists<Retention>(MODULE_OWNER)) {
+            return (0, 0, vector::empty<u8>(), 0);
+        };
+        let checkpoint = borrow_global<Retention>(MODULE_OWNER).checkpoint;
+        (checkpoint.count, checkpoint.height, checkpoint.hcr, checkpoint.votes)
     }
 
     const CHECK_UNINIT: u64 = 0;
     const CHECK_VOTE_OK: u64 = 1;
     const CHECK_VOTE_NOT_ENOUGH: u64 = 2;
     const CHECK_NOT_EXIST: u64 = 3;
+    // pruned longer ago than the verdicts Retention.keep holds, the result is no longer known
+    const CHECK_PRUNED: u64 = 4;
     #[view]
-    public fun checkParaHeaderValid(chainId: u64, height: u64) :u64 acquires AllHeaders,VotesByHeight,ParaChains {
+    public fun checkParaHeaderValid(chainId: u64, height: u64) :u64 acquires AllHeaders,VotesByHeight,Retention {
         // check whether init AllHeaders
         if (!exists<AllHeaders>(MODULE_OWNER)) {
             return CHECK_UNINIT;
         };
 
-        // calculate key
-        let chainIdBytes = bcs::to_bytes(&chainId);
-        let heightBytes = bcs::to_bytes(&height);
-        chainIdBytes.append(heightBytes);
-        
-        // get header.relayHeight by key
-        let headersByHeight = & borrow_global<AllHeaders>(MODULE_OWNER).headersByHeight;
-        if (!headersByHeight.contains(&chainIdBytes)) {
+        // get header.relayHeight by (chainId, height)
+        let allHeaders = borrow_global<AllHeaders>(MODULE_OWNER);
+        let header = findHeader(allHeaders, chainId, height);
+        if (header.is_none()) {
+            // pruned headers keep the verdict they had when pruned
+            let verdict = prunedHeaderVerdict(allHeaders, chainId, height);
+            if (verdict.is_some()) {
+                return verdict.destroy_some();
+            };
             return CHECK_NOT_EXIST;
         };
-        let relayHeight = headersByHeight.borrow(&chainIdBytes).relayHeight;
+        let relayHeight = header.borrow().relayHeight;
         
-        // get votes of relayHeight
+        // get finality of relayHeight
         assert!(exists<VotesByHeight>(MODULE_OWNER));
-        let votes = & borrow_global<VotesByHeight>(MODULE_OWNER).votes;
-        // assert!(votes.contains(&relayHeight));
-        let totalVotes = votes.borrow(&relayHeight);
-
-        // get number of parachains
-        assert!(exists<ParaChains>(MODULE_OWNER));
-        let totalParachains = borrow_global<ParaChains>(MODULE_OWNER).chains.compute_length();
-
-        // compare
-        if (*totalVotes > totalParachains/3*2) {
+        if (borrow_global<VotesByHeight>(MODULE_OWNER).finalized.contains(relayHeight)) {
             return CHECK_VOTE_OK;
         };
+        let verdict = prunedRelayVerdict(relayHeight);
+        if (verdict.is_some()) {
+            return verdict.destroy_some();
+        };
 
         CHECK_VOTE_NOT_ENOUGH       
     }
@@ -218,17 +765,12 @@ module kimroniny::AptosTrust {
         // check whether init AllHeaders
         assert!(exists<AllHeaders>(MODULE_OWNER));
 
-        // calculate key
-        let chainIdBytes = bcs::to_bytes(&chainId);
-        let heightBytes = bcs::to_bytes(&height);
-        chainIdBytes.append(heightBytes);
-        
-        // get header.relayHeight by key
-        let headersByHeight = & borrow_global<AllHeaders>(MODULE_OWNER).headersByHeight;
-        if (!headersByHeight.contains(&chainIdBytes)) {
+        // get header.relayHeight by (chainId, height)
+        let header = findHeader(borrow_global<AllHeaders>(MODULE_OWNER), chainId, height);
+        if (header.is_none()) {
             return CHECK_NOT_EXIST;
         };
-        let relayHeight = headersByHeight.borrow(&chainIdBytes).relayHeight;
+        let relayHeight = header.borrow().relayHeight;
         
         // get votes of relayHeight
         assert!(exists<VotesByHeight>(MODULE_OWNER));
@@ -239,28 +781,38 @@ module kimroniny::AptosTrust {
     }
 
     #[view]
-    public fun checkRelayHeaderValid(relayHeight: u64): u64 acquires VotesByHeight,ParaChains {
-        // get votes of relayHeight
+    public fun checkRelayHeaderValid(relayHeight: u64): u64 acquires VotesByHeight,Retention {
+        // get finality of relayHeight
         if (!exists<VotesByHeight>(MODULE_OWNER)) {
             return CHECK_UNINIT;
         };
-        let votes = & borrow_global<VotesByHeight>(MODULE_OWNER).votes;
-        // assert!(votes.contains(&relayHeight));
-        if (!votes.contains(&relayHeight)) {
-            return CHECK_NOT_EXIST;
+        let byHeight = borrow_global<VotesByHeight>(MODULE_OWNER);
+        if (byHeight.finalized.contains(relayHeight)) {
+            return CHECK_VOTE_OK;
+        };
+        if (byHeight.votes.contains(&relayHeight)) {
+            return CHECK_VOTE_NOT_ENOUGH;
         };
-        let totalVotes = votes.borrow(&relayHeight);
-
-        // get number of parachains
-        assert!(exists<ParaChains>(MODULE_OWNER));
-        let totalParachains = borrow_global<ParaChains>(MODULE_OWNER).chains.compute_length();
 
-        // compare
-        if (*totalVotes > totalParachains/3*2) {
-            return CHECK_VOTE_OK;
+        // pruned relay heights keep the verdict they had when pruned
+        let verdict = prunedRelayVerdict(relayHeight);
+        if (verdict.is_some()) {
+            return verdict.destroy_some();
         };
+        CHECK_NOT_EXIST
+    }
 
-        CHECK_VOTE_NOT_ENOUGH
+    /// Whether a relay height reached quorum and the hub block height it did so at.
+    #[view]
+    public fun getRelayHeaderFinality(relayHeight: u64): (bool, u64) acquires VotesByHeight {
+        if (!exists<VotesByHeight>(MODULE_OWNER)) {
+            return (false, 0);
+        };
+        let finalized = & borrow_global<VotesByHeight>(MODULE_OWNER).finalized;
+        if (!finalized.contains(relayHeight)) {
+            return (false, 0);
+        };
+        (true, *finalized.borrow(relayHeight))
     }
 
     #[view]
@@ -279,6 +831,89 @@ module kimroniny::AptosTrust {
         (*totalVotes, maxVotes)
     }
 
+    /// Headers of a parachain with height in [from, to) as (heights, relayHeights, roots).
+    /// At most MAX_VIEW_PAGE headers in height order, the next page starts after the last
+    /// height returned; heights are sparse, so only stored headers are walked.
+    #[view]
+    public fun getHeaders(chainId: u64, from: u64, to: u64): (vector<u64>, vector<u64>, vector<vector<u8>>) acquires AllHeaders {
+        let heights = vector::empty<u64>();
+        let relayHeights = vector::empty<u64>();
+        let roots = vector::empty<vector<u8>>();
+        if (from >= to || !exists<AllHeaders>(MODULE_OWNER)) {
+            return (heights, relayHeights, roots);
+        };
+        let chains = & borrow_global<AllHeaders>(MODULE_OWNER).chains;
+        if (!chains.contains(chainId)) {
+            return (heights, relayHeights, roots);
+        };
+        let headers = & chains.borrow(chainId).headers;
+        let iter = headers.lower_bound(&from);
+        while (!iter.iter_is_end(headers) && heights.length() < MAX_VIEW_PAGE) {
+            let height = *iter.iter_borrow_key();
+            if (height >= to) {
+                break
+            };
+            let header = iter.iter_borrow(headers);
+            heights.push_back(height);
+            relayHeights.push_back(header.relayHeight);
+            roots.push_back(header.root);
+            iter = iter.iter_next(headers);
+        };
+        (heights, relayHeights, roots)
+    }
+
+    /// Votes of each relay height and the number of parachains, see getRelayHeaderVotes.
+    #[view]
+    public fun getRelayHeadersVotes(relayHeights: vector<u64>): (vector<u64>, u64) acquires VotesByHeight, ParaChains {
+        assert!(relayHeights.length() <= MAX_VIEW_PAGE, EPAGE_TOO_LARGE);
+        let maxVotes = getParachainCount();
+        if (!exists<VotesByHeight>(MODULE_OWNER)) {
+            return (relayHeights.map_ref(|_h| 0u64), maxVotes);
+        };
+        let votes = & borrow_global<VotesByHeight>(MODULE_OWNER).votes;
+        let result = relayHeights.map_ref(|h| {
+            if (votes.contains(h)) { *votes.borrow(h) } else { 0u64 }
+        });
+        (result, maxVotes)
+    }
+
+    /// HCRs of the relay heights in [from, to) that have one, as (relayHeights, hcrs).
+    /// At most MAX_VIEW_PAGE in height order, the next page starts after the last relay
+    /// height returned.
+    #[view]
+    public fun getHCRs(from: u64, to: u64): (vector<u64>, vector<vector<u8>>) acquires HCRByHeight {
+        let relayHeights = vector::empty<u64>();
+        let hcrs = vector::empty<vector<u8>>();
+        if (from >= to || !exists<HCRByHeight>(MODULE_OWNER)) {
+            return (relayHeights, hcrs);
+        };
+        let stored = & borrow_global<HCRByHeight>(MODULE_OWNER).hcrs;
+        let iter = stored.lower_bound(&from);
+        while (!iter.iter_is_end(stored) && relayHeights.length() < MAX_VIEW_PAGE) {
+            let relayHeight = *iter.iter_borrow_key(stored);
+            if (relayHeight >= to) {
+                break
+            };
+            relayHeights.push_back(relayHeight);
+            hcrs.push_back(*iter.iter_borrow(stored));
+            iter = iter.iter_next(stored);
+        };
+        (relayHeights, hcrs)
+    }
+
+    /// checkParaHeaderValid of each (chainIds[i], heights[i]).
+    #[view]
+    public fun checkParaHeadersValid(chainIds: vector<u64>, heights: vector<u64>): vector<u64> acquires AllHeaders,VotesByHeight,Retention {
+        let length = chainIds.length();
+        assert!(length == heights.length(), EBATCH_LENGTH_MISMATCH);
+        assert!(length <= MAX_VIEW_PAGE, EPAGE_TOO_LARGE);
+        let result = vector::empty<u64>();
+        for (i in 0..length) {
+            result.push_back(checkParaHeaderValid(chainIds[i], heights[i]));
+        };
+        result
+    }
+
 
 
     // Should be in-sync with NewBlockEvent rust struct in new_block.rs
@@ -309,6 +944,8 @@ module kimroniny::AptosTrust {
         assert!(borrow_global<ParaChains>(MODULE_OWNER).chains.contains(&1));
         assert!(borrow_global<ParaChains>(MODULE_OWNER).chains.compute_length() == 1);
         assert!(getParachain(chainId));
+        registParaChain(account, chainId);
+        assert!(getParachainCount() == 1);
     }
 
     #[test(account=@0xCAFF)]
@@ -318,23 +955,74 @@ module kimroniny::AptosTrust {
     }
 
     #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
-    fun storeHeaderOnce(account: &signer, aptos_framework: &signer) acquires AllHeaders{
+    fun storeHeaderOnce(account: &signer, aptos_framework: &signer) acquires AllHeaders,Operators {
         aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
         block::initialize_for_test(aptos_framework, 3000000u64); // it does not show in doc:reference, but show in codes
         let chainId = 10u64;
         let height = 20u64;
         let root = aptos_hash::keccak256(vector[1u8]);
         storeHeader(account, chainId, height, root);
-        let AllHeaders {headersByChainId, headersByHeight} = borrow_global<AllHeaders>(MODULE_OWNER);
-        assert!(headersByChainId.length() == 1);
-        assert!(headersByHeight.length() == 1);
+        let chains = & borrow_global<AllHeaders>(MODULE_OWNER).chains;
+        assert!(chains.contains(chainId));
+        assert!(chains.borrow(chainId).headers.compute_length() == 1);
+        let (count, latest) = getChainHeaders(chainId);
+        assert!(count == 1 && latest == height);
         let (_relayHeight, _root) = getHeader(chainId, height);
         assert!(block::get_current_block_height() == _relayHeight);
         assert!(_root == root);
     }
 
+    #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
+    fun storeHeadersOfSeveralChains(account: &signer, aptos_framework: &signer) acquires AllHeaders,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        storeHeader(account, 10u64, 21u64, root);
+        storeHeader(account, 10u64, 20u64, root);
+        storeHeader(account, 11u64, 5u64, root);
+        let (count, latest) = getChainHeaders(10u64);
+        assert!(count == 2 && latest == 21);
+        let (count, latest) = getChainHeaders(11u64);
+        assert!(count == 1 && latest == 5);
+        let (_relayHeight, _root) = getHeader(11u64, 20u64);
+        assert!(_relayHeight == 0 && _root == vector::empty<u8>());
+    }
+
+    #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
+    fun getHeadersByRange(account: &signer, aptos_framework: &signer) acquires AllHeaders,VotesByHeight,Retention,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        storeHeader(account, 10u64, 5u64, root);
+        storeHeader(account, 10u64, 7u64, root);
+        storeHeader(account, 10u64, 1752849110174u64, root);
+        initVotes(account);
+        let (heights, relayHeights, roots) = getHeaders(10u64, 5u64, 8u64);
+        assert!(heights == vector[5u64, 7u64]);
+        assert!(relayHeights.length() == 2 && roots == vector[root, root]);
+        // sparse heights are one page, however far apart
+        let (heights, _relayHeights, _roots) = getHeaders(10u64, 0u64, 1752849110175u64);
+        assert!(heights == vector[5u64, 7u64, 1752849110174u64]);
+        let (heights, _relayHeights, _roots) = getHeaders(10u64, 6u64, 1752849110174u64);
+        assert!(heights == vector[7u64]);
+        let (heights, _relayHeights, _roots) = getHeaders(11u64, 0u64, 10u64);
+        assert!(heights.is_empty());
+        let status = checkParaHeadersValid(vector[10u64, 10u64], vector[5u64, 6u64]);
+        assert!(status == vector[CHECK_VOTE_NOT_ENOUGH, CHECK_NOT_EXIST]);
+    }
+
+    #[test]
+    #[expected_failure]
+    fun getRelayHeadersVotesPageTooLarge() acquires VotesByHeight,ParaChains {
+        let relayHeights = vector::empty<u64>();
+        for (i in 0..(MAX_VIEW_PAGE + 1)) {
+            relayHeights.push_back(i);
+        };
+        getRelayHeadersVotes(relayHeights);
+    }
+
     #[test(account=@kimroniny, vm=@vm_reserved, aptos_framework=@aptos_framework)]
-    fun buildWithoutPrefix(account: &signer, vm: &signer, aptos_framework: &signer) acquires HCRByHeight {
+    fun buildWithoutPrefix(account: &signer, vm: &signer, aptos_framework: &signer) acquires HCRByHeight,Operators {
         aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
         block::initialize_for_test(aptos_framework, 3000000u64); // it does not show in doc:reference, but show in codes
         let chainId = 10u64;
@@ -346,16 +1034,117 @@ module kimroniny::AptosTrust {
         assert!(*borrow_global<HCRByHeight>(MODULE_OWNER).hcrs.borrow(&current_height) == root);
     }
 
+    #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
+    fun collectHeadersBatch(account: &signer, aptos_framework: &signer) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
+        let root1 = aptos_hash::keccak256(vector[1u8]);
+        let root2 = aptos_hash::keccak256(vector[2u8]);
+        collectHeaders(
+            account,
+            vector[1u64, 2u64],
+            vector[20u64, 30u64],
+            vector[root1, root2],
+            vector[root1, root2],
+            vector[vector[7u64], vector[7u64, 8u64]]
+        );
+        let (_relayHeight, _root) = getHeader(2u64, 30u64);
+        assert!(_relayHeight == block::get_current_block_height());
+        assert!(_root == root2);
+        let votes = & borrow_global<VotesByHeight>(MODULE_OWNER).votes;
+        assert!(*votes.borrow(&7u64) == 2);
+        assert!(*votes.borrow(&8u64) == 1);
+        let root1Then2 = root1;
+        root1Then2.append(root2);
+        let hcr = *borrow_global<HCRByHeight>(MODULE_OWNER).hcrs.borrow(&block::get_current_block_height());
+        assert!(hcr == aptos_hash::keccak256(root1Then2));
+    }
+
     #[test(account=@kimroniny)]
-    fun countVotesNoEmpty(account: &signer) acquires VotesByHeight {
+    fun getHCRsByRange(account: &signer) acquires HCRByHeight {
+        initHCRs(account);
+        let root1 = aptos_hash::keccak256(vector[1u8]);
+        let root2 = aptos_hash::keccak256(vector[2u8]);
+        {
+            let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+            buildInto(hcrs, root1, 1u64);
+            buildInto(hcrs, root1, 3u64);
+            buildInto(hcrs, root2, 3u64);
+            buildInto(hcrs, root1, 200u64);
+            for (i in 0..MAX_VIEW_PAGE) {
+                buildInto(hcrs, root1, 1000u64 + i * 1000);
+            };
+        };
+        let (relayHeights, hcrs) = getHCRs(0u64, 4u64);
+        assert!(relayHeights == vector[1u64, 3u64]);
+        let root1Then2 = root1;
+        root1Then2.append(root2);
+        assert!(hcrs == vector[root1, aptos_hash::keccak256(root1Then2)]);
+        let (relayHeights, _hcrs) = getHCRs(0u64, 1000u64);
+        assert!(relayHeights == vector[1u64, 3u64, 200u64]);
+        // a full page, the next one starts after its last relay height
+        let (relayHeights, _hcrs) = getHCRs(0u64, 1000000000u64);
+        assert!(relayHeights.length() == MAX_VIEW_PAGE && relayHeights[MAX_VIEW_PAGE - 1] == 97000u64);
+        let (relayHeights, _hcrs) = getHCRs(97001u64, 1000000000u64);
+        assert!(relayHeights == vector[98000u64, 99000u64, 100000u64]);
+        let (relayHeights, _hcrs) = getHCRs(4u64, 4u64);
+        assert!(relayHeights.is_empty());
+    }
+
+    #[test(account=@kimroniny)]
+    #[expected_failure]
+    fun collectHeadersLengthMismatch(account: &signer) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
+        collectHeaders(account, vector[1u64, 2u64], vector[20u64], vector[], vector[], vector[]);
+    }
+
+    #[test(account=@kimroniny, operator=@0xCAFF, aptos_framework=@aptos_framework)]
+    fun collectByOperator(account: &signer, operator: &signer, aptos_framework: &signer) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
+        assert!(isOperator(MODULE_OWNER) && !isOperator(@0xCAFF));
+        addOperator(account, @0xCAFF);
+        addOperator(account, @0xCAFF);
+        assert!(isOperator(@0xCAFF) && getOperatorCount() == 1);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        collectHeader(operator, 1u64, 20u64, root, root, vector[7u64]);
+        collectHeaders(operator, vector[2u64], vector[30u64], vector[root], vector[root], vector[vector[7u64]]);
+        // everything lands under the owner, nothing under the operator
+        assert!(!exists<AllHeaders>(@0xCAFF) && !exists<VotesByHeight>(@0xCAFF));
+        let (_relayHeight, _root) = getHeader(2u64, 30u64);
+        assert!(_root == root);
+        assert!(*borrow_global<VotesByHeight>(MODULE_OWNER).votes.borrow(&7u64) == 2);
+        removeOperator(account, @0xCAFF);
+        assert!(!isOperator(@0xCAFF) && getOperatorCount() == 0);
+    }
+
+    #[test(account=@kimroniny, operator=@0xCAFF)]
+    #[expected_failure]
+    fun collectByRemovedOperator(account: &signer, operator: &signer) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
+        addOperator(account, @0xCAFF);
+        removeOperator(account, @0xCAFF);
+        collectHeader(operator, 1u64, 20u64, vector[], vector[], vector[7u64]);
+    }
+
+    #[test(operator=@0xCAFF)]
+    #[expected_failure]
+    fun addOperatorByOperator(operator: &signer) acquires Operators {
+        addOperator(operator, @0xCAFF);
+    }
+
+    #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
+    fun countVotesNoEmpty(account: &signer, aptos_framework: &signer) acquires VotesByHeight,Retention,ParaChains,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
         let sequence = vector[1u64, 2u64, 10u64];
         countVotes(account, &sequence);
         let votes = & borrow_global<VotesByHeight>(MODULE_OWNER).votes;
         assert!(votes.compute_length() == vector::length(&sequence));
     }
 
-    #[test(account=@kimroniny)]
-    fun countVotesEmpty(account: &signer) acquires VotesByHeight {
+    #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
+    fun countVotesEmpty(account: &signer, aptos_framework: &signer) acquires VotesByHeight,Retention,ParaChains,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
         let sequence = vector[1u64, 2u64, 10u64];
         countVotes(account, &sequence);
         countVotes(account, &vector[]);
@@ -363,6 +1152,193 @@ module kimroniny::AptosTrust {
         assert!(votes.compute_length() == vector::length(&sequence));
     }
 
+    #[test(account=@kimroniny)]
+    fun finalizeOnQuorum(account: &signer) acquires VotesByHeight,Retention,ParaChains {
+        registParaChain(account, 1u64);
+        registParaChain(account, 2u64);
+        registParaChain(account, 3u64);
+        initVotes(account);
+        let total = getParachainCount();
+        assert!(total == 3);
+        // 2 of 3 is not more than 3/3*2
+        countVotesInto(borrow_global_mut<VotesByHeight>(MODULE_OWNER), &vector[7u64], 0, total, 100u64);
+        countVotesInto(borrow_global_mut<VotesByHeight>(MODULE_OWNER), &vector[7u64], 0, total, 101u64);
+        assert!(checkRelayHeaderValid(7u64) == CHECK_VOTE_NOT_ENOUGH);
+        countVotesInto(borrow_global_mut<VotesByHeight>(MODULE_OWNER), &vector[7u64], 0, total, 102u64);
+        assert!(checkRelayHeaderValid(7u64) == CHECK_VOTE_OK);
+        let (isFinalized, at) = getRelayHeaderFinality(7u64);
+        assert!(isFinalized && at == 102);
+        assert!(checkRelayHeaderValid(8u64) == CHECK_NOT_EXIST);
+    }
+
+    #[test(account=@kimroniny, aptos_framework=@aptos_framework)]
+    fun collectEmitsEvents(account: &signer, aptos_framework: &signer) acquires AllHeaders,VotesByHeight,HCRByHeight,Retention,ParaChains,Operators {
+        aptos_framework::account::create_account_for_test(signer::address_of(aptos_framework));
+        block::initialize_for_test(aptos_framework, 3000000u64);
+        registParaChain(account, 1u64);
+        registParaChain(account, 1u64);
+        assert!(event::emitted_events<ParaChainRegistered>().length() == 1);
+        assert!(event::was_event_emitted(&ParaChainRegistered {chainId: 1, count: 1}));
+        let root = aptos_hash::keccak256(vector[1u8]);
+        collectHeader(account, 1u64, 20u64, root, root, vector[7u64]);
+        let current_height = block::get_current_block_height();
+        assert!(event::was_event_emitted(&HeaderCollected {chainId: 1, height: 20, relayHeight: current_height, root: root}));
+        assert!(event::was_event_emitted(&VotesCounted {relayHeights: vector[7u64], votes: vector[1u64]}));
+        assert!(event::was_event_emitted(&RelayHeaderFinalized {relayHeight: 7, finalizedAt: current_height, votes: 1}));
+        // no sequences, no votes event
+        collectHeader(account, 1u64, 21u64, root, root, vector[]);
+        assert!(event::emitted_events<VotesCounted>().length() == 1);
+        assert!(event::emitted_events<HeaderCollected>().length() == 2);
+    }
+
+    #[test(account=@kimroniny)]
+    fun pruneKeepsVerdicts(account: &signer) acquires Retention,VotesByHeight,HCRByHeight,AllHeaders,ParaChains {
+        registParaChain(account, 10u64);
+        setRetention(account, 10u64, 0u64, 0u64);
+        initVotes(account);
+        initHCRs(account);
+        initHeaders(account);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        {
+            let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+            let votes = borrow_global_mut<VotesByHeight>(MODULE_OWNER);
+            buildInto(hcrs, root, 1u64);
+            buildInto(hcrs, root, 2u64);
+            buildInto(hcrs, root, 3u64);
+            buildInto(hcrs, root, 5u64);
+            countVotesInto(votes, &vector[1u64, 2u64, 5u64], 0, 1u64, 0);
+            let allHeaders = borrow_global_mut<AllHeaders>(MODULE_OWNER);
+            storeHeaderInto(allHeaders, 10u64, 1u64, root, 2u64);
+            storeHeaderInto(allHeaders, 10u64, 2u64, root, 3u64);
+            storeHeaderInto(allHeaders, 10u64, 3u64, root, 5u64);
+
+            // relay heights below 4 go, 3 never got a vote
+            let pruned = pruneRelayHeightsInto(borrow_global_mut<Retention>(MODULE_OWNER), hcrs, votes, 4u64, 100u64);
+            assert!(pruned == 3);
+        };
+        let (count, height, _hcr, _votes) = getCheckpoint();
+        assert!(count == 3 && height == 3);
+        assert!(checkRelayHeaderValid(1u64) == CHECK_VOTE_OK);
+        assert!(checkRelayHeaderValid(3u64) == CHECK_VOTE_NOT_ENOUGH);
+        assert!(checkRelayHeaderValid(4u64) == CHECK_NOT_EXIST);
+        assert!(checkRelayHeaderValid(5u64) == CHECK_VOTE_OK);
+        // below the pruned ones, but never carried a header or a vote
+        assert!(checkRelayHeaderValid(0u64) == CHECK_NOT_EXIST);
+
+        // late votes for pruned heights are ignored
+        countVotesInto(borrow_global_mut<VotesByHeight>(MODULE_OWNER), &vector[1u64], firstOpenRelayHeight(), 1u64, 0);
+        assert!(!borrow_global<VotesByHeight>(MODULE_OWNER).votes.contains(&1u64));
+        let (isFinalized, _at) = getRelayHeaderFinality(1u64);
+        assert!(!isFinalized);
+
+        // headers anchored at relay heights 2 and 3 go, the one at 5 stays
+        assert!(pruneHeadersOf(&vector[10u64], 100u64) == 2);
+        let (_relayHeight, _root) = getHeader(10u64, 1u64);
+        assert!(_relayHeight == 0);
+        assert!(checkParaHeaderValid(10u64, 1u64) == CHECK_VOTE_OK);
+        assert!(checkParaHeaderValid(10u64, 2u64) == CHECK_VOTE_NOT_ENOUGH);
+        assert!(checkParaHeaderValid(10u64, 3u64) == CHECK_VOTE_OK);
+        // a height below the pruned ones that never held a header
+        assert!(checkParaHeaderValid(10u64, 0u64) == CHECK_NOT_EXIST);
+        let (count, latest) = getChainHeaders(10u64);
+        assert!(count == 1 && latest == 3);
+    }
+
+    #[test(account=@kimroniny)]
+    fun pruneKeepsLatestVerdicts(account: &signer) acquires Retention,VotesByHeight,HCRByHeight,AllHeaders,ParaChains {
+        registParaChain(account, 10u64);
+        setRetention(account, 10u64, 0u64, 2u64);
+        initVotes(account);
+        initHCRs(account);
+        initHeaders(account);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        {
+            let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+            let votes = borrow_global_mut<VotesByHeight>(MODULE_OWNER);
+            buildInto(hcrs, root, 1u64);
+            buildInto(hcrs, root, 2u64);
+            buildInto(hcrs, root, 4u64);
+            // relay height 3 only got votes, enough for quorum
+            countVotesInto(votes, &vector[3u64], 0, 1u64, 0);
+            let allHeaders = borrow_global_mut<AllHeaders>(MODULE_OWNER);
+            storeHeaderInto(allHeaders, 10u64, 1u64, root, 1u64);
+            storeHeaderInto(allHeaders, 10u64, 2u64, root, 2u64);
+            storeHeaderInto(allHeaders, 10u64, 4u64, root, 4u64);
+
+            // 1, 2, 3 and 4 in height order, the verdicts of 3 and 4 are kept
+            let pruned = pruneRelayHeightsInto(borrow_global_mut<Retention>(MODULE_OWNER), hcrs, votes, 5u64, 100u64);
+            assert!(pruned == 4);
+        };
+        let (count, height, _hcr, _votes) = getCheckpoint();
+        assert!(count == 3 && height == 4);
+        assert!(checkRelayHeaderValid(0u64) == CHECK_PRUNED);
+        assert!(checkRelayHeaderValid(2u64) == CHECK_PRUNED);
+        assert!(checkRelayHeaderValid(3u64) == CHECK_VOTE_OK);
+        assert!(checkRelayHeaderValid(4u64) == CHECK_VOTE_NOT_ENOUGH);
+        // a finalized relay height without headers is not opened again
+        countVotesInto(borrow_global_mut<VotesByHeight>(MODULE_OWNER), &vector[3u64], firstOpenRelayHeight(), 1u64, 0);
+        assert!(!borrow_global<VotesByHeight>(MODULE_OWNER).votes.contains(&3u64));
+        assert!(checkRelayHeaderValid(3u64) == CHECK_VOTE_OK);
+
+        // the anchors of headers 2 and 4 are kept, the one of header 1 is not
+        assert!(pruneHeadersOf(&vector[10u64], 100u64) == 3);
+        assert!(checkParaHeaderValid(10u64, 1u64) == CHECK_PRUNED);
+        assert!(checkParaHeaderValid(10u64, 2u64) == CHECK_PRUNED);
+        assert!(checkParaHeaderValid(10u64, 4u64) == CHECK_VOTE_NOT_ENOUGH);
+        assert!(checkParaHeaderValid(10u64, 3u64) == CHECK_NOT_EXIST);
+        let (count, latest) = getChainHeaders(10u64);
+        assert!(count == 0 && latest == 4);
+    }
+
+    #[test(account=@kimroniny)]
+    #[expected_failure(abort_code = 7, location = Self)]
+    fun recollectPrunedHeader(account: &signer) acquires Retention,VotesByHeight,HCRByHeight,AllHeaders,ParaChains {
+        registParaChain(account, 10u64);
+        setRetention(account, 10u64, 0u64, 0u64);
+        initVotes(account);
+        initHCRs(account);
+        initHeaders(account);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        {
+            let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+            let votes = borrow_global_mut<VotesByHeight>(MODULE_OWNER);
+            buildInto(hcrs, root, 1u64);
+            storeHeaderInto(borrow_global_mut<AllHeaders>(MODULE_OWNER), 10u64, 1u64, root, 1u64);
+            pruneRelayHeightsInto(borrow_global_mut<Retention>(MODULE_OWNER), hcrs, votes, 2u64, 100u64);
+        };
+        assert!(pruneHeadersOf(&vector[10u64], 100u64) == 1);
+        // kept as an anchor, collecting it again would anchor it twice on the next prune
+        storeHeaderInto(borrow_global_mut<AllHeaders>(MODULE_OWNER), 10u64, 1u64, root, 3u64);
+        pruneHeadersOf(&vector[10u64], 100u64);
+    }
+
+    #[test(account=@kimroniny)]
+    #[expected_failure(abort_code = 7, location = Self)]
+    fun recollectExpiredHeader(account: &signer) acquires Retention,VotesByHeight,HCRByHeight,AllHeaders,ParaChains {
+        registParaChain(account, 10u64);
+        setRetention(account, 10u64, 0u64, 1u64);
+        initVotes(account);
+        initHCRs(account);
+        initHeaders(account);
+        let root = aptos_hash::keccak256(vector[1u8]);
+        {
+            let hcrs = &mut borrow_global_mut<HCRByHeight>(MODULE_OWNER).hcrs;
+            let votes = borrow_global_mut<VotesByHeight>(MODULE_OWNER);
+            buildInto(hcrs, root, 1u64);
+            buildInto(hcrs, root, 2u64);
+            let allHeaders = borrow_global_mut<AllHeaders>(MODULE_OWNER);
+            storeHeaderInto(allHeaders, 10u64, 2u64, root, 1u64);
+            storeHeaderInto(allHeaders, 10u64, 4u64, root, 2u64);
+            pruneRelayHeightsInto(borrow_global_mut<Retention>(MODULE_OWNER), hcrs, votes, 3u64, 100u64);
+        };
+        // the anchor of header 2 expires, the one of header 4 is kept
+        assert!(pruneHeadersOf(&vector[10u64], 100u64) == 2);
+        // above the expired heights and never pruned, still collected
+        storeHeaderInto(borrow_global_mut<AllHeaders>(MODULE_OWNER), 10u64, 5u64, root, 3u64);
+        // below them, it may have been pruned before
+        storeHeaderInto(borrow_global_mut<AllHeaders>(MODULE_OWNER), 10u64, 1u64, root, 3u64);
+    }
+
     #[test]
     fun example_with_primitive_types() {
         let map = big_ordered_map::new<u64, u64>();